@@ -4,13 +4,16 @@ Add city names and bold markers - NO county boundary
 """
 
 import folium
-import pandas as pd
+from shapely.geometry import mapping
+from stage_io import read_stage
+from zip_tessellation import attach_cells
+from map_client import WebGLPolygons, client_format, renderer_option, save_map
 
 print("🗺️  Adding city names and bold markers (no county boundary)...")
 print("=" * 70)
 
 # Read demographic data
-df = pd.read_csv('/workspace/complete_demographic_data.csv', dtype={'zip_code': str})
+df = read_stage('/workspace/complete_demographic_data', dtype={'zip_code': str})
 print(f"📊 Loaded {len(df)} zip codes")
 
 # Color function
@@ -116,29 +119,23 @@ for col, scheme in [('population', 'population'), ('median_income', 'income'),
         lambda x: get_strong_color(x, min_val, max_val, scheme)
     )
 
+# Leaflet renderer (--renderer svg|canvas|webgl) - canvas and WebGL skip
+# the DOM node per ZIP cell that makes panning sluggish
+RENDERER = renderer_option()
+
 # Create map
 m = folium.Map(
     location=[40.1, -74.9],
     zoom_start=9,
     tiles='cartodbpositron',
-    control_scale=True
+    control_scale=True,
+    prefer_canvas=RENDERER == 'canvas'
 )
 
-def create_large_polygon(lat, lon, size=0.04):
-    return {
-        "type": "Feature",
-        "properties": {},
-        "geometry": {
-            "type": "Polygon",
-            "coordinates": [[
-                [lon - size, lat - size],
-                [lon + size, lat - size],
-                [lon + size, lat + size],
-                [lon - size, lat + size],
-                [lon - size, lat - size]
-            ]]
-        }
-    }
+# Non-overlapping Voronoi cells, one per ZIP centroid (zip_tessellation.py)
+zips = attach_cells(df)
+zips['cell'] = [mapping(geom) for geom in zips['geometry']]
+print(f"   🔷 {len(zips)} ZIP cells")
 
 # Create demographic layers WITH CITY NAMES
 demographics = {
@@ -153,18 +150,13 @@ layers = {}
 
 for demo, (layer_name, color_col) in demographics.items():
     features = []
-    for idx, row in df.iterrows():
-        poly = create_large_polygon(row['lat'], row['lon'], size=0.04)
-        
-        if demo == 'median_income':
-            value_display = f"${row[demo]:,.0f}"
-        else:
-            value_display = f"{row[demo]:,.0f}"
+    for idx, row in zips.iterrows():
+        poly = {"type": "Feature", "properties": {}, "geometry": row['cell']}
         
         poly['properties'] = {
             'city': row.get('city', 'Unknown'),
             'zip_code': row['zip_code'],
-            'value': value_display,
+            'value': row[demo],  # formatted in the page
             'color': row[color_col]
         }
         features.append(poly)
@@ -172,7 +164,7 @@ for demo, (layer_name, color_col) in demographics.items():
     geojson_data = {"type": "FeatureCollection", "features": features}
     layer = folium.FeatureGroup(name=layer_name, show=False)
     
-    folium.GeoJson(
+    cells = folium.GeoJson(
         geojson_data,
         style_function=lambda feature: {
             'fillColor': feature['properties']['color'],
@@ -186,6 +178,9 @@ for demo, (layer_name, color_col) in demographics.items():
             localize=True
         )
     ).add_to(layer)
+    client_format(cells, value='currency' if demo == 'median_income' else 'number')
+    if RENDERER == 'webgl':
+        WebGLPolygons().add_to(cells)
     
     layers[demo] = layer
 
@@ -327,7 +322,7 @@ m.get_root().html.add_child(folium.Element(title_html))
 m.get_root().html.add_child(folium.Element(legend_html))
 
 output_file = '/workspace/interactive-map-working.html'
-m.save(output_file)
+save_map(m, output_file)
 
 print(f"\n✅ Working map saved: {output_file}")
 print(f"\n✅ Added:")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark peak memory of chunked vs whole-file tract processing as input grows
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import pyarrow as pa
+
+from stage_io import read_stage
+
+SOURCE = '/workspace/complete_census_all_nj_with_cities'
+SCALES = [1, 4, 16, 24]  # 24x ≈ 91k tracts, roughly the national tract count
+
+WHOLE_FILE = '''
+import json, resource, sys
+import shapely
+from stage_io import read_stage
+df = read_stage(sys.argv[1], zero_copy=False)
+geoms = shapely.from_geojson(df['geometry'].to_numpy(dtype=object), on_invalid='ignore')
+features = [{"type": "Feature", "geometry": json.loads(g), "properties": {"geoid": i}}
+            for g, i in zip(shapely.to_geojson(geoms), df['geoid'])]
+with open(sys.argv[2], 'w') as f:
+    json.dump({"type": "FeatureCollection", "features": features}, f)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+'''
+
+CHUNKED = '''
+import resource, sys
+from chunked_tracts import iter_tract_batches, stream_feature_collection
+stream_feature_collection(iter_tract_batches(sys.argv[1]), sys.argv[2])
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+'''
+
+
+def peak_rss(script, source, out):
+    result = subprocess.run([sys.executable, '-c', script, source, out], check=True,
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+print("🧪 Peak RSS: whole-file vs chunked tract processing")
+print("=" * 70)
+print(f"{'scale':>6} {'tracts':>8} {'whole-file':>12} {'chunked':>10}")
+
+base = pa.Table.from_pandas(read_stage(SOURCE, dtype={'geoid': str}, zero_copy=False),
+                            preserve_index=False)
+with tempfile.TemporaryDirectory() as tmp:
+    for scale in SCALES:
+        # Replicate the tract table to simulate national-scale input
+        table = pa.concat_tables([base] * scale)
+        source = os.path.join(tmp, f'tracts_x{scale}.arrow')
+        with pa.OSFile(source, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=8192)
+        out = os.path.join(tmp, 'out.geojson')
+
+        whole = peak_rss(WHOLE_FILE, source, out)
+        chunked = peak_rss(CHUNKED, source, out)
+        print(f"{scale:>5}x {table.num_rows:>8} {whole:>10.0f}MB {chunked:>8.0f}MB")
+        os.remove(source)
+
+print("=" * 70)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark packed coordinates against GeoJSON coordinate text
+
+For the census tracts at every simplification level of topo_simplify,
+compares the geometry payload written as plain GeoJSON with the
+pack_geometries encoding (quantized, delta-encoded varints) at a few
+quantization scales: bytes raw, gzip and Brotli, Python encode time and
+- when node is on the PATH - client parse time, i.e. JSON.parse of the
+plain text against JSON.parse plus the in-page decoder (map_client.
+UNPACK_JS) for the packed one. Node runs the same V8 engine as Chrome.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import brotli
+import shapely
+
+from map_client import COORDINATE_SCALE, UNPACK_JS, pack_geometries
+from topo_simplify import ZOOM_LEVELS, load_level
+
+SOURCE = '/workspace/census_tract_demographics'
+SCALES = (10 ** 5, 10 ** 6)
+RUNS = 15
+
+# Median parse time (ms) of each payload file given on the command line
+PARSE_JS = UNPACK_JS + """
+const fs = require('fs');
+function median(times) { times.sort(function(a, b) { return a - b; }); return times[times.length >> 1]; }
+process.argv.slice(3).forEach(function(path) {
+    var text = fs.readFileSync(path, 'utf8'), times = [];
+    for (var i = 0; i <= +process.argv[2]; i++) {
+        var start = performance.now();
+        unpackGeometries(JSON.parse(text));
+        if (i) times.push(performance.now() - start);
+    }
+    console.log(median(times));
+});
+"""
+
+
+def collection(geometries, packed=None):
+    """FeatureCollection text over geometry mappings, as the sidecars carry it"""
+    data = {'type': 'FeatureCollection',
+            'features': [{'type': 'Feature', 'geometry': g} for g in geometries]}
+    if packed is not None:
+        data['packed'] = packed
+    return json.dumps(data, separators=(',', ':'))
+
+
+def parse_times(texts):
+    """Median node parse + decode ms per text, or None without node"""
+    node = shutil.which('node')
+    if node is None:
+        return [None] * len(texts)
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, 'parse.js')
+        with open(script, 'w') as f:
+            f.write(PARSE_JS)
+        paths = []
+        for i, text in enumerate(texts):
+            paths.append(os.path.join(tmp, f'{i}.json'))
+            with open(paths[-1], 'w') as f:
+                f.write(text)
+        result = subprocess.run([node, script, str(RUNS)] + paths, check=True, capture_output=True, text=True)
+    return [float(line) for line in result.stdout.split()]
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else SOURCE
+
+    print("📐 Coordinates: GeoJSON text vs packed varints")
+    print("=" * 70)
+    if shutil.which('node') is None:
+        print("   ⚠️  node not found - parse times skipped")
+    print(f"{'level':7} {'encoding':12} {'raw':>8} {'gzip':>8} {'br':>8} {'encode':>8} {'parse':>8}")
+
+    for min_zoom, max_zoom in ZOOM_LEVELS:
+        geoms = load_level(source, min_zoom)['geometry'].to_numpy()
+        geoms = geoms[~shapely.is_empty(geoms)]
+        geometries = [json.loads(g) for g in shapely.to_geojson(geoms)]
+        start = time.perf_counter()
+        rows = [('geojson', collection(geometries), time.perf_counter() - start)]
+        for scale in SCALES:
+            start = time.perf_counter()
+            stubs, packed = pack_geometries(geometries, scale)
+            text = collection(stubs, packed)
+            rows.append((f'packed 1e{len(str(scale)) - 1}', text, time.perf_counter() - start))
+
+        times = parse_times([text for _, text, _ in rows])
+        for (name, text, encode), parse in zip(rows, times):
+            data = text.encode()
+            print(f"{f'z{min_zoom}-{max_zoom}':7} {name:12} {len(data) / 1e6:>6.2f}MB "
+                  f"{len(gzip.compress(data, 6)) / 1e6:>6.2f}MB {len(brotli.compress(data, quality=9)) / 1e6:>6.2f}MB "
+                  f"{encode * 1000:>6.0f}ms " + (f"{parse:>6.1f}ms" if parse is not None else f"{'-':>8}"))
+
+    print(f"\n   Packed coordinates are rounded to 1/scale degree (1e5 ~ 1 m, 1e6 ~ 0.1 m); "
+          f"pages use COORDINATE_SCALE = 1e{len(str(COORDINATE_SCALE)) - 1}")
+    print("=" * 70)
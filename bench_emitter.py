@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark the direct page emitter against the folium object graph
+
+Both paths write the same map: the four demographic tract layers of
+build_census_tract_map_optimized (simplified level, per-feature colors
+and tooltips), the ZIP income cells and a marker group with halos. Each
+runs in a fresh process; build time covers everything after the shared
+data is prepared, peak RSS is the whole process and "data" the RSS
+before the page build starts.
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+SOURCE = '/workspace/census_tract_demographics'
+DEMOS = {
+    'median_income': ('💰 Median Income', '#F7FFF7', '#004D00', '${:,.0f}'),
+    'population': ('📊 Population', '#F0F8FF', '#00008B', '{:,.0f}'),
+    'density': ('🏘️ Population Density', '#FDF5FF', '#2E0854', '{:,.0f}/mi²'),
+    'median_home_value': ('🏡 Median Home Value', '#FFFFF0', '#006400', '${:,.0f}'),
+}
+STYLE = {'weight': 0.3, 'fillOpacity': 0.7}
+HALO = {'radius': 12, 'color': '#FFFFFF', 'fillColor': '#FFFFFF', 'fillOpacity': 0.9, 'weight': 0}
+ICON = '<div style="width: 18px; height: 18px; background-color: #FFFF00; border: 3px solid #000000; border-radius: 50%;"></div>'
+
+
+def interpolate_color(val, c_low, c_high):
+    low = [int(c_low[i:i + 2], 16) for i in (1, 3, 5)]
+    high = [int(c_high[i:i + 2], 16) for i in (1, 3, 5)]
+    return '#' + ''.join(f'{int(a + (b - a) * val):02x}' for a, b in zip(low, high))
+
+
+def prepare():
+    """[(name, geometry array, properties with color + tooltip)], marker points"""
+    from stage_io import read_stage
+    from topo_simplify import load_level
+    from zip_tessellation import attach_cells
+
+    tracts = read_stage(SOURCE, dtype={'geoid': str}, zero_copy=False).drop(columns='geometry')
+    tracts = tracts.merge(load_level(SOURCE, 12), on='geoid')
+    layers = []
+    for demo, (name, low, high, fmt) in DEMOS.items():
+        rows = tracts[tracts[demo].notna()]
+        norm = (rows[demo] - rows[demo].min()) / (rows[demo].max() - rows[demo].min())
+        properties = pd.DataFrame({
+            'color': [interpolate_color(v, low, high) for v in norm],
+            'tooltip': ("<b>" + rows['county_name'] + " County</b><br>Tract " + rows['geoid'].str[-6:]
+                        + f"<br>{name}: " + rows[demo].map(fmt.format)).to_numpy(),
+        })
+        layers.append((name, rows['geometry'].to_numpy(), properties))
+
+    zips = read_stage('/workspace/complete_demographic_data', dtype={'zip_code': str}, zero_copy=False)
+    zips = attach_cells(zips[zips['median_income'].notna()])
+    layers.append(('💵 ZIP Median Income', zips['geometry'].to_numpy(), pd.DataFrame({
+        'color': zips['income_color'].to_numpy(),
+        'tooltip': ("<b>" + zips['city'] + "</b> " + zips['zip_code'] + "<br>Median Income: "
+                    + zips['median_income'].map('${:,.0f}'.format)).to_numpy(),
+    })))
+
+    top = zips.nlargest(36, 'population')
+    points = [{'lat': lat, 'lon': lon, 'icon': ICON, 'popup': f'<b>{city}</b>', 'tooltip': city}
+              for lat, lon, city in zip(top['lat'], top['lon'], top['city'])]
+    return layers, points
+
+
+def build_folium(layers, points, out):
+    import folium
+    from shapely.geometry import mapping
+    from map_client import batched_layer
+
+    m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron', control_scale=True)
+    for name, geometries, properties in layers:
+        group = folium.FeatureGroup(name=name, show=False)
+        batched_layer([mapping(g) for g in geometries], properties, style=STYLE, tooltip='tooltip').add_to(group)
+        group.add_to(m)
+    markers = folium.FeatureGroup(name='📍 Largest ZIPs', show=True)
+    for p in points:
+        folium.CircleMarker(location=[p['lat'], p['lon']], **{k: v for k, v in HALO.items() if k != 'fillColor'},
+                            fill_color=HALO['fillColor']).add_to(markers)
+        folium.Marker(location=[p['lat'], p['lon']], icon=folium.DivIcon(html=p['icon']),
+                      popup=p['popup'], tooltip=p['tooltip']).add_to(markers)
+    markers.add_to(m)
+    folium.LayerControl(collapsed=False).add_to(m)
+    m.save(out)
+
+
+def build_direct(layers, points, out):
+    from page_emitter import emit_map, marker_group, polygon_layer
+
+    emit_map(out, [polygon_layer(name, geometries, properties, STYLE, tooltip='tooltip')
+                   for name, geometries, properties in layers],
+             markers=[marker_group('📍 Largest ZIPs', points, halo=HALO)])
+
+
+def run(method, out):
+    """Child process: prepare, build one way, print seconds, data RSS and peak RSS (MB)"""
+    layers, points = prepare()
+    data_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    {'folium': build_folium, 'direct': build_direct}[method](layers, points, out)
+    elapsed = time.perf_counter() - start
+    print(elapsed, data_rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--run':
+        run(sys.argv[2], sys.argv[3])
+        sys.exit()
+
+    print("📝 Page build: folium object graph vs direct template emitter")
+    print("=" * 70)
+    print(f"{'method':10} {'build':>8} {'data':>9} {'peak':>9} {'html':>9}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for method in ('folium', 'direct'):
+            out = os.path.join(tmp, f'{method}.html')
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', method, out],
+                                    check=True, capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+            elapsed, data_rss, peak = map(float, result.stdout.split()[-3:])
+            size = os.path.getsize(out)
+            results[method] = (elapsed, peak - data_rss)
+            print(f"{method:10} {elapsed:>7.2f}s {data_rss:>7.0f}MB {peak:>7.0f}MB {size / 1e6:>7.1f}MB")
+
+    (t0, m0), (t1, m1) = results['folium'], results['direct']
+    print(f"\n   ⚡ {t0 / t1:.1f}x faster build, {m0:.0f}MB → {m1:.0f}MB memory above the prepared data")
+    print("=" * 70)
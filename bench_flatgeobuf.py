@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark FlatGeobuf bbox range reads at national scale
+
+The tri-state tracts are tiled across a CONUS-sized grid until there are
+about as many features as US census tracts (~85k). Reports export time,
+file and index size, and what a viewport query costs in range requests
+and bytes compared with downloading the whole layer.
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from flatgeobuf_export import GEOMETRY_MULTIPOLYGON, TRACT_SOURCE, read_bbox, write_flatgeobuf
+from stage_io import read_stage
+
+NATIONAL_TRACTS = 85_000
+
+# Viewports (degrees) roughly matching a 1280x800 map at each zoom
+VIEWPORTS = {8: (7.0, 3.5), 10: (1.75, 0.9), 12: (0.44, 0.22), 14: (0.11, 0.055)}
+
+print("🗂️  FlatGeobuf range reads at national scale")
+print("=" * 70)
+
+df = read_stage(TRACT_SOURCE, dtype={'geoid': str}, zero_copy=False)
+df = df[df['geometry'].notna()].reset_index(drop=True)
+base = shapely.from_geojson(df['geometry'].to_numpy(dtype=object))
+props = df.drop(columns=['geometry', 'name'])
+
+# Copies on a grid of tri-state-sized cells spanning the lower 48
+copies = -(-NATIONAL_TRACTS // len(base))
+x0, y0, x1, y1 = shapely.total_bounds(base)
+cols = 8
+geoms, tables = [], []
+for k in range(copies):
+    dx = (k % cols) * (x1 - x0) - 48.0
+    dy = (k // cols) * (y1 - y0) - 9.0
+    geoms.append(shapely.transform(base, lambda c, dx=dx, dy=dy: c + [dx, dy]))
+    copy = props.copy()
+    copy['geoid'] = copy['geoid'] + f'_{k}'
+    tables.append(copy)
+geoms = np.concatenate(geoms)
+table = pd.concat(tables, ignore_index=True)
+print(f"   {len(geoms):,} tracts ({copies} copies), "
+      f"{shapely.get_num_coordinates(geoms).sum():,} vertices")
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, 'national.fgb')
+    start = time.perf_counter()
+    stats = write_flatgeobuf(geoms, table, path, 'tracts', GEOMETRY_MULTIPOLYGON)
+    elapsed = time.perf_counter() - start
+    print(f"   Export: {elapsed:.1f}s, {stats['file_bytes'] / 1e6:.1f} MB "
+          f"(index {stats['index_bytes'] / 1e6:.2f} MB)")
+
+    bounds = shapely.bounds(geoms)
+    cx, cy = (x0 + x1) / 2 - 48.0 + 3 * (x1 - x0), (y0 + y1) / 2 - 9.0 + (y1 - y0)
+    print(f"\n{'viewport':>10} {'features':>9} {'requests':>9} {'read':>10} {'of file':>8} {'time':>8}")
+    for zoom, (w, h) in VIEWPORTS.items():
+        bbox = (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+        start = time.perf_counter()
+        features, io = read_bbox(path, bbox)
+        elapsed = time.perf_counter() - start
+        expected = ((bounds[:, 2] >= bbox[0]) & (bounds[:, 0] <= bbox[2]) &
+                    (bounds[:, 3] >= bbox[1]) & (bounds[:, 1] <= bbox[3])).sum()
+        assert len(features) == expected, (len(features), expected)
+        print(f"{'z' + str(zoom):>10} {len(features):>9,} {io['requests']:>9} "
+              f"{io['bytes'] / 1e6:>8.2f}MB {io['bytes'] / stats['file_bytes']:>8.1%} "
+              f"{elapsed * 1000:>6.0f}ms")
+print("=" * 70)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark the multi-core geometry engine against the per-row iterrows loop
+
+Both run parse → repair → simplify → centroid over the tri-state tracts
+tiled to national scale (~85k). The engine is timed at 1, 2, 4, ... up to
+the machine's core count.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+from geometry_engine import process
+from stage_io import read_stage
+
+SOURCE = '/workspace/complete_census_all_nj_with_cities'
+NATIONAL_TRACTS = 85_000
+TOLERANCE = 1e-4
+STEPS = ['repair', ('simplify', {'tolerance': TOLERANCE}), 'centroid']
+
+print(f"⚙️  Geometry engine scaling ({os.cpu_count()} cores)")
+print("=" * 70)
+
+df = read_stage(SOURCE, columns=['geoid', 'geometry'], zero_copy=False)
+df = df[df['geometry'].notna()]
+base = shapely.from_geojson(df['geometry'].to_numpy(dtype=object))
+copies = -(-NATIONAL_TRACTS // len(base))
+x0, y0, x1, y1 = shapely.total_bounds(base)
+tiled = np.concatenate([
+    shapely.transform(base, lambda c, k=k: c + [(k % 8) * (x1 - x0) - 48.0, (k // 8) * (y1 - y0) - 9.0])
+    for k in range(copies)])
+text = pd.Series(shapely.to_geojson(tiled), name='geometry')
+print(f"   {len(text):,} tracts, {text.str.len().sum() / 1e6:.0f} MB of GeoJSON")
+
+# What the builders do today: one row at a time
+sample = text.iloc[:len(text) // 10].to_frame()
+start = time.perf_counter()
+for _, row in sample.iterrows():
+    try:
+        geom = shape(json.loads(row['geometry']))
+        if not geom.is_valid:
+            geom = geom.buffer(0)
+        geom = geom.simplify(TOLERANCE, preserve_topology=True)
+        geom.centroid, geom.representative_point()
+    except Exception:
+        pass
+loop = (time.perf_counter() - start) * len(text) / len(sample)
+print(f"\n{'method':24} {'time':>8} {'speedup':>9} {'vs 1 core':>10}")
+print(f"{'iterrows loop (est.)':24} {loop:>7.1f}s {1.0:>8.1f}x {'':>10}")
+
+counts = sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i <= os.cpu_count()], os.cpu_count()})
+single = None
+for processes in counts:
+    start = time.perf_counter()
+    result = process(text, STEPS, processes=processes)
+    elapsed = time.perf_counter() - start
+    single = single or elapsed
+    print(f"{f'engine, {processes} process(es)':24} {elapsed:>7.1f}s {loop / elapsed:>8.1f}x "
+          f"{single / elapsed:>9.2f}x")
+
+assert result['geometry'].notna().all() and len(result) == len(text)
+print("=" * 70)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Frame-time comparison of the Leaflet renderers (svg, canvas, webgl)
+
+Writes one page per renderer with the same batched tract layer (the
+census_tract_demographics tracts at the simplified level, median income
+colors and tooltips, as build_census_tract_map_optimized draws them) and
+a FrameTimer, plus renderers.html that runs each page in turn in an
+iframe and tabulates the pan frame times. Serve the output directory
+over HTTP and open renderers.html - frame times need a real browser,
+so this script only reports what it can measure here: page bytes and
+the SVG paths the default renderer has to keep in the DOM.
+"""
+
+import os
+import sys
+
+import folium
+import pandas as pd
+import shapely
+from shapely.geometry import mapping
+
+from map_client import RENDERERS, FrameTimer, WebGLPolygons, batched_layer
+from stage_io import read_stage
+from topo_simplify import load_level
+
+SOURCE = '/workspace/census_tract_demographics'
+OUT_DIR = sys.argv[1] if len(sys.argv) > 1 else '/workspace/bench'
+METRIC = 'median_income'
+LOW, HIGH = '#F7FFF7', '#004D00'
+
+INDEX_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Renderer frame times</title>
+<style>
+body { font-family: sans-serif; margin: 16px; }
+table { border-collapse: collapse; margin-bottom: 12px; }
+td, th { border: 1px solid #ccc; padding: 4px 10px; text-align: right; }
+iframe { width: 1200px; height: 800px; border: 1px solid #999; }
+</style></head>
+<body>
+<h3>Pan frame times by renderer</h3>
+<table id="results"><tr><th>renderer</th><th>frames</th><th>p50 ms</th><th>p95 ms</th>
+<th>max ms</th><th>fps</th><th>&gt;50 ms</th></tr></table>
+<iframe id="frame"></iframe>
+<script>
+var pages = %(pages)s;
+var frame = document.getElementById('frame');
+function next() {
+    var page = pages.shift();
+    if (page) frame.src = page + '#frametime';
+}
+window.addEventListener('message', function(e) {
+    var s = e.data && e.data.frametime;
+    if (!s) return;
+    var row = document.getElementById('results').insertRow();
+    [s.label, s.frames, s.p50.toFixed(1), s.p95.toFixed(1), s.max.toFixed(1), s.fps.toFixed(0), s.long]
+        .forEach(function(v) { row.insertCell().textContent = v; });
+    next();
+});
+next();
+</script>
+</body></html>
+"""
+
+
+def interpolate_color(val, c_low, c_high):
+    low = [int(c_low[i:i + 2], 16) for i in (1, 3, 5)]
+    high = [int(c_high[i:i + 2], 16) for i in (1, 3, 5)]
+    return '#' + ''.join(f'{int(a + (b - a) * val):02x}' for a, b in zip(low, high))
+
+
+def build(renderer, df, geojson):
+    m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron',
+                   prefer_canvas=renderer == 'canvas')
+    norm = (df[METRIC] - df[METRIC].min()) / (df[METRIC].max() - df[METRIC].min())
+    properties = pd.DataFrame({
+        'color': [interpolate_color(v, LOW, HIGH) for v in norm],
+        'tooltip': ("<b>" + df['county_name'] + " County</b><br>Tract " + df['geoid'].str[-6:]
+                    + "<br>Median Income: " + df[METRIC].map('${:,.0f}'.format)).to_numpy(),
+    })
+    tracts = batched_layer([geojson[g] for g in df['geoid']], properties,
+                           style={'weight': 0.3, 'fillOpacity': 0.7}, tooltip='tooltip', show=False)
+    tracts.add_to(m)
+    if renderer == 'webgl':
+        WebGLPolygons().add_to(tracts)
+    FrameTimer(layers=[tracts], label=renderer).add_to(m)
+    return m
+
+
+print("🎞️  Renderer frame-time harness: svg vs canvas vs webgl")
+print("=" * 70)
+
+df = read_stage(SOURCE, dtype={'geoid': str}, zero_copy=False).drop(columns='geometry')
+df = df[df[METRIC].notna()].merge(load_level(SOURCE, 12), on='geoid')
+geojson = {geoid: mapping(geom) for geoid, geom in zip(df['geoid'], df['geometry'])}
+paths = int(shapely.get_num_geometries(df['geometry'].to_numpy()).sum())
+print(f"   {len(df):,} tracts → {paths:,} polygons (one SVG <path> each with the default renderer)")
+
+os.makedirs(OUT_DIR, exist_ok=True)
+pages = []
+for renderer in RENDERERS:
+    page = f'renderer-{renderer}.html'
+    build(renderer, df, geojson).save(os.path.join(OUT_DIR, page))
+    pages.append(page)
+    print(f"   {renderer:8} {os.path.getsize(os.path.join(OUT_DIR, page)) / 1e6:6.1f} MB  {page}")
+
+with open(os.path.join(OUT_DIR, 'renderers.html'), 'w') as f:
+    f.write(INDEX_HTML % {'pages': pages})
+
+print(f"\n   ▶️  cd {OUT_DIR} && python -m http.server, then open /renderers.html")
+print("      (or any single page with #frametime appended)")
+print("=" * 70)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-stage handoff I/O: CSV text vs memory-mapped Arrow IPC
+"""
+
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from stage_io import read_stage, write_stage
+
+# Every file that one pipeline stage writes and the next one reads
+STAGES = [
+    ('generate → fix_coords/merge', '/workspace/demographic_data', {'zip_code': str}),
+    ('fix_coords → builders', '/workspace/demographic_data_accurate_coords', {'zip_code': str}),
+    ('merge → builders', '/workspace/complete_demographic_data', {'zip_code': str}),
+    ('fetch_tracts → tract builders', '/workspace/census_tract_demographics', {'geoid': str}),
+    ('tracts → dataset_store', '/workspace/complete_census_all_nj_with_cities', {'geoid': str}),
+]
+
+REPEATS = 5
+
+
+def best_of(fn, repeats=REPEATS):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+print("⏱️  Benchmarking stage handoff I/O (best of %d)..." % REPEATS)
+print("=" * 70)
+print(f"{'stage':32} {'rows':>6} {'csv w':>8} {'csv r':>8} {'arrow w':>8} {'arrow r':>8} {'speedup':>8}")
+
+with tempfile.TemporaryDirectory() as tmp:
+    for label, path, dtype in STAGES:
+        if not (os.path.exists(path + '.arrow') or os.path.exists(path + '.csv')):
+            print(f"{label:32} (missing {path})")
+            continue
+        df = read_stage(path, dtype=dtype, zero_copy=False)
+        csv_path = os.path.join(tmp, 'stage.csv')
+        arrow_stem = os.path.join(tmp, 'stage')
+
+        csv_write = best_of(lambda: df.to_csv(csv_path, index=False))
+        csv_read = best_of(lambda: pd.read_csv(csv_path, dtype=dtype))
+        arrow_write = best_of(lambda: write_stage(df, arrow_stem))
+        os.remove(csv_path)
+        arrow_read = best_of(lambda: read_stage(arrow_stem))
+
+        speedup = (csv_write + csv_read) / (arrow_write + arrow_read)
+        print(f"{label:32} {len(df):>6} {csv_write*1000:>7.1f}ms {csv_read*1000:>7.1f}ms "
+              f"{arrow_write*1000:>7.1f}ms {arrow_read*1000:>7.1f}ms {speedup:>7.1f}x")
+
+print("=" * 70)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark tract payload size: GeoJSON FeatureCollection vs quantized TopoJSON
+"""
+
+import gzip
+import json
+import time
+
+import numpy as np
+import shapely
+
+from stage_io import read_stage
+from topo_simplify import build_topology
+from topojson_export import decode_arcs, dumps, encode_topojson
+
+SOURCE = '/workspace/complete_census_all_nj_with_cities'
+QUANTIZATIONS = [10000, 100000, 1000000]
+
+
+def sizes(text):
+    raw = text.encode()
+    return len(raw), len(gzip.compress(raw, 6))
+
+
+print("📦 Tract payload: GeoJSON vs TopoJSON")
+print("=" * 70)
+
+df = read_stage(SOURCE, columns=['geoid', 'geometry'], dtype={'geoid': str}, zero_copy=False)
+df = df[df['geometry'].notna()]
+props = [{'geoid': g} for g in df['geoid']]
+
+# Same layout the builders embed: one Feature per tract
+features = [{"type": "Feature", "geometry": json.loads(g), "properties": p}
+            for g, p in zip(df['geometry'], props)]
+geojson_raw, geojson_gz = sizes(json.dumps({"type": "FeatureCollection", "features": features}))
+print(f"{'encoding':22} {'raw':>10} {'gzip':>10} {'vs geojson':>11} {'max err (m)':>12} {'encode':>8}")
+print(f"{'GeoJSON':22} {geojson_raw/1e6:>8.2f}MB {geojson_gz/1e6:>8.2f}MB {'':>11} {'':>12}")
+
+geoms = shapely.from_geojson(df['geometry'].to_numpy(dtype=object))
+start = time.perf_counter()
+topology = build_topology(geoms)
+topo_time = time.perf_counter() - start
+original = np.concatenate(topology['arcs'])
+
+for q in QUANTIZATIONS:
+    start = time.perf_counter()
+    topo = encode_topojson(topology, props, ids=list(df['geoid']), quantization=q)
+    text = dumps(topo)
+    elapsed = topo_time + time.perf_counter() - start
+    raw, gz = sizes(text)
+
+    # Worst-case vertex displacement; deduplicated vertices are skipped
+    decoded = decode_arcs(topo)
+    err = 0.0
+    for arc, back in zip(topology['arcs'], decoded):
+        d = np.abs(arc[:, None, :] - back[None, :, :]).max(axis=2).min(axis=1) if len(arc) == len(back) \
+            else np.abs(arc[[0, -1]] - back[[0, -1]]).max(axis=1)
+        err = max(err, d.max())
+    err_m = err * 111_000
+    print(f"{f'TopoJSON Q={q:.0e}':22} {raw/1e6:>8.2f}MB {gz/1e6:>8.2f}MB {raw/geojson_raw:>10.0%} "
+          f"{err_m:>11.2f} {elapsed:>7.2f}s")
+
+print("=" * 70)
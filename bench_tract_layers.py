@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-tract folium.GeoJson objects against one batched layer per metric
+
+Both build the same four demographic layers over the census_tract_demographics
+tracts (simplified level, as build_census_tract_map_optimized uses) and render
+the page. Reports Python build + render time, HTML bytes and how many Leaflet
+objects the page creates: GeoJSON layers, style functions and tooltip bindings.
+"""
+
+import re
+import time
+
+import folium
+import pandas as pd
+from shapely.geometry import mapping
+
+from map_client import batched_layer
+from stage_io import read_stage
+from topo_simplify import load_level
+
+SOURCE = '/workspace/census_tract_demographics'
+DEMOS = {
+    'median_income': ('💰 Median Income', '#F7FFF7', '#004D00', '${:,.0f}'),
+    'population': ('📊 Population', '#F0F8FF', '#00008B', '{:,.0f}'),
+    'density': ('🏘️ Population Density', '#FDF5FF', '#2E0854', '{:,.0f}/mi²'),
+    'median_home_value': ('🏡 Median Home Value', '#FFFFF0', '#006400', '${:,.0f}'),
+}
+STYLE = {'weight': 0.3, 'fillOpacity': 0.7}
+
+
+def interpolate_color(val, c_low, c_high):
+    low = [int(c_low[i:i + 2], 16) for i in (1, 3, 5)]
+    high = [int(c_high[i:i + 2], 16) for i in (1, 3, 5)]
+    return '#' + ''.join(f'{int(a + (b - a) * val):02x}' for a, b in zip(low, high))
+
+
+def per_tract(layer, rows, geojson, demo, colors, tooltips):
+    """What the builders did: one folium.GeoJson (+ style closure + tooltip) per tract"""
+    for geoid, color, text in zip(rows['geoid'], colors, tooltips):
+        folium.GeoJson(
+            geojson[geoid],
+            style_function=lambda x, color=color: dict(STYLE, fillColor=color, color=color),
+            tooltip=text
+        ).add_to(layer)
+
+
+def batched(layer, rows, geojson, demo, colors, tooltips):
+    properties = pd.DataFrame({'color': colors, 'tooltip': tooltips})
+    batched_layer([geojson[g] for g in rows['geoid']], properties, style=STYLE, tooltip='tooltip').add_to(layer)
+
+
+def build(method, df, geojson):
+    m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles=None)
+    for demo, (name, low, high, fmt) in DEMOS.items():
+        rows = df[df[demo].notna()]
+        norm = (rows[demo] - rows[demo].min()) / (rows[demo].max() - rows[demo].min())
+        colors = [interpolate_color(v, low, high) for v in norm]
+        tooltips = ("<b>" + rows['county_name'] + " County</b><br>Tract " + rows['geoid'].str[-6:]
+                    + f"<br>{name}: " + rows[demo].map(fmt.format)).tolist()
+        layer = folium.FeatureGroup(name=name, show=False)
+        method(layer, rows, geojson, demo, colors, tooltips)
+        layer.add_to(m)
+    return m.get_root().render()
+
+
+def js_objects(html):
+    return {
+        'layers': len(re.findall(r'L\.geoJson\(', html)),
+        'styles': len(re.findall(r'function \w+_styler\(', html)),
+        'tooltips': len(re.findall(r'\.bindTooltip\(', html)),
+    }
+
+
+print("🧱 Tract layer emission: per-tract objects vs one batched layer per metric")
+print("=" * 70)
+
+df = read_stage(SOURCE, dtype={'geoid': str}, zero_copy=False).drop(columns='geometry')
+df = df.merge(load_level(SOURCE, 12), on='geoid')
+geojson = {geoid: mapping(geom) for geoid, geom in zip(df['geoid'], df['geometry'])}
+print(f"   {len(df):,} tracts × {len(DEMOS)} metrics")
+
+print(f"\n{'method':18} {'build':>8} {'html':>9} {'layers':>8} {'styles':>8} {'tooltips':>9}")
+results = {}
+for label, method in [('per-tract', per_tract), ('batched', batched)]:
+    start = time.perf_counter()
+    html = build(method, df, geojson)
+    elapsed = time.perf_counter() - start
+    objects = js_objects(html)
+    results[label] = (elapsed, len(html.encode()))
+    print(f"{label:18} {elapsed:>7.1f}s {len(html.encode()) / 1e6:>7.1f}MB "
+          f"{objects['layers']:>8,} {objects['styles']:>8,} {objects['tooltips']:>9,}")
+
+(t0, b0), (t1, b1) = results['per-tract'], results['batched']
+print(f"\n   ⚡ {t0 / t1:.1f}x faster build, {b0 / b1:.1f}x smaller HTML")
+print("=" * 70)
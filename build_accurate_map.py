@@ -4,25 +4,31 @@ Build map with accurate zip code coordinates
 """
 
 import folium
-import pandas as pd
+from stage_io import read_stage
+from map_client import renderer_option, save_map
 
 print("🗺️  Building map with ACCURATE zip code coordinates...")
 print("=" * 70)
 
 # Read accurate demographic data
-df = pd.read_csv('/workspace/complete_demographic_data.csv', dtype={'zip_code': str})
+df = read_stage('/workspace/complete_demographic_data', dtype={'zip_code': str})
 print(f"📊 Loaded {len(df)} zip codes with real coordinates")
 
 # Map center
 center_lat = 40.1
 center_lon = -74.9
 
+# Leaflet renderer (--renderer svg|canvas) - canvas draws the ZIP circles
+# without one DOM node each
+RENDERER = renderer_option()
+
 # Create base map
 m = folium.Map(
     location=[center_lat, center_lon],
     zoom_start=9,
     tiles='cartodbpositron',
-    control_scale=True
+    control_scale=True,
+    prefer_canvas=RENDERER == 'canvas'
 )
 
 print("🎨 Creating demographic layers...")
@@ -235,7 +241,7 @@ m.get_root().html.add_child(folium.Element(legend_html))
 
 # Save
 output_file = '/workspace/interactive-map-fixed.html'
-m.save(output_file)
+save_map(m, output_file)
 
 print(f"\n✅ Map saved to: {output_file}")
 print(f"\n📋 Map includes:")
@@ -3,42 +3,74 @@
 Build census tract demographic map with filled polygons
 """
 
+import sys
+
 import folium
+import numpy as np
 import pandas as pd
-import json
+import shapely
+from shapely.geometry import mapping
+from chunked_tracts import iter_tract_batches
+from geometry_validation import ensure_valid, format_report, load_valid, validated_path
+from map_client import WebGLPolygons, batched_layer, renderer_option, save_map
+from page_emitter import emit_map, layer_fills, marker_group, streamed_layer
+from stage_io import read_stage
+
+SOURCE = '/workspace/census_tract_demographics'
+OUTPUT_FILE = '/workspace/search-map.html'
+
+# Leaflet renderer (--renderer svg|canvas|webgl) - canvas and WebGL skip
+# the DOM node per tract path that makes panning sluggish
+RENDERER = renderer_option()
+
+# --chunked: stream the validated tract geometry batch by batch into a page
+# written directly (page_emitter) - memory is bounded by the batch size
+# rather than the tract count. Drawn with svg or canvas.
+CHUNKED = '--chunked' in sys.argv
+if CHUNKED and RENDERER not in ('svg', 'canvas'):
+    raise SystemExit("--chunked draws with --renderer svg or canvas")
 
 print("🗺️  Building census tract map with filled polygon boundaries...")
 print("=" * 70)
 
-# Load data
-df = pd.read_csv('/workspace/census_tract_demographics.csv', dtype={'geoid': str})
-print(f"📊 Loaded {len(df)} census tracts")
+def clean(df):
+    """Drop tracts with problematic values"""
+    return df[(df['median_age'] > 0) & (df['median_age'] < 100)  # Remove invalid ages
+              & (df['density'] < 100000)  # Remove extreme outliers
+              & (df['population'] > 0)
+              & (df['median_income'] > 10000)
+              & (df['median_home_value'] > 10000)]
 
-# Clean problematic values
-df = df[df['median_age'] > 0]  # Remove invalid ages
-df = df[df['median_age'] < 100]
-df = df[df['density'] < 100000]  # Remove extreme outliers
-df = df[df['population'] > 0]
-df = df[df['median_income'] > 10000]
-df = df[df['median_home_value'] > 10000]
+# Load data - without geometry when chunked (streamed from the validation stage later)
+columns = ['geoid', 'county_name', 'state_name', 'median_age', 'population', 'density', 'median_income',
+           'housing_units', 'median_home_value'] if CHUNKED else None
+df = read_stage(SOURCE, columns=columns, dtype={'geoid': str})
+print(f"📊 Loaded {len(df)} census tracts")
 
+df = clean(df)
 print(f"📊 After cleaning: {len(df)} census tracts")
 
+# Geometry is parsed, repaired and snapped once by the validation stage (cached)
+print(f"🩺 Geometry: {format_report(ensure_valid(SOURCE))}")
+if not CHUNKED:
+    valid = load_valid(SOURCE, columns=['geoid', 'geometry'])
+    df = df.drop(columns='geometry').merge(valid, on='geoid')
+    geojson = {geoid: mapping(geom) for geoid, geom in zip(df['geoid'], df['geometry'])}
+    print(f"📊 With usable geometry: {len(df)} census tracts")
+
 # Create map centered on the region
-m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron', control_scale=True)
-
-# Color interpolation function
-def interpolate_color(val, c_low, c_high):
-    r_low = int(c_low[1:3], 16)
-    g_low = int(c_low[3:5], 16)
-    b_low = int(c_low[5:7], 16)
-    r_high = int(c_high[1:3], 16)
-    g_high = int(c_high[3:5], 16)
-    b_high = int(c_high[5:7], 16)
-    r = int(r_low + (r_high - r_low) * val)
-    g = int(g_low + (g_high - g_low) * val)
-    b = int(b_low + (b_high - b_low) * val)
-    return f'#{r:02x}{g:02x}{b:02x}'
+m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron', control_scale=True,
+               prefer_canvas=RENDERER == 'canvas')
+
+# Two hex digits per channel value
+HEX = np.array([f'{i:02x}' for i in range(256)], dtype=object)
+
+# Color interpolation for a whole column of 0-1 values at once
+def interpolate_colors(values, c_low, c_high):
+    low = np.array([int(c_low[i:i + 2], 16) for i in (1, 3, 5)])
+    high = np.array([int(c_high[i:i + 2], 16) for i in (1, 3, 5)])
+    rgb = (low + (high - low) * np.asarray(values, dtype=float)[:, None]).astype(int)
+    return '#' + HEX[rgb[:, 0]] + HEX[rgb[:, 1]] + HEX[rgb[:, 2]]
 
 # Demographics with EXTREME contrast (same as zip code map)
 demographics_config = {
@@ -50,54 +82,65 @@ demographics_config = {
     'median_home_value': ('🏡 Median Home Value', '#FFFFF0', '#006400')
 }
 
+# Tooltip value format per demo type (default: whole number)
+VALUE_FORMATS = {'median_income': '${:,.0f}', 'median_home_value': '${:,.0f}', 'median_age': '{:.1f} years', 'density': '{:,.0f}/sq mi'}
+
+def layer_properties(rows, demo, layer_name, min_val, max_val):
+    """Fill color and tooltip HTML of each tract in rows (a value for demo required)"""
+    color_low, color_high = demographics_config[demo][1:]
+    norm = (rows[demo] - min_val) / (max_val - min_val)
+    # Census tract name, county/state header and value formatted for the demo type
+    tooltips = ("<b>" + rows['county_name'].fillna('Unknown') + " County, " + rows['state_name'].fillna('') + "</b><br>"
+                + "Census Tract " + rows['geoid'].str[-6:] + "<br>"
+                + f"{layer_name}: " + rows[demo].map(VALUE_FORMATS.get(demo, '{:,.0f}').format))
+    return pd.DataFrame({
+        'color': interpolate_colors(norm, color_low, color_high),
+        'tooltip': tooltips.to_numpy()
+    })
+
+def tract_batches(ranges):
+    """
+    One pass over the validated geometry joined to the cleaned tracts:
+    (geometry strings, (row mask, properties) per demo in ranges) per batch
+    """
+    for batch in iter_tract_batches(validated_path(SOURCE), columns=['geoid', 'geometry']):
+        rows = batch[batch['geometry'].notna()].merge(df, on='geoid')
+        geojson = shapely.to_geojson(shapely.from_wkb(rows['geometry'].to_numpy(dtype=object)))
+        parts = []
+        for demo, (min_val, max_val) in ranges.items():
+            mask = rows[demo].notna().to_numpy()
+            parts.append((mask, layer_properties(rows[mask], demo, demographics_config[demo][0], min_val, max_val)))
+        yield geojson, parts
+
+STYLE = {'weight': 0.5, 'fillOpacity': 0.7}
+
 demo_layers = {}
+ranges = {}
 
 print("🎨 Creating filled polygon heat map layers...")
 for demo, (layer_name, color_low, color_high) in demographics_config.items():
-    layer = folium.FeatureGroup(name=layer_name, show=False)
     min_val, max_val = df[demo].min(), df[demo].max()
     
-    count = 0
-    for idx, row in df.iterrows():
-        if pd.notna(row['geometry']) and pd.notna(row[demo]):
-            norm = (row[demo] - min_val) / (max_val - min_val)
-            color = interpolate_color(norm, color_low, color_high)
-            
-            try:
-                geometry_data = json.loads(row['geometry'])
-                
-                # Create census tract name
-                tract_name = f"Census Tract {row['geoid'][-6:]}"
-                county_name = row.get('county_name', 'Unknown')
-                state_name = row.get('state_name', '')
-                
-                # Format tooltip based on demo type
-                if demo == 'median_income':
-                    tooltip_text = f"<b>{county_name} County, {state_name}</b><br>{tract_name}<br>{layer_name}: ${row[demo]:,.0f}"
-                elif demo == 'median_home_value':
-                    tooltip_text = f"<b>{county_name} County, {state_name}</b><br>{tract_name}<br>{layer_name}: ${row[demo]:,.0f}"
-                elif demo == 'median_age':
-                    tooltip_text = f"<b>{county_name} County, {state_name}</b><br>{tract_name}<br>{layer_name}: {row[demo]:.1f} years"
-                elif demo == 'density':
-                    tooltip_text = f"<b>{county_name} County, {state_name}</b><br>{tract_name}<br>{layer_name}: {row[demo]:,.0f}/sq mi"
-                else:
-                    tooltip_text = f"<b>{county_name} County, {state_name}</b><br>{tract_name}<br>{layer_name}: {row[demo]:,.0f}"
-                
-                # Add filled polygon (GeoJSON)
-                folium.GeoJson(
-                    geometry_data,
-                    style_function=lambda x, color=color: {
-                        'fillColor': color,
-                        'color': color,
-                        'weight': 0.5,
-                        'fillOpacity': 0.7
-                    },
-                    tooltip=tooltip_text
-                ).add_to(layer)
-                
-                count += 1
-            except Exception as e:
-                pass  # Skip problematic geometries
+    if CHUNKED:
+        # Filled batch by batch while the page is emitted (tract_batches)
+        demo_layers[demo] = streamed_layer(layer_name, (), STYLE, tooltip='tooltip')
+        ranges[demo] = (min_val, max_val)
+        print(f"   ✅ {layer_name}: streamed")
+        continue
+    
+    layer = folium.FeatureGroup(name=layer_name, show=False)
+    rows = df[df[demo].notna()]
+    
+    # All tracts of this demographic in ONE GeoJson layer
+    tracts = batched_layer(
+        [geojson[geoid] for geoid in rows['geoid']],
+        layer_properties(rows, demo, layer_name, min_val, max_val),
+        style=STYLE,
+        tooltip='tooltip'
+    ).add_to(layer)
+    if RENDERER == 'webgl':
+        WebGLPolygons().add_to(tracts)
+    count = len(rows)
     
     demo_layers[demo] = layer
     print(f"   ✅ {layer_name}: {count} tracts")
@@ -146,6 +189,8 @@ print("🏢 Creating BOLD business markers...")
 
 current_layer = folium.FeatureGroup(name='🟢 Current Locations', show=True)
 prospect_layer = folium.FeatureGroup(name='🔵 Prospective Locations', show=True)
+# Same markers for the chunked page
+current_points, prospect_points = [], []
 
 # Current locations - Bold markers with white halos
 for loc in current_locations:
@@ -177,11 +222,16 @@ for loc in current_locations:
     ">🟢</div>
     """
     
+    point = {'lat': loc['lat'], 'lon': loc['lon'], 'icon': icon_html,
+             'popup': f"<b style='font-size:16px;'>{loc['name']}</b><br><b>CURRENT LOCATION</b>",
+             'tooltip': f"<b>{loc['name']}</b>"}
+    current_points.append(point)
+    
     folium.Marker(
         location=[loc['lat'], loc['lon']],
         icon=folium.DivIcon(html=icon_html),
-        popup=f"<b style='font-size:16px;'>{loc['name']}</b><br><b>CURRENT LOCATION</b>",
-        tooltip=f"<b>{loc['name']}</b>"
+        popup=point['popup'],
+        tooltip=point['tooltip']
     ).add_to(current_layer)
 
 # Prospects - Bold markers with white halos
@@ -214,11 +264,16 @@ for loc in prospect_locations:
     ">🔵</div>
     """
     
+    point = {'lat': loc['lat'], 'lon': loc['lon'], 'icon': icon_html,
+             'popup': f"<b style='font-size:16px;'>{loc['name']}</b><br><b>PROSPECT LOCATION</b>",
+             'tooltip': f"<b>{loc['name']}</b>"}
+    prospect_points.append(point)
+    
     folium.Marker(
         location=[loc['lat'], loc['lon']],
         icon=folium.DivIcon(html=icon_html),
-        popup=f"<b style='font-size:16px;'>{loc['name']}</b><br><b>PROSPECT LOCATION</b>",
-        tooltip=f"<b>{loc['name']}</b>"
+        popup=point['popup'],
+        tooltip=point['tooltip']
     ).add_to(prospect_layer)
 
 print("   ✅ Ultra-bold markers created")
@@ -227,8 +282,9 @@ print("   ✅ Ultra-bold markers created")
 print("\n📐 Adding layers in correct order...")
 
 # STEP 1: Add demographic layers FIRST (bottom)
-for dlayer in demo_layers.values():
-    dlayer.add_to(m)
+if not CHUNKED:
+    for dlayer in demo_layers.values():
+        dlayer.add_to(m)
 print("   ✅ Heat maps added (bottom layer)")
 
 # STEP 2: Add business markers LAST (top - always visible)
@@ -310,12 +366,25 @@ legend_html = '''
 </div>
 '''
 
-m.get_root().html.add_child(folium.Element(title_html))
-m.get_root().html.add_child(folium.Element(legend_html))
-
-m.save('/workspace/search-map.html')
-
-print("\n✅ Census tract map saved to: search-map.html")
+if CHUNKED:
+    halo = {'color': '#FFFFFF', 'fillColor': '#FFFFFF', 'fillOpacity': 0.9, 'weight': 0}
+    written = emit_map(
+        OUTPUT_FILE,
+        list(demo_layers.values()),
+        markers=[marker_group('🟢 Current Locations', current_points, halo=dict(halo, radius=22)),
+                 marker_group('🔵 Prospective Locations', prospect_points, halo=dict(halo, radius=21))],
+        title='NJ/DE/PA Census Tract Demographics',
+        html=title_html + legend_html,
+        renderer=RENDERER,
+        fills=layer_fills(list(demo_layers.values()), tract_batches(ranges))
+    )
+    print(f"\n✅ Census tract map streamed to: search-map.html ({written / 1e6:.1f} MB)")
+else:
+    m.get_root().html.add_child(folium.Element(title_html))
+    m.get_root().html.add_child(folium.Element(legend_html))
+    
+    save_map(m, OUTPUT_FILE)
+    print("\n✅ Census tract map saved to: search-map.html")
 print("   • 2,700+ census tracts with filled polygon boundaries")
 print("   • 6 demographic heat map layers")
 print("   • Business markers always visible on top")
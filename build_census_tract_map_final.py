@@ -3,27 +3,69 @@
 Build census tract map with PROPER GeoJSON FeatureCollection
 """
 
+import os
+
 import folium
 import pandas as pd
-import json
+from shapely.geometry import mapping
 from branca.colormap import LinearColormap
+from dataset_store import load_tracts
+from geometry_validation import ensure_valid, format_report, load_valid
+from topo_simplify import build_topology
+from topojson_export import encode_topojson, encode_topojson_objects, dumps
+from map_client import NO_DATA_COLOR, MetricSwitcher, ViewportLoader, WebGLPolygons, metric_spec, renderer_option, save_map
+from viewport_chunks import write_chunks
+
+# Partition filters - None means every state/county in the store
+# e.g. STATES = ['NJ'], COUNTIES = ['Mercer'], BBOX = (-75.0, 40.1, -74.5, 40.4)
+STATES = None
+COUNTIES = None
+BBOX = None
+
+# Tract geometry encoding: 'topojson' stores each shared boundary once
+# (quantized + delta-encoded, decoded in the browser); 'geojson' embeds full rings
+GEOMETRY_FORMAT = 'topojson'
+TOPOJSON_QUANTIZATION = 100000
+
+# 'shared': geometry emitted once with every demographic as a property,
+# recolored in the browser by a switcher; 'layers': one layer per demographic
+RENDER_MODE = 'shared'
+
+# Leaflet renderer (--renderer svg|canvas|webgl) - canvas and WebGL skip
+# the DOM node per tract path that makes panning sluggish
+RENDERER = renderer_option()
+
+# 'viewport': the shared tract layer fetches grid chunks for the visible area
+# at the detail level of the current zoom (viewport_chunks); 'all' ships
+# every tract with the page. Only used with RENDER_MODE = 'shared'.
+TRACT_LOADING = 'viewport'
+VIEWPORT = RENDER_MODE == 'shared' and TRACT_LOADING == 'viewport'
+
+OUTPUT_FILE = '/workspace/search-map.html'
 
 print("🗺️  Building census tract map with FeatureCollection approach...")
 print("=" * 70)
 
 # Load data with GAP-FREE cartographic boundaries (ALL 21 NJ counties) + CITY NAMES
-df = pd.read_csv('/workspace/complete_census_all_nj_with_cities.csv', dtype={'geoid': str})
+df = load_tracts(states=STATES, counties=COUNTIES, bbox=BBOX)
 print(f"📊 Loaded {len(df)} census tracts with gap-free boundaries")
 print(f"   ALL 21 NJ counties + DE + PA")
 
-# Minimal cleaning
-df = df[df['geometry'].notna()]  # Must have geometry
+# Geometry from the validation stage the store is built from - the same
+# repaired, grid-snapped shapes, cached as WKB instead of parsed from GeoJSON.
+# Tracts whose geometry is missing or unparseable are listed in its report
+print(f"🩺 Geometry: {format_report(ensure_valid('/workspace/complete_census_all_nj_with_cities'))}")
+valid = load_valid('/workspace/complete_census_all_nj_with_cities', columns=['geoid', 'geometry'])
+df = df.drop(columns='geometry').merge(valid, on='geoid')
+if GEOMETRY_FORMAT == 'geojson' and not VIEWPORT:
+    geojson = {geoid: mapping(geom) for geoid, geom in zip(df['geoid'], df['geometry'])}
 
 print(f"📊 After cleaning: {len(df)} census tracts")
 print(f"   (Using cartographic boundaries - NO GAPS!)")
 
 # Create map
-m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron', control_scale=True)
+m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron', control_scale=True,
+               prefer_canvas=RENDERER == 'canvas')
 
 # Demographics config
 demographics_config = {
@@ -33,47 +75,14 @@ demographics_config = {
     'median_home_value': ('🏡 Median Home Value', 'YlOrRd')
 }
 
-print("🎨 Creating heat map layers using FeatureCollection...")
+if GEOMETRY_FORMAT == 'topojson' and not VIEWPORT:
+    # One shared-arc topology for every layer
+    topology = build_topology(df['geometry'].to_numpy())
+    print(f"🔗 TopoJSON: {len(topology['arcs']):,} shared boundary arcs for {len(df)} tracts")
 
-for demo, (layer_name, colormap_name) in demographics_config.items():
-    # Create FeatureCollection for this demographic
-    features = []
-    
-    for idx, row in df.iterrows():
-        if pd.notna(row['geometry']):
-            try:
-                geometry_data = json.loads(row['geometry'])
-                
-                # Handle missing demographic data - use 0 or min value
-                value = row[demo] if pd.notna(row[demo]) else 0
-                
-                # Create feature with properties
-                feature = {
-                    "type": "Feature",
-                    "geometry": geometry_data,
-                    "properties": {
-                        "geoid": row['geoid'],
-                        "city": row.get('city', 'Unknown'),
-                        "county": row.get('county_name', 'Unknown'),
-                        "state": row.get('state_name', ''),
-                        "value": float(value) if value else 0,
-                        "demo": demo
-                    }
-                }
-                features.append(feature)
-            except Exception as e:
-                pass
-    
-    if len(features) == 0:
-        continue
-        
-    # Create FeatureCollection
-    feature_collection = {
-        "type": "FeatureCollection",
-        "features": features
-    }
-    
-    # Create colormap
+# Color scale per demographic (shared by both render modes)
+colormaps = {}
+for demo in demographics_config:
     min_val = df[demo].min()
     max_val = df[demo].max()
     
@@ -82,7 +91,7 @@ for demo, (layer_name, colormap_name) in demographics_config.items():
         max_val = min(max_val, 10000)
         print(f"   📊 Capping density at 10,000 per sq mi for better visualization")
     
-    colormap = LinearColormap(
+    colormaps[demo] = LinearColormap(
         colors=['#F7FFF7', '#00AA00', '#004D00'] if demo == 'median_income' 
         else ['#F0F8FF', '#0066CC', '#00008B'] if demo == 'population'
         else ['#FDF5FF', '#7B2D9E', '#2E0854'] if demo == 'density'
@@ -90,45 +99,151 @@ for demo, (layer_name, colormap_name) in demographics_config.items():
         vmin=min_val,
         vmax=max_val
     )
+
+def tract_properties(rows, values, **constants):
+    """
+    Feature properties of every tract in rows: tooltip fields, constants
+    and the demo columns named by values (property -> demo), None where
+    missing - drawn as no data
+    """
+    properties = pd.DataFrame({
+        "geoid": rows['geoid'],
+        "city": rows.get('city', 'Unknown'),
+        "county": rows.get('county_name', 'Unknown'),
+        "state": rows.get('state_name', ''),
+        **constants,
+        **{key: rows[demo].astype(float) for key, demo in values.items()},
+    })
+    return properties.astype(object).where(properties.notna(), None).to_dict('records')
+
+def tract_layer(properties, topo=None, object_name='tracts', **kwargs):
+    """
+    One folium layer over every tract, in the configured geometry format.
+    For TopoJSON, topo may be a topology shared with other layers that
+    holds these properties as object_name. Also returns the size of the
+    TopoJSON encoded here (0 for a shared topo or GeoJSON).
+    """
+    if GEOMETRY_FORMAT == 'topojson':
+        if topo is not None:
+            return folium.TopoJson(topo, f'objects.{object_name}', **kwargs), 0
+        topo = encode_topojson(
+            topology,
+            properties,
+            ids=list(df['geoid']),
+            quantization=TOPOJSON_QUANTIZATION
+        )
+        return folium.TopoJson(topo, f'objects.{object_name}', **kwargs), len(dumps(topo))
+    feature_collection = {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "geometry": geojson[p['geoid']], "properties": p}
+            for p in properties
+        ]
+    }
+    return folium.GeoJson(feature_collection, **kwargs), 0
+
+topojson_bytes = 0
+if RENDER_MODE == 'shared':
+    print("🎨 Creating ONE shared tract layer, restyled per demographic in the browser...")
     
-    # Style function
-    def style_function(feature, colormap=colormap, demo=demo, max_val=max_val):
-        value = feature['properties']['value']
-        # Cap density values at max_val (20,000 for density)
-        if demo == 'density' and value > max_val:
-            value = max_val
-        return {
-            'fillColor': colormap(value),
-            'color': colormap(value),
-            'weight': 0.5,
-            'fillOpacity': 0.7
-        }
+    properties = tract_properties(df, {demo: demo for demo in demographics_config})
+    if VIEWPORT:
+        # Empty layer filled chunk by chunk in the browser
+        index = write_chunks(pd.DataFrame(properties), os.path.dirname(OUTPUT_FILE))
+        print(f"   🧭 {sum(len(level['chunks']) for level in index['levels'])} viewport chunks over "
+              f"{len(index['levels'])} detail levels ({index['bytes'] / 1e6:.1f} MB)")
+        print(f"   🧮 Tract attributes {index['properties_before'] / 1e6:.2f} MB → "
+              f"{index['properties_after'] / 1e6:.2f} MB as columns")
+        print(f"   📐 Coordinates {index['coordinates_before'] / 1e6:.2f} MB → "
+              f"{index['coordinates_after'] / 1e6:.2f} MB packed")
+        layer = folium.GeoJson({"type": "FeatureCollection", "features": []},
+                               name='Census tracts', show=False, control=False)
+        layer.add_to(m)
+        ViewportLoader(layer, index).add_to(m)
+    else:
+        layer, topojson_bytes = tract_layer(properties, name='Census tracts', show=False, control=False)
+        layer.add_to(m)
+    if RENDERER == 'webgl':
+        WebGLPolygons().add_to(layer)
     
-    # Tooltip function
-    def highlight_function(feature):
-        return {
-            'fillColor': '#ffff00',
-            'color': '#000000',
-            'weight': 2,
-            'fillOpacity': 0.9
-        }
+    MetricSwitcher(
+        layer,
+        [metric_spec(demo, layer_name, colormaps[demo],
+                     fmt='currency' if demo in ('median_income', 'median_home_value') else 'number')
+         for demo, (layer_name, _) in demographics_config.items()],
+        tooltip_fields=[('city', 'City:'), ('geoid', 'Tract:')],
+        base_style={'weight': 0.5, 'fillOpacity': 0.7},
+        title='Census Tract Demographics'
+    ).add_to(m)
+    print(f"   ✅ {len(properties)} tracts × {len(demographics_config)} demographics in one layer")
+else:
+    print("🎨 Creating heat map layers using FeatureCollection...")
     
-    # Add to map as single GeoJson layer
-    layer = folium.FeatureGroup(name=layer_name, show=False)
+    demo_properties = {}
+    for demo in demographics_config:
+        demo_properties[demo] = tract_properties(df, {'value': demo}, demo=demo)
     
-    folium.GeoJson(
-        feature_collection,
-        style_function=style_function,
-        highlight_function=highlight_function,
-        tooltip=folium.GeoJsonTooltip(
+    shared_topo = None
+    if GEOMETRY_FORMAT == 'topojson':
+        # One object per demographic over a single shared arc set
+        shared_topo = encode_topojson_objects(
+            topology,
+            demo_properties,
+            ids=list(df['geoid']),
+            quantization=TOPOJSON_QUANTIZATION
+        )
+        topojson_bytes = len(dumps(shared_topo))
+    
+    for demo, (layer_name, colormap_name) in demographics_config.items():
+        colormap, max_val = colormaps[demo], colormaps[demo].vmax
+        properties = demo_properties[demo]
+        
+        # Style function
+        def style_function(feature, colormap=colormap, demo=demo, max_val=max_val):
+            value = feature['properties']['value']
+            if value is None:
+                color = NO_DATA_COLOR
+            else:
+                # Cap density values at max_val (10,000 for density)
+                if demo == 'density' and value > max_val:
+                    value = max_val
+                color = colormap(value)
+            return {
+                'fillColor': color,
+                'color': color,
+                'weight': 0.5,
+                'fillOpacity': 0.7
+            }
+        
+        # Tooltip function
+        def highlight_function(feature):
+            return {
+                'fillColor': '#ffff00',
+                'color': '#000000',
+                'weight': 2,
+                'fillOpacity': 0.9
+            }
+        
+        # Add to map as single GeoJson layer
+        layer = folium.FeatureGroup(name=layer_name, show=False)
+        
+        tooltip = folium.GeoJsonTooltip(
             fields=['city', 'geoid', 'value'],
             aliases=['City:', 'Tract:', f'{layer_name}:'],
             localize=True
         )
-    ).add_to(layer)
-    
-    layer.add_to(m)
-    print(f"   ✅ {layer_name}: {len(features)} tracts")
+        kwargs = {} if GEOMETRY_FORMAT == 'topojson' else {'highlight_function': highlight_function}
+        geo_layer, _ = tract_layer(properties, topo=shared_topo, object_name=demo,
+                                   style_function=style_function, tooltip=tooltip, **kwargs)
+        geo_layer.add_to(layer)
+        if RENDERER == 'webgl':
+            WebGLPolygons().add_to(geo_layer)
+        
+        layer.add_to(m)
+        print(f"   ✅ {layer_name}: {len(properties)} tracts")
+
+if GEOMETRY_FORMAT == 'topojson' and not VIEWPORT:
+    print(f"   📦 TopoJSON payload: {topojson_bytes / 1e6:.1f} MB")
 
 # Business locations
 current_locations = [
@@ -247,7 +362,7 @@ title_html = '''
 
 m.get_root().html.add_child(folium.Element(title_html))
 
-m.save('/workspace/search-map.html')
+save_map(m, OUTPUT_FILE)
 
 print("\n✅ Census tract map saved with FeatureCollection approach!")
 print("=" * 70)
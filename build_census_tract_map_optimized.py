@@ -4,16 +4,21 @@ Build OPTIMIZED census tract demographic map with simplified geometries
 """
 
 import folium
+import numpy as np
 import pandas as pd
-import json
-from shapely.geometry import shape, mapping
-from shapely import simplify
+import shapely
+from shapely.geometry import mapping
+from geometry_validation import ensure_valid, format_report, load_valid
+from map_client import WebGLPolygons, batched_layer, renderer_option, save_map
+from stage_io import read_stage
+from topo_simplify import load_level
+from tract_summary import load_summary
 
 print("🗺️  Building OPTIMIZED census tract map...")
 print("=" * 70)
 
 # Load data
-df = pd.read_csv('/workspace/census_tract_demographics.csv', dtype={'geoid': str})
+df = read_stage('/workspace/census_tract_demographics', dtype={'geoid': str})
 print(f"📊 Loaded {len(df)} census tracts")
 
 # Clean problematic values
@@ -26,42 +31,50 @@ df = df[df['median_home_value'] > 10000]
 
 print(f"📊 After cleaning: {len(df)} census tracts")
 
+# Geometry is parsed and repaired once by the validation stage (cached)
+print(f"🩺 Geometry: {format_report(ensure_valid('/workspace/census_tract_demographics'))}")
+
 # Simplify geometries to reduce file size
-print("🔧 Using ORIGINAL geometries - NO SIMPLIFICATION for PERFECT detail...")
-processed_count = 0
-total_points = 0
-for idx, row in df.iterrows():
-    if pd.notna(row['geometry']):
-        try:
-            geom = shape(json.loads(row['geometry']))
-            # NO SIMPLIFICATION - Use original geometry for PERFECT detail
-            # With 4 layers, we can fit full geometry under 100MB
-            # Keep original geometry as-is
-            processed_count += 1
-            if geom.geom_type == 'Polygon':
-                total_points += len(geom.exterior.coords)
-        except:
-            pass
+# Shared boundaries are simplified once per arc (topo_simplify), so neighboring
+# tracts stay gap-free. None keeps the original (repaired) geometry.
+SIMPLIFY_ZOOM = 12
+print("🔧 Simplifying geometries with shared-boundary topology...")
+# Point counts come from the precomputed tract summary - no geometry parsing here
+summary = load_summary('/workspace/census_tract_demographics', columns=['geoid', 'vertex_count'])
+vertex_counts = df[['geoid']].merge(summary, on='geoid')['vertex_count']
+processed_count = len(vertex_counts)
+original_points = int(vertex_counts.sum())
+
+if SIMPLIFY_ZOOM is not None:
+    geometry = load_level('/workspace/census_tract_demographics', SIMPLIFY_ZOOM)
+else:
+    geometry = load_valid('/workspace/census_tract_demographics', columns=['geoid', 'geometry'])
+df = df.drop(columns='geometry').merge(geometry, on='geoid')
+total_points = int(shapely.get_num_coordinates(df['geometry'].to_numpy()).sum())
+geojson = {geoid: mapping(geom) for geoid, geom in zip(df['geoid'], df['geometry'])}
 
 avg_points = total_points / processed_count if processed_count > 0 else 0
-print(f"   ✅ Using {processed_count} original geometries")
-print(f"   ✅ Average {avg_points:.0f} points per tract (PERFECT DETAIL - 100%)")
+print(f"   ✅ Using {processed_count} geometries (level for zoom {SIMPLIFY_ZOOM or 'original'})")
+print(f"   ✅ Average {avg_points:.0f} points per tract "
+      f"({total_points / original_points:.0%} of original vertices)")
+
+# Leaflet renderer (--renderer svg|canvas|webgl) - canvas and WebGL skip
+# the DOM node per tract path that makes panning sluggish
+RENDERER = renderer_option()
 
 # Create map centered on the region
-m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron', control_scale=True)
-
-# Color interpolation function
-def interpolate_color(val, c_low, c_high):
-    r_low = int(c_low[1:3], 16)
-    g_low = int(c_low[3:5], 16)
-    b_low = int(c_low[5:7], 16)
-    r_high = int(c_high[1:3], 16)
-    g_high = int(c_high[3:5], 16)
-    b_high = int(c_high[5:7], 16)
-    r = int(r_low + (r_high - r_low) * val)
-    g = int(g_low + (g_high - g_low) * val)
-    b = int(b_low + (b_high - b_low) * val)
-    return f'#{r:02x}{g:02x}{b:02x}'
+m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron', control_scale=True,
+               prefer_canvas=RENDERER == 'canvas')
+
+# Two hex digits per channel value
+HEX = np.array([f'{i:02x}' for i in range(256)], dtype=object)
+
+# Color interpolation for a whole column of 0-1 values at once
+def interpolate_colors(values, c_low, c_high):
+    low = np.array([int(c_low[i:i + 2], 16) for i in (1, 3, 5)])
+    high = np.array([int(c_high[i:i + 2], 16) for i in (1, 3, 5)])
+    rgb = (low + (high - low) * np.asarray(values, dtype=float)[:, None]).astype(int)
+    return '#' + HEX[rgb[:, 0]] + HEX[rgb[:, 1]] + HEX[rgb[:, 2]]
 
 # Demographics with EXTREME contrast (Age & Housing REMOVED for MAXIMUM geometric detail)
 demographics_config = {
@@ -71,6 +84,11 @@ demographics_config = {
     'median_home_value': ('🏡 Median Home Value', '#FFFFF0', '#006400')
 }
 
+STATE_ABBREV = {'New Jersey': 'NJ', 'Delaware': 'DE', 'Pennsylvania': 'PA'}
+
+# Tooltip value format per demo type (default: whole number)
+VALUE_FORMATS = {'median_income': '${:,.0f}', 'median_home_value': '${:,.0f}', 'median_age': '{:.1f} yrs', 'density': '{:,.0f}/mi²'}
+
 demo_layers = {}
 
 print("🎨 Creating optimized heat map layers...")
@@ -78,47 +96,29 @@ for demo, (layer_name, color_low, color_high) in demographics_config.items():
     layer = folium.FeatureGroup(name=layer_name, show=False)
     min_val, max_val = df[demo].min(), df[demo].max()
     
-    count = 0
-    for idx, row in df.iterrows():
-        if pd.notna(row['geometry']) and pd.notna(row[demo]):
-            norm = (row[demo] - min_val) / (max_val - min_val)
-            color = interpolate_color(norm, color_low, color_high)
-            
-            try:
-                geometry_data = json.loads(row['geometry'])
-                
-                # Create census tract name
-                tract_name = f"Tract {row['geoid'][-6:]}"
-                county_name = row.get('county_name', 'Unknown')
-                state_abbrev = {'New Jersey': 'NJ', 'Delaware': 'DE', 'Pennsylvania': 'PA'}.get(row.get('state_name', ''), '')
-                
-                # Format tooltip based on demo type
-                if demo == 'median_income':
-                    tooltip_text = f"<b>{county_name} County, {state_abbrev}</b><br>{tract_name}<br>{layer_name}: ${row[demo]:,.0f}"
-                elif demo == 'median_home_value':
-                    tooltip_text = f"<b>{county_name} County, {state_abbrev}</b><br>{tract_name}<br>{layer_name}: ${row[demo]:,.0f}"
-                elif demo == 'median_age':
-                    tooltip_text = f"<b>{county_name} County, {state_abbrev}</b><br>{tract_name}<br>{layer_name}: {row[demo]:.1f} yrs"
-                elif demo == 'density':
-                    tooltip_text = f"<b>{county_name} County, {state_abbrev}</b><br>{tract_name}<br>{layer_name}: {row[demo]:,.0f}/mi²"
-                else:
-                    tooltip_text = f"<b>{county_name} County, {state_abbrev}</b><br>{tract_name}<br>{layer_name}: {row[demo]:,.0f}"
-                
-                # Add filled polygon (simplified GeoJSON)
-                folium.GeoJson(
-                    geometry_data,
-                    style_function=lambda x, color=color: {
-                        'fillColor': color,
-                        'color': color,
-                        'weight': 0.3,  # Thinner borders
-                        'fillOpacity': 0.7
-                    },
-                    tooltip=tooltip_text
-                ).add_to(layer)
-                
-                count += 1
-            except Exception as e:
-                pass
+    rows = df[df[demo].notna()]
+    norm = (rows[demo] - min_val) / (max_val - min_val)
+    
+    # Census tract name, county/state header and value formatted for the demo type
+    state = rows['state_name'].map(STATE_ABBREV).fillna('')
+    tooltips = ("<b>" + rows['county_name'].fillna('Unknown') + " County, " + state + "</b><br>"
+                + "Tract " + rows['geoid'].str[-6:] + "<br>"
+                + f"{layer_name}: " + rows[demo].map(VALUE_FORMATS.get(demo, '{:,.0f}').format))
+    properties = pd.DataFrame({
+        'color': interpolate_colors(norm, color_low, color_high),
+        'tooltip': tooltips.to_numpy()
+    })
+    
+    # All tracts of this demographic in ONE GeoJson layer
+    tracts = batched_layer(
+        [geojson[geoid] for geoid in rows['geoid']],
+        properties,
+        style={'weight': 0.3, 'fillOpacity': 0.7},  # Thinner borders
+        tooltip='tooltip'
+    ).add_to(layer)
+    if RENDERER == 'webgl':
+        WebGLPolygons().add_to(tracts)
+    count = len(rows)
     
     demo_layers[demo] = layer
     print(f"   ✅ {layer_name}: {count} tracts")
@@ -292,7 +292,7 @@ legend_html = '''
 m.get_root().html.add_child(folium.Element(title_html))
 m.get_root().html.add_child(folium.Element(legend_html))
 
-m.save('/workspace/search-map.html')
+save_map(m, '/workspace/search-map.html')
 
 print("\n✅ OPTIMIZED census tract map saved!")
 print("=" * 70)
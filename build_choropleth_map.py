@@ -4,15 +4,17 @@ Build proper choropleth map with ZIP code boundaries filled by demographics
 """
 
 import folium
-import pandas as pd
+from shapely.geometry import mapping
+from map_client import WebGLPolygons, renderer_option, save_map
+from stage_io import read_stage
+from zip_tessellation import attach_cells
 import requests
-import json
 
 print("🗺️  Building CHOROPLETH map (filled zip code areas)...")
 print("=" * 70)
 
 # Read demographic data
-df = pd.read_csv('/workspace/complete_demographic_data.csv', dtype={'zip_code': str})
+df = read_stage('/workspace/complete_demographic_data', dtype={'zip_code': str})
 print(f"📊 Loaded {len(df)} zip codes with demographics")
 
 # Download US ZIP code boundaries GeoJSON
@@ -37,42 +39,33 @@ except Exception as e:
 
 if not all_zip_geojson:
     print("⚠️  Using alternative method...")
-    # Create simple polygon approximations around each zip center
+    # Draw each ZIP as the Voronoi cell of its center instead
     # This is a fallback if we can't get real boundaries
     
 # Create base map
 center_lat = 40.1
 center_lon = -74.9
 
+# Leaflet renderer (--renderer svg|canvas|webgl) - canvas and WebGL skip
+# the DOM node per ZIP cell that makes panning sluggish
+RENDERER = renderer_option()
+
 m = folium.Map(
     location=[center_lat, center_lon],
     zoom_start=9,
     tiles='cartodbpositron',
-    control_scale=True
+    control_scale=True,
+    prefer_canvas=RENDERER == 'canvas'
 )
 
 print("🎨 Creating choropleth layers...")
 
 # We'll need to create custom GeoJSON features for each demographic
-# Since we may not have full boundaries, let's create approximate rectangular areas
-
-# Function to create a small polygon around each zip code center
-def create_zip_polygon(lat, lon, size=0.02):
-    """Create a small rectangle around the zip center"""
-    return {
-        "type": "Feature",
-        "properties": {},
-        "geometry": {
-            "type": "Polygon",
-            "coordinates": [[
-                [lon - size, lat - size],
-                [lon + size, lat - size],
-                [lon + size, lat + size],
-                [lon - size, lat + size],
-                [lon - size, lat - size]
-            ]]
-        }
-    }
+# Since we may not have full boundaries, use non-overlapping Voronoi cells,
+# one per ZIP centroid (zip_tessellation.py)
+zips = attach_cells(df)
+zips['cell'] = [mapping(geom) for geom in zips['geometry']]
+print(f"   🔷 {len(zips)} ZIP cells")
 
 # Create GeoJSON for each demographic layer
 demographics = ['population', 'density', 'median_income', 'median_age', 'housing_units']
@@ -88,8 +81,8 @@ color_map = {
 
 for demo in demographics:
     features = []
-    for idx, row in df.iterrows():
-        poly = create_zip_polygon(row['lat'], row['lon'], size=0.015)
+    for idx, row in zips.iterrows():
+        poly = {"type": "Feature", "properties": {}, "geometry": row['cell']}
         poly['properties'] = {
             'zip_code': row['zip_code'],
             'value': row[demo],
@@ -125,7 +118,7 @@ for demo, geojson_data in geojson_layers.items():
     layer = layer_map[demo]
     
     # Add each feature with its color
-    folium.GeoJson(
+    cells = folium.GeoJson(
         geojson_data,
         style_function=lambda feature: {
             'fillColor': feature['properties']['color'],
@@ -139,6 +132,8 @@ for demo, geojson_data in geojson_layers.items():
             localize=True
         )
     ).add_to(layer)
+    if RENDERER == 'webgl':
+        WebGLPolygons().add_to(cells)
 
 print("   ✅ Added filled polygon choropleth layers")
 
@@ -275,11 +270,11 @@ m.get_root().html.add_child(folium.Element(legend_html))
 
 # Save
 output_file = '/workspace/interactive-map-choropleth.html'
-m.save(output_file)
+save_map(m, output_file)
 
 print(f"\n✅ Choropleth map saved to: {output_file}")
 print(f"\n📋 Map features:")
-print(f"   • {len(df)} ZIP CODES as FILLED POLYGONS (heat map)")
+print(f"   • {len(zips)} ZIP CODES as FILLED VORONOI CELLS (heat map)")
 print(f"   • Color-coded by demographic value")
 print(f"   • 14 current location MARKERS (green)")
 print(f"   • 9 prospect location MARKERS (blue)")
@@ -6,6 +6,7 @@ Build enhanced interactive map with demographic overlays
 import folium
 from folium import plugins
 import pandas as pd
+from map_client import renderer_option, save_map
 
 print("🗺️  Building enhanced interactive map with demographic overlays...")
 print("=" * 70)
@@ -22,13 +23,18 @@ print("📍 Reading existing location data...")
 center_lat = 40.1
 center_lon = -74.9
 
+# Leaflet renderer (--renderer svg|canvas) - canvas draws the ZIP circles
+# without one DOM node each
+RENDERER = renderer_option()
+
 # Create the base map
 print("🗺️  Creating base map...")
 m = folium.Map(
     location=[center_lat, center_lon],
     zoom_start=9,
     tiles='cartodbpositron',
-    control_scale=True
+    control_scale=True,
+    prefer_canvas=RENDERER == 'canvas'
 )
 
 print("🎨 Creating demographic overlay layers...")
@@ -173,7 +179,7 @@ m.get_root().html.add_child(folium.Element(legend_html))
 
 # Save the map
 output_file = '/workspace/interactive-map-demographics.html'
-m.save(output_file)
+save_map(m, output_file)
 
 print(f"\n✅ Enhanced map saved to: {output_file}")
 print("\n📊 Map Features:")
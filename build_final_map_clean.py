@@ -5,6 +5,7 @@ Final clean build - markers on top, extreme contrast
 
 import folium
 import pandas as pd
+from map_client import renderer_option, save_map
 
 print("🗺️  Building final map with extreme contrast + markers on top...")
 print("=" * 70)
@@ -13,7 +14,12 @@ df = pd.read_csv('/workspace/complete_demographic_all_nj_zips.csv', dtype={'zip_
 print(f"📊 Loaded {len(df)} zip codes")
 
 # Create map
-m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron', control_scale=True)
+# Leaflet renderer (--renderer svg|canvas) - canvas draws the ZIP circles
+# without one DOM node each
+RENDERER = renderer_option()
+
+m = folium.Map(location=[40.1, -74.9], zoom_start=9, tiles='cartodbpositron', control_scale=True,
+               prefer_canvas=RENDERER == 'canvas')
 
 # Color interpolation function
 def interpolate_color(val, c_low, c_high):
@@ -267,7 +273,7 @@ legend_html = '''
 m.get_root().html.add_child(folium.Element(title_html))
 m.get_root().html.add_child(folium.Element(legend_html))
 
-m.save('/workspace/interactive-map-final-clean.html')
+save_map(m, '/workspace/interactive-map-final-clean.html')
 
 print("\n✅ Map saved with:")
 print("   • Heat maps underneath")
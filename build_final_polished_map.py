@@ -4,13 +4,23 @@ Final polished map with city names, county boundary, and bold markers
 """
 
 import folium
-import pandas as pd
+from shapely.geometry import mapping
+
+from dataset_store import load_zips
+from dissolve import county_outline
+from zip_tessellation import attach_cells
+from map_client import WebGLPolygons, client_format, renderer_option, save_map
+
+# Partition filters - None means every state/county in the store
+STATES = None
+COUNTIES = None
+BBOX = None
 
 print("🎨 Building FINAL POLISHED map...")
 print("=" * 70)
 
 # Read demographic data
-df = pd.read_csv('/workspace/complete_demographic_data.csv', dtype={'zip_code': str})
+df = load_zips(states=STATES, counties=COUNTIES, bbox=BBOX)
 print(f"📊 Loaded {len(df)} zip codes")
 
 # Enhanced color function (same as before)
@@ -121,30 +131,24 @@ for col, scheme in [('population', 'population'), ('median_income', 'income'),
 center_lat = 40.1
 center_lon = -74.9
 
+# Leaflet renderer (--renderer svg|canvas|webgl) - canvas and WebGL skip
+# the DOM node per ZIP cell that makes panning sluggish
+RENDERER = renderer_option()
+
 m = folium.Map(
     location=[center_lat, center_lon],
     zoom_start=9,
     tiles='cartodbpositron',
-    control_scale=True
+    control_scale=True,
+    prefer_canvas=RENDERER == 'canvas'
 )
 
 print("🗺️  Creating choropleth layers with CITY NAMES...")
 
-def create_large_polygon(lat, lon, size=0.04):
-    return {
-        "type": "Feature",
-        "properties": {},
-        "geometry": {
-            "type": "Polygon",
-            "coordinates": [[
-                [lon - size, lat - size],
-                [lon + size, lat - size],
-                [lon + size, lat + size],
-                [lon - size, lat + size],
-                [lon - size, lat - size]
-            ]]
-        }
-    }
+# Non-overlapping Voronoi cells, one per ZIP centroid (zip_tessellation.py)
+zips = attach_cells(df)
+zips['cell'] = [mapping(geom) for geom in zips['geometry']]
+print(f"   🔷 {len(zips)} ZIP cells")
 
 demographics = {
     'population': ('📊 Population', 'pop_color'),
@@ -158,19 +162,13 @@ layers = {}
 
 for demo, (layer_name, color_col) in demographics.items():
     features = []
-    for idx, row in df.iterrows():
-        poly = create_large_polygon(row['lat'], row['lon'], size=0.04)
-        
-        # Format value for display
-        if demo == 'median_income':
-            value_display = f"${row[demo]:,.0f}"
-        else:
-            value_display = f"{row[demo]:,.0f}"
+    for idx, row in zips.iterrows():
+        poly = {"type": "Feature", "properties": {}, "geometry": row['cell']}
         
         poly['properties'] = {
             'zip_code': row['zip_code'],
             'city': row.get('city', 'Unknown'),  # CITY NAME
-            'value': value_display,
+            'value': row[demo],  # formatted in the page
             'color': row[color_col]
         }
         features.append(poly)
@@ -182,7 +180,7 @@ for demo, (layer_name, color_col) in demographics.items():
     
     layer = folium.FeatureGroup(name=layer_name, show=False)
     
-    folium.GeoJson(
+    cells = folium.GeoJson(
         geojson_data,
         style_function=lambda feature: {
             'fillColor': feature['properties']['color'],
@@ -196,6 +194,9 @@ for demo, (layer_name, color_col) in demographics.items():
             localize=True
         )
     ).add_to(layer)
+    client_format(cells, value='currency' if demo == 'median_income' else 'number')
+    if RENDERER == 'webgl':
+        WebGLPolygons().add_to(cells)
     
     layers[demo] = layer
 
@@ -204,23 +205,20 @@ print("   ✅ All layers created with city names in tooltips")
 # Add PHILADELPHIA COUNTY BOUNDARY
 print("📍 Adding Philadelphia County boundary...")
 
-# Philadelphia County approximate boundary
-philly_boundary = [
-    [40.1379, -75.2803],  # Northeast
-    [40.1379, -74.9559],  # Southeast  
-    [39.8670, -74.9559],  # Southwest
-    [39.8670, -75.2803],  # Northwest
-    [40.1379, -75.2803]   # Close polygon
-]
+# Dissolved from the Philadelphia tracts (cached per grouping by dissolve.py)
+philly_boundary = county_outline('Philadelphia', state='Pennsylvania')
 
 # Add county boundary as a distinct layer
 county_layer = folium.FeatureGroup(name='📍 Philadelphia County Line', show=True)
 
-folium.PolyLine(
-    locations=philly_boundary,
-    color='#FF0000',  # Bright red
-    weight=3,
-    opacity=0.9,
+folium.GeoJson(
+    mapping(philly_boundary),
+    style_function=lambda feature: {
+        'color': '#FF0000',  # Bright red
+        'weight': 3,
+        'opacity': 0.9,
+        'fill': False
+    },
     popup='Philadelphia County Boundary',
     tooltip='Philadelphia County'
 ).add_to(county_layer)
@@ -372,7 +370,7 @@ m.get_root().html.add_child(folium.Element(legend_html))
 
 # Save
 output_file = '/workspace/interactive-map-final.html'
-m.save(output_file)
+save_map(m, output_file)
 
 print(f"\n✅ FINAL POLISHED map saved: {output_file}")
 print(f"\n🎨 FINAL TOUCHES:")
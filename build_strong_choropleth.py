@@ -4,14 +4,17 @@ Build STRONG choropleth map with better colors and larger coverage
 """
 
 import folium
-import pandas as pd
+from shapely.geometry import mapping
+from stage_io import read_stage
+from zip_tessellation import attach_cells
 import numpy as np
+from map_client import WebGLPolygons, client_format, renderer_option, save_map
 
 print("🗺️  Building ENHANCED choropleth with strong visual contrast...")
 print("=" * 70)
 
 # Read demographic data
-df = pd.read_csv('/workspace/complete_demographic_data.csv', dtype={'zip_code': str})
+df = read_stage('/workspace/complete_demographic_data', dtype={'zip_code': str})
 print(f"📊 Loaded {len(df)} zip codes")
 
 # IMPROVED COLOR FUNCTIONS with much better contrast
@@ -160,32 +163,24 @@ for col, scheme in [('population', 'population'), ('median_income', 'income'),
 center_lat = 40.1
 center_lon = -74.9
 
+# Leaflet renderer (--renderer svg|canvas|webgl) - canvas and WebGL skip
+# the DOM node per ZIP cell that makes panning sluggish
+RENDERER = renderer_option()
+
 m = folium.Map(
     location=[center_lat, center_lon],
     zoom_start=9,
     tiles='cartodbpositron',
-    control_scale=True
+    control_scale=True,
+    prefer_canvas=RENDERER == 'canvas'
 )
 
-print("\n🗺️  Creating LARGER polygons for better coverage...")
+print("\n🗺️  Creating ZIP cells for full, non-overlapping coverage...")
 
-# LARGER polygon size - much better coverage
-def create_large_polygon(lat, lon, size=0.04):
-    """Create a LARGER polygon around zip center for better fill"""
-    return {
-        "type": "Feature",
-        "properties": {},
-        "geometry": {
-            "type": "Polygon",
-            "coordinates": [[
-                [lon - size, lat - size],
-                [lon + size, lat - size],
-                [lon + size, lat + size],
-                [lon - size, lat + size],
-                [lon - size, lat - size]
-            ]]
-        }
-    }
+# Non-overlapping Voronoi cells, one per ZIP centroid (zip_tessellation.py)
+zips = attach_cells(df)
+zips['cell'] = [mapping(geom) for geom in zips['geometry']]
+print(f"   🔷 {len(zips)} ZIP cells")
 
 # Create GeoJSON layers
 demographics = {
@@ -202,11 +197,11 @@ for demo, (layer_name, color_col) in demographics.items():
     print(f"   Building {layer_name}...")
     
     features = []
-    for idx, row in df.iterrows():
-        poly = create_large_polygon(row['lat'], row['lon'], size=0.04)  # MUCH LARGER
+    for idx, row in zips.iterrows():
+        poly = {"type": "Feature", "properties": {}, "geometry": row['cell']}
         poly['properties'] = {
             'zip_code': row['zip_code'],
-            'value': f"{row[demo]:,.0f}",
+            'value': row[demo],  # formatted in the page
             'color': row[color_col]
         }
         features.append(poly)
@@ -218,7 +213,7 @@ for demo, (layer_name, color_col) in demographics.items():
     
     layer = folium.FeatureGroup(name=layer_name, show=False)
     
-    folium.GeoJson(
+    cells = folium.GeoJson(
         geojson_data,
         style_function=lambda feature: {
             'fillColor': feature['properties']['color'],
@@ -232,6 +227,9 @@ for demo, (layer_name, color_col) in demographics.items():
             localize=True
         )
     ).add_to(layer)
+    client_format(cells, value='number')
+    if RENDERER == 'webgl':
+        WebGLPolygons().add_to(cells)
     
     layers[demo] = layer
 
@@ -363,11 +361,11 @@ m.get_root().html.add_child(folium.Element(legend_html))
 
 # Save
 output_file = '/workspace/interactive-map-enhanced.html'
-m.save(output_file)
+save_map(m, output_file)
 
 print(f"\n✅ Enhanced choropleth map saved: {output_file}")
 print(f"\n🎨 IMPROVEMENTS:")
-print(f"   • 2.7x LARGER polygons (0.04 vs 0.015)")
+print(f"   • Voronoi ZIP cells - full coverage, no overlaps")
 print(f"   • STRONGER color gradients with 3-tier contrast")
 print(f"   • 75% opacity for vibrant colors")
 print(f"   • Enhanced legend with gradient bars")
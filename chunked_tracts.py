@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory chunked tract processing
+
+Reads tract rows in fixed-size batches (memory-mapped Arrow record batches,
+or CSV chunks), parses and processes geometry per batch with vectorized
+shapely, and streams GeoJSON features straight to disk. Only one batch of
+rows and geometries is alive at a time, so peak memory depends on the
+batch size rather than on how many tracts the input holds.
+
+build_census_tract_map.py --chunked streams its page from these batches;
+run as a script, this exports the tracts of a stage as one GeoJSON file.
+"""
+
+import json
+import math
+import os
+
+import pandas as pd
+import pyarrow as pa
+import shapely
+
+from dataset_store import STORE_ROOT, normalize_state, read_manifest, select_partitions
+from stage_io import ARROW_EXT, stage_path
+
+BATCH_ROWS = 2000
+
+TRACT_PROPERTIES = ['geoid', 'city', 'county_name', 'state_name']
+TRACT_METRICS = ['population', 'median_income', 'median_age', 'housing_units',
+                 'median_home_value', 'density']
+
+
+def iter_tract_batches(path, batch_size=BATCH_ROWS, columns=None, dtype=None):
+    """
+    Yield DataFrames of at most batch_size rows from a stage file.
+
+    Arrow files are read one record batch at a time through a plain file
+    handle (a memory map would keep every touched page resident) and sliced
+    to batch_size. CSV files are read with a chunked parser.
+    """
+    stem = stage_path(path)
+    if os.path.exists(stem + ARROW_EXT):
+        with pa.OSFile(stem + ARROW_EXT, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                for start in range(0, batch.num_rows, batch_size):
+                    yield batch.slice(start, batch_size).to_pandas()
+    else:
+        dtype = dtype or {'geoid': str}
+        yield from pd.read_csv(stem + '.csv', chunksize=batch_size, usecols=columns, dtype=dtype)
+
+
+def iter_store_batches(states=None, counties=None, batch_size=BATCH_ROWS, columns=None,
+                       root=STORE_ROOT):
+    """Yield batches from the partitioned tract store, one partition at a time"""
+    manifest = read_manifest('tracts', root=root)
+    for part in select_partitions(manifest, states, counties):
+        path = os.path.join(root, 'tracts', part['path'])
+        yield from iter_tract_batches(path, batch_size=batch_size, columns=columns)
+
+
+def process_batch(batch, simplify_tolerance=None):
+    """
+    Parse and process one batch of tracts.
+
+    Returns (geojson_strings, properties_frame) for rows with usable
+    geometry. Geometries are dropped before returning. Store partitions
+    already hold validated, grid-snapped geometry; the repair here covers
+    other sources.
+    """
+    batch = batch[batch['geometry'].notna()]
+    geoms = shapely.from_geojson(batch['geometry'].to_numpy(dtype=object), on_invalid='ignore')
+    ok = ~shapely.is_missing(geoms) & ~shapely.is_empty(geoms)
+    geoms, batch = geoms[ok], batch[ok]
+
+    invalid = ~shapely.is_valid(geoms)
+    if invalid.any():
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+    if simplify_tolerance:
+        geoms = shapely.simplify(geoms, simplify_tolerance, preserve_topology=True)
+
+    props = batch[[c for c in TRACT_PROPERTIES + TRACT_METRICS if c in batch.columns]].copy()
+    if 'state_name' in props:
+        props['state'] = props.pop('state_name').map(normalize_state)
+    if 'county_name' in props:
+        props['county'] = props.pop('county_name')
+    return shapely.to_geojson(geoms), props
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def stream_feature_collection(batches, out_path, simplify_tolerance=None):
+    """Write batches as one GeoJSON FeatureCollection without holding it in memory"""
+    count = 0
+    with open(out_path, 'w') as out:
+        out.write('{"type":"FeatureCollection","features":[')
+        for batch in batches:
+            geojson, props = process_batch(batch, simplify_tolerance)
+            records = props.to_dict('records')
+            for geom, record in zip(geojson, records):
+                out.write(',' if count else '')
+                out.write('{"type":"Feature","geometry":')
+                out.write(geom)
+                out.write(',"properties":')
+                out.write(json.dumps({k: _clean(v) for k, v in record.items()}, separators=(',', ':')))
+                out.write('}')
+                count += 1
+            del geojson, props, records
+        out.write(']}')
+    return count
+
+
+if __name__ == '__main__':
+    import resource
+    import sys
+
+    if len(sys.argv) != 3:
+        sys.exit("usage: chunked_tracts.py SOURCE OUTPUT.geojson")
+    source, output_file = sys.argv[1:]
+
+    print(f"🧩 Streaming tracts in batches of {BATCH_ROWS}...")
+    print("=" * 70)
+
+    count = stream_feature_collection(iter_tract_batches(source), output_file)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"   ✅ {count} tracts → {output_file} ({os.path.getsize(output_file)/1e6:.1f} MB)")
+    print(f"   📈 Peak RSS: {peak_mb:.0f} MB")
+    print("=" * 70)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Coordinate precision stage
+
+Tract coordinates arrive with up to 13 decimals (sub-millimeter), which is
+invisible at the zooms we render but gets serialized into every map. This
+stage snaps vertices to a configurable grid, drops the consecutive
+duplicate vertices that snapping creates, and reports the worst vertex
+displacement and the GeoJSON bytes saved. geometry_validation applies it
+to the validated geometry stage, which the store, topology levels,
+dissolves and exports all read - so no output sees raw coordinates.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+import shapely
+
+# Grid size in degrees. 1e-5° is about 1.1 m - under a pixel through zoom 16
+DEFAULT_GRID = 1e-5
+
+METERS_PER_DEGREE_LAT = 110_574
+METERS_PER_DEGREE_LON = 111_320
+
+
+def grid_decimals(grid):
+    """Decimals needed to print every multiple of grid exactly"""
+    return max(0, math.ceil(-math.log10(grid) - 1e-9))
+
+
+def snap_coordinates(coords, grid=DEFAULT_GRID):
+    """Snap an (n, 2) lon/lat array to the grid (short decimal repr)"""
+    return np.round(np.round(coords / grid) * grid, grid_decimals(grid))
+
+
+def displacement_m(coords, snapped):
+    """Per-vertex distance in meters between two lon/lat arrays"""
+    dx = (coords[:, 0] - snapped[:, 0]) * METERS_PER_DEGREE_LON * np.cos(np.radians(coords[:, 1]))
+    dy = (coords[:, 1] - snapped[:, 1]) * METERS_PER_DEGREE_LAT
+    return np.hypot(dx, dy)
+
+
+def quantize_geometries(geoms, grid=DEFAULT_GRID):
+    """
+    Snap geometries to the grid and drop consecutive duplicate vertices.
+
+    Geometries that snapping makes invalid are redone with GEOS
+    set_precision, which snaps and repairs in one step. Returns
+    (geoms, stats).
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    present = ~shapely.is_missing(geoms)
+    coords = shapely.get_coordinates(geoms[present])
+    snapped = snap_coordinates(coords, grid)
+
+    out = geoms.copy()
+    out[present] = shapely.remove_repeated_points(shapely.set_coordinates(geoms[present].copy(), snapped))
+
+    broken = present & ~shapely.is_valid(out) & shapely.is_valid(geoms)
+    if broken.any():
+        out[broken] = shapely.set_precision(geoms[broken], grid)
+
+    moved = displacement_m(coords, snapped) if len(coords) else np.zeros(1)
+    stats = {
+        'grid': grid,
+        'vertices_before': int(len(coords)),
+        'vertices_after': int(shapely.get_num_coordinates(out[present]).sum()),
+        'max_displacement_m': float(moved.max()),
+        'mean_displacement_m': float(moved.mean()),
+        'repaired': int(broken.sum()),
+    }
+    return out, stats
+
+
+def quantize_geojson(geometry, grid=DEFAULT_GRID):
+    """
+    Quantize a Series of GeoJSON geometry strings.
+
+    Returns (Series, stats) - stats adds bytes_before/bytes_after for the
+    GeoJSON text of the column.
+    """
+    text = geometry.where(geometry.notna(), None).to_numpy(dtype=object)
+    geoms = shapely.from_geojson(text, on_invalid='ignore')
+    quantized, stats = quantize_geometries(geoms, grid)
+
+    present = ~shapely.is_missing(quantized)
+    out = np.full(len(text), None, dtype=object)
+    out[present] = shapely.to_geojson(quantized[present])
+    # Compare compact serializations so only the precision change is counted
+    stats['bytes_before'] = int(sum(len(t) for t in shapely.to_geojson(geoms[~shapely.is_missing(geoms)])))
+    stats['bytes_after'] = int(sum(len(t) for t in out[present]))
+    return pd.Series(out, index=geometry.index, name=geometry.name), stats
+
+
+def format_report(stats):
+    saved = stats['bytes_before'] - stats['bytes_after']
+    return (f"grid {stats['grid']:g}°: max shift {stats['max_displacement_m']:.2f} m "
+            f"(mean {stats['mean_displacement_m']:.2f} m), "
+            f"{stats['vertices_before'] - stats['vertices_after']:,} duplicate vertices dropped, "
+            f"{stats['repaired']} repaired, "
+            f"{stats['bytes_before'] / 1e6:.2f} → {stats['bytes_after'] / 1e6:.2f} MB "
+            f"(-{saved / max(stats['bytes_before'], 1):.0%})")
+
+
+if __name__ == '__main__':
+    import sys
+
+    from stage_io import read_stage
+
+    source = sys.argv[1] if len(sys.argv) > 1 else '/workspace/complete_census_all_nj_with_cities'
+
+    print("🎯 Coordinate precision report...")
+    print("=" * 70)
+
+    df = read_stage(source, columns=['geometry'], zero_copy=False)
+    for grid in [1e-4, 1e-5, 1e-6]:
+        _, stats = quantize_geojson(df['geometry'], grid)
+        marker = '👉' if grid == DEFAULT_GRID else '  '
+        print(f" {marker} {format_report(stats)}")
+    print("=" * 70)
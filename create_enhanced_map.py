@@ -4,13 +4,14 @@ Create enhanced interactive map with demographic overlays
 """
 
 import pandas as pd
+from stage_io import read_stage
 import json
 
 print("🗺️  Creating enhanced interactive map with demographic overlays...")
 print("=" * 70)
 
 # Read the demographic data
-df = pd.read_csv('/workspace/demographic_data.csv', dtype={'zip_code': str})
+df = read_stage('/workspace/demographic_data', dtype={'zip_code': str})
 print(f"📊 Loaded {len(df)} zip codes with demographic data")
 
 # We need to get approximate coordinates for zip codes
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Hive-partitioned tract and ZIP stores (state=XX/county=YY) with predicate pushdown
+"""
+
+import json
+import os
+from urllib.parse import quote
+
+import pandas as pd
+import shapely
+
+from geometry_validation import ensure_valid, format_report, load_valid, validated_path
+from snapshots import record_stage, skip_if_current
+from stage_io import read_stage, stage_file, write_stage
+
+STORE_ROOT = '/workspace/store'
+MANIFEST_NAME = '_manifest.json'
+DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+STATE_ABBREV = {'New Jersey': 'NJ', 'Delaware': 'DE', 'Pennsylvania': 'PA'}
+
+# ZIP prefix ranges used when a ZIP row has no state
+ZIP_PREFIX_STATES = [
+    ('070', '089', 'NJ'),
+    ('150', '196', 'PA'),
+    ('197', '199', 'DE'),
+]
+
+
+def state_from_zip(zip_code):
+    """Infer a state abbreviation from a 5-digit ZIP code"""
+    prefix = str(zip_code).zfill(5)[:3]
+    for low, high, state in ZIP_PREFIX_STATES:
+        if low <= prefix <= high:
+            return state
+    return None
+
+
+def normalize_state(state):
+    """Accept 'New Jersey' or 'NJ' and return 'NJ'"""
+    if state is None or (isinstance(state, float) and pd.isna(state)):
+        return None
+    return STATE_ABBREV.get(state, state)
+
+
+def _as_set(value, normalize=None):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    return {normalize(v) if normalize else v for v in value}
+
+
+def _partition_dir(root, name, state, county):
+    state_key = quote(state) if state else DEFAULT_PARTITION
+    county_key = quote(county) if county else DEFAULT_PARTITION
+    return os.path.join(root, name, f'state={state_key}', f'county={county_key}')
+
+
+def geometry_bounds(geometry):
+    """Vectorized (minx, miny, maxx, maxy) for a column of GeoJSON strings"""
+    geoms = shapely.from_geojson(geometry.fillna('null').to_numpy(), on_invalid='ignore')
+    return pd.DataFrame(shapely.bounds(geoms), index=geometry.index,
+                        columns=['minx', 'miny', 'maxx', 'maxy'])
+
+
+def point_bounds(df, lat_col='lat', lon_col='lon'):
+    """Degenerate bounds for point rows"""
+    return pd.DataFrame({'minx': df[lon_col], 'miny': df[lat_col],
+                         'maxx': df[lon_col], 'maxy': df[lat_col]}, index=df.index)
+
+
+def partition_dataset(df, name, state, county, bounds, root=STORE_ROOT):
+    """
+    Write df as root/name/state=XX/county=YY/part-0.arrow and record each
+    partition's row count and bbox in root/name/_manifest.json
+    """
+    dataset_dir = os.path.join(root, name)
+    os.makedirs(dataset_dir, exist_ok=True)
+
+    keys = pd.DataFrame({'state': state.where(state.notna(), None),
+                         'county': county.where(county.notna(), None)}, index=df.index)
+    partitions = []
+    for (state_key, county_key), idx in keys.groupby(['state', 'county'], dropna=False).groups.items():
+        state_key = None if pd.isna(state_key) else state_key
+        county_key = None if pd.isna(county_key) else county_key
+        part_dir = _partition_dir(root, name, state_key, county_key)
+        os.makedirs(part_dir, exist_ok=True)
+        part_path = write_stage(df.loc[idx], os.path.join(part_dir, 'part-0'))
+
+        b = bounds.loc[idx]
+        partitions.append({
+            'state': state_key,
+            'county': county_key,
+            'path': os.path.relpath(part_path, dataset_dir),
+            'rows': int(len(idx)),
+            'bbox': [float(b['minx'].min()), float(b['miny'].min()),
+                     float(b['maxx'].max()), float(b['maxy'].max())],
+        })
+
+    partitions.sort(key=lambda p: (p['state'] or '', p['county'] or ''))
+    manifest = {'name': name, 'columns': list(df.columns), 'partitions': partitions}
+    with open(os.path.join(dataset_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def valid_tracts(source):
+    """
+    Tract table of source with its geometry replaced by the validated,
+    grid-snapped geometry (GeoJSON text, None where unusable)
+    """
+    df = read_stage(source, dtype={'geoid': str}).drop(columns='geometry')
+    valid = load_valid(source, columns=['geoid', 'geometry'])
+    valid['geometry'] = shapely.to_geojson(valid['geometry'].to_numpy())
+    return df.merge(valid, on='geoid', how='left')
+
+
+def partition_tracts(df, root=STORE_ROOT):
+    """Partition a tract table (state_name/county_name/geometry columns)"""
+    state = df['state_name'].map(normalize_state)
+    return partition_dataset(df, 'tracts', state, df['county_name'],
+                             geometry_bounds(df['geometry']), root=root)
+
+
+def partition_zips(df, root=STORE_ROOT):
+    """Partition a ZIP table (zip_code/state/county/lat/lon columns)"""
+    state = df['state'].map(normalize_state)
+    state = state.fillna(df['zip_code'].map(state_from_zip))
+    return partition_dataset(df, 'zips', state, df['county'], point_bounds(df), root=root)
+
+
+def read_manifest(name, root=STORE_ROOT):
+    manifest_path = os.path.join(root, name, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(
+            f"No partitioned '{name}' store at {manifest_path} - run dataset_store.py first")
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def _bbox_intersects(a, b):
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+
+def _bbox_contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def select_partitions(manifest, states=None, counties=None, bbox=None):
+    """Prune partitions using only the manifest - no data files are opened"""
+    states = _as_set(states, normalize_state)
+    counties = _as_set(counties)
+    selected = []
+    for part in manifest['partitions']:
+        if states is not None and part['state'] not in states:
+            continue
+        if counties is not None and part['county'] not in counties:
+            continue
+        if bbox is not None and not _bbox_intersects(bbox, part['bbox']):
+            continue
+        selected.append(part)
+    return selected
+
+
+def load_partitions(name, states=None, counties=None, bbox=None, columns=None,
+                    dtype=None, bounds_fn=None, bounds_columns=(), root=STORE_ROOT):
+    """
+    Read only the partitions matching the predicates.
+
+    states/counties accept a single value or a list; bbox is
+    (minx, miny, maxx, maxy) in lon/lat. Partitions that fall entirely
+    inside bbox are taken whole; partitions on its edge are filtered
+    row by row with bounds_fn, which reads bounds_columns - they are
+    loaded for the filter even when columns leaves them out.
+    """
+    manifest = read_manifest(name, root=root)
+    dataset_dir = os.path.join(root, name)
+    read_columns = columns
+    if bbox is not None and columns is not None:
+        read_columns = list(columns) + [c for c in bounds_columns if c not in columns]
+    frames = []
+    for part in select_partitions(manifest, states, counties, bbox):
+        part_df = read_stage(os.path.join(dataset_dir, part['path']),
+                             columns=read_columns, dtype=dtype)
+        if bbox is not None and bounds_fn is not None and not _bbox_contains(bbox, part['bbox']):
+            b = bounds_fn(part_df)
+            hit = (b['minx'] <= bbox[2]) & (b['maxx'] >= bbox[0]) & \
+                  (b['miny'] <= bbox[3]) & (b['maxy'] >= bbox[1])
+            part_df = part_df[hit]
+        if read_columns is not columns:
+            part_df = part_df[list(columns)]
+        frames.append(part_df)
+
+    if not frames:
+        return pd.DataFrame(columns=columns or manifest['columns'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_tracts(states=None, counties=None, bbox=None, columns=None, root=STORE_ROOT):
+    """Load census tracts from the partitioned store"""
+    return load_partitions('tracts', states, counties, bbox, columns, dtype={'geoid': str},
+                           bounds_fn=lambda d: geometry_bounds(d['geometry']),
+                           bounds_columns=['geometry'], root=root)
+
+
+def load_zips(states=None, counties=None, bbox=None, columns=None, root=STORE_ROOT):
+    """Load ZIP codes from the partitioned store"""
+    return load_partitions('zips', states, counties, bbox, columns, dtype={'zip_code': str},
+                           bounds_fn=point_bounds, bounds_columns=['lat', 'lon'], root=root)
+
+
+if __name__ == '__main__':
+    print("🗂️  Building partitioned tract and ZIP stores...")
+    print("=" * 70)
+
+    TRACT_SOURCE = '/workspace/complete_census_all_nj_with_cities'
+    report = ensure_valid(TRACT_SOURCE)
+    STAGE_INPUTS = [__file__, stage_file(TRACT_SOURCE), stage_file(validated_path(TRACT_SOURCE)),
+                    stage_file('/workspace/complete_demographic_data')]
+    skip_if_current('dataset_store', STAGE_INPUTS,
+                    outputs=[os.path.join(STORE_ROOT, name, MANIFEST_NAME) for name in ('tracts', 'zips')])
+
+    tracts = valid_tracts(TRACT_SOURCE)
+    manifest = partition_tracts(tracts)
+    print(f"📊 Tracts: {len(tracts)} rows → {len(manifest['partitions'])} partitions")
+    print(f"   🩺 {format_report(report)}")
+
+    zips = read_stage('/workspace/complete_demographic_data', dtype={'zip_code': str})
+    manifest = partition_zips(zips)
+    print(f"📍 ZIPs: {len(zips)} rows → {len(manifest['partitions'])} partitions")
+
+    record_stage('dataset_store', STAGE_INPUTS)
+    print(f"\n✅ Store written to: {STORE_ROOT}")
+    print("=" * 70)
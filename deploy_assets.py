@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Deploy step over the Vercel output directory
+
+Run after the builders (and after copying pages plus their data/ sidecars
+into public/), before `vercel --prod`:
+
+1. Fingerprints standalone assets as name.<hash>.ext and rewrites the
+   references to them in pages and JSON, so their URL changes exactly
+   when their content does.
+2. Writes maximum-level Brotli (.br) and gzip (.gz) siblings of every
+   HTML, JSON and tile artifact, for hosts that serve precompressed files
+   (nginx gzip_static/brotli_static, Caddy precompressed).
+3. Regenerates the Cache-Control rules in vercel.json. Content-hashed
+   names (fingerprinted files, data/ sidecars) are immutable for a year,
+   pages revalidate on every visit, and the tile pyramid - whose
+   {z}/{x}/{y} URLs cannot carry a hash - is cached for a day.
+
+FlatGeobuf and PMTiles are read with HTTP range requests, so they are
+fingerprinted but never precompressed.
+"""
+
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+
+import brotli
+
+PUBLIC_DIR = '/workspace/public'
+VERCEL_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vercel.json')
+
+# Renamed to name.<hash>.ext
+FINGERPRINT_EXTENSIONS = ('.fgb', '.pmtiles')
+# Get .br/.gz siblings
+COMPRESS_EXTENSIONS = ('.html', '.json', '.geojson', '.pbf', '.js', '.css')
+# Files whose text may reference a fingerprinted asset
+REFERENCE_EXTENSIONS = ('.html', '.json', '.js')
+HASH_LENGTH = 8
+FINGERPRINTED = re.compile(r'\.[0-9a-f]{%d}(\.\w+)$' % HASH_LENGTH)
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+TILES = 'public, max-age=86400, stale-while-revalidate=604800'
+
+# path-to-regexp sources; later rules override earlier ones
+CACHE_RULES = [
+    ('/(.*)', REVALIDATE),
+    ('/tiles/(.*)', TILES),
+    ('/data/(.*)', IMMUTABLE),
+    ('/(.*\\.[0-9a-f]{%d}\\.(?:%s))' % (HASH_LENGTH, '|'.join(e[1:] for e in FINGERPRINT_EXTENSIONS)), IMMUTABLE),
+]
+
+
+def walk(root, extensions):
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if name.endswith(extensions):
+                yield os.path.join(dirpath, name)
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()[:HASH_LENGTH]
+
+
+def _remove(path):
+    for p in (path, path + '.br', path + '.gz'):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def fingerprint(root=PUBLIC_DIR):
+    """
+    Rename every not-yet-fingerprinted asset to name.<hash>.ext, dropping
+    older fingerprints of the same name. Returns {plain name: new name}
+    (paths relative to root).
+    """
+    renamed = {}
+    for path in walk(root, FINGERPRINT_EXTENSIONS):
+        if FINGERPRINTED.search(path):
+            continue
+        stem, ext = os.path.splitext(path)
+        target = f'{stem}.{file_digest(path)}{ext}'
+        for old in walk(os.path.dirname(path), (ext,)):
+            if old != target and re.fullmatch(re.escape(stem) + FINGERPRINTED.pattern, old):
+                _remove(old)
+        os.replace(path, target)
+        _remove(path)
+        renamed[os.path.relpath(path, root)] = os.path.relpath(target, root)
+    return renamed
+
+
+def rewrite_references(renamed, root=PUBLIC_DIR):
+    """Point references to a plain (or older fingerprinted) name at its new name; returns files changed"""
+    if not renamed:
+        return 0
+    patterns = []
+    for plain, target in renamed.items():
+        stem, ext = os.path.splitext(plain)
+        pattern = re.compile(r'(?<![\w.-])' + re.escape(stem) + r'(?:\.[0-9a-f]{%d})?' % HASH_LENGTH + re.escape(ext))
+        patterns.append((pattern, target))
+    changed = 0
+    for path in walk(root, REFERENCE_EXTENSIONS):
+        if path.startswith(os.path.join(root, 'tiles') + os.sep):
+            continue
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        new = text
+        for pattern, target in patterns:
+            new = pattern.sub(target, new)
+        if new != text:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(new)
+            changed += 1
+    return changed
+
+
+def _compress(path):
+    """Write path.br / path.gz when missing or stale; returns (raw, br, gz) bytes"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    sizes = [len(data)]
+    mtime = os.path.getmtime(path)
+    for suffix, encode in (('.br', lambda d: brotli.compress(d, quality=11)),
+                           ('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))):
+        out = path + suffix
+        if os.path.exists(out) and os.path.getmtime(out) >= mtime:
+            sizes.append(os.path.getsize(out))
+            continue
+        encoded = encode(data)
+        if len(encoded) >= len(data):
+            # Nothing to gain - serve the original
+            if os.path.exists(out):
+                os.remove(out)
+            sizes.append(len(data))
+            continue
+        with open(out, 'wb') as f:
+            f.write(encoded)
+        sizes.append(len(encoded))
+    return sizes
+
+
+def precompress(root=PUBLIC_DIR, processes=None):
+    """Brotli + gzip siblings for every compressible file; returns {extension: [files, raw, br, gz]}"""
+    paths = list(walk(root, COMPRESS_EXTENSIONS))
+    totals = {}
+    ctx = multiprocessing.get_context('fork')
+    with ctx.Pool(processes or os.cpu_count()) as pool:
+        for path, sizes in zip(paths, pool.imap(_compress, paths, chunksize=64)):
+            entry = totals.setdefault(os.path.splitext(path)[1], [0, 0, 0, 0])
+            entry[0] += 1
+            for i, size in enumerate(sizes, 1):
+                entry[i] += size
+    return totals
+
+
+def write_cache_headers(config_path=VERCEL_CONFIG):
+    """Replace the Cache-Control rules in vercel.json, keeping every other setting and rule"""
+    with open(config_path) as f:
+        config = json.load(f)
+    rules = [rule for rule in config.get('headers', [])
+             if not any(h['key'].lower() == 'cache-control' for h in rule['headers'])]
+    rules += [{'source': source, 'headers': [{'key': 'Cache-Control', 'value': value}]}
+              for source, value in CACHE_RULES]
+    config['headers'] = rules
+    with open(config_path, 'w') as f:
+        json.dump(config, f, indent=2)
+        f.write('\n')
+    return len(CACHE_RULES)
+
+
+if __name__ == '__main__':
+    import sys
+
+    root = sys.argv[1] if len(sys.argv) > 1 else PUBLIC_DIR
+
+    print(f"🚚 Preparing {root} for deployment...")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    renamed = fingerprint(root)
+    for plain, target in renamed.items():
+        print(f"   🔖 {plain} → {target}")
+    print(f"   ✅ {len(renamed)} assets fingerprinted, references updated in {rewrite_references(renamed, root)} files")
+
+    totals = precompress(root)
+    for ext, (files, raw, br, gz) in sorted(totals.items()):
+        print(f"   🗜️  {ext:9} {files:>6,} files  {raw / 1e6:>7.1f} MB → br {br / 1e6:>6.1f} MB "
+              f"({br / raw:.0%}), gz {gz / 1e6:>6.1f} MB ({gz / raw:.0%})")
+
+    print(f"   ✅ {write_cache_headers()} Cache-Control rules → {VERCEL_CONFIG}")
+    print(f"\n✅ Done in {time.perf_counter() - start:.1f}s")
+    print("=" * 70)
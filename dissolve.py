@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Dissolve tracts into county and custom-territory outlines
+
+Unions the validated tract polygons of each group (county, sales
+territory, ZIP assignment - any column or combination of columns) with
+GEOS coverage union, which only has to drop the edges neighboring tracts
+share instead of overlaying every polygon, and sums the additive metrics
+in the same pass. Each grouping is cached as its own stage, keyed by the
+validated geometry, the source table and (for territories) the
+assignment file, so outlines are only rebuilt when one of those changes.
+"""
+
+import os
+
+import numpy as np
+import shapely
+
+from geometry_validation import load_valid, validated_path
+from snapshots import record_stage, stage_is_current
+from stage_io import read_stage, stage_file, stage_path, write_stage
+from tract_summary import ensure_summary
+
+TRACT_SOURCE = '/workspace/complete_census_all_nj_with_cities'
+
+# Counts that stay meaningful when tracts are added together
+ADDITIVE_COLUMNS = ['population', 'housing_units', 'area_sqmi']
+
+
+def _as_list(by):
+    return [by] if isinstance(by, str) else list(by)
+
+
+def _assignment_tag(assignment):
+    """Suffix that keeps dissolves over different assignment files apart"""
+    return '' if assignment is None else '_' + os.path.basename(stage_path(assignment))
+
+
+def dissolve_path(source, by, assignment=None):
+    """Dissolve stage that belongs to a tract source, grouping and (optional) assignment file"""
+    return stage_path(source) + '_dissolve_' + '_'.join(_as_list(by)) + _assignment_tag(assignment)
+
+
+def union_coverage(geoms):
+    """
+    Union polygons that tile without overlaps. Falls back to a full
+    overlay union when the tiles don't match edge for edge (GEOS either
+    raises or returns an invalid result).
+    """
+    try:
+        merged = shapely.coverage_union_all(geoms)
+    except shapely.errors.GEOSException:
+        return shapely.union_all(geoms)
+    if not shapely.is_valid(merged):
+        merged = shapely.union_all(geoms)
+    return merged
+
+
+def dissolve(df, by, sums=ADDITIVE_COLUMNS):
+    """
+    Union df['geometry'] (shapely) per group of the `by` columns and sum
+    the `sums` columns. Rows with a missing group key are left out.
+
+    Returns one row per group: the `by` columns, geometry, tract_count,
+    the summed columns and density (people per mi² of area_sqmi, water
+    included) when both population and area are summed.
+    """
+    by = _as_list(by)
+    sums = [c for c in sums if c in df.columns]
+    groups = df.groupby(by, sort=True, dropna=True)
+
+    out = groups[sums].sum(min_count=1)
+    out.insert(0, 'tract_count', groups.size())
+    geoms = df['geometry'].to_numpy()
+    indices = groups.indices
+    out.insert(0, 'geometry', [union_coverage(geoms[indices[key]]) for key in out.index])
+    if 'population' in out and 'area_sqmi' in out:
+        out['density'] = out['population'] / out['area_sqmi']
+    return out.reset_index()
+
+
+def read_assignment(path):
+    """Territory assignment table (CSV or Arrow stage), every column as text (missing stays missing)"""
+    return read_stage(path, dtype=str, zero_copy=False)
+
+
+def load_tracts(source, assignment=None):
+    """Validated tract geometry joined with the source table, the tract summary and an optional assignment"""
+    tracts = load_valid(source, columns=['geoid', 'geometry'])
+    table = read_stage(source, dtype={'geoid': str}, zero_copy=False).drop(columns='geometry')
+    table['geoid'] = table['geoid'].astype(str)
+    area = read_stage(ensure_summary(source), columns=['geoid', 'area_sqmi'], zero_copy=False)
+    df = tracts.merge(table, on='geoid', how='left').merge(area, on='geoid', how='left')
+    if assignment is not None:
+        assign = read_assignment(assignment)
+        # Join on whatever tract columns the assignment shares (geoid, county_name, ...)
+        keys = [c for c in assign.columns if c in df.columns]
+        if not keys:
+            raise ValueError(f"{assignment} shares no columns with {source}")
+        df = df.merge(assign, on=keys, how='left')
+    return df
+
+
+def ensure_dissolve(source, by, assignment=None):
+    """Build (or reuse) the dissolved outlines of source grouped by `by`; returns the stage path"""
+    by = _as_list(by)
+    inputs = [os.path.abspath(__file__), stage_file(validated_path(source)), stage_file(source)]
+    if assignment is not None:
+        inputs.append(stage_file(assignment))
+    out = dissolve_path(source, by, assignment)
+    stage = f"dissolve:{os.path.basename(stage_path(source))}:{'_'.join(by)}{_assignment_tag(assignment)}"
+    if not stage_is_current(stage, inputs, outputs=[out + '.arrow']):
+        result = dissolve(load_tracts(source, assignment), by)
+        result['geometry'] = shapely.to_wkb(result['geometry'].to_numpy())
+        write_stage(result, out)
+        record_stage(stage, inputs, outputs=[out + '.arrow'])
+    return out
+
+
+def load_dissolve(source, by, assignment=None):
+    """Dissolved outlines (shapely geometry) and summed metrics, building them on first use"""
+    df = read_stage(ensure_dissolve(source, by, assignment), zero_copy=False)
+    df['geometry'] = shapely.from_wkb(df['geometry'].to_numpy(dtype=object))
+    return df
+
+
+def county_outline(name, state=None, source=TRACT_SOURCE):
+    """Dissolved outline of one county (state_name narrows same-named counties)"""
+    counties = load_dissolve(source, ['state_name', 'county_name'])
+    match = counties['county_name'] == name
+    if state is not None:
+        match &= counties['state_name'] == state
+    if not match.any():
+        raise KeyError(f"No tracts for county {name!r}" + (f" in {state}" if state else ''))
+    return shapely.union_all(counties.loc[match, 'geometry'].to_numpy())
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    # dissolve.py [column ...] [--assignment territories.csv]
+    args = sys.argv[1:]
+    assignment = None
+    if '--assignment' in args:
+        i = args.index('--assignment')
+        assignment = args[i + 1]
+        del args[i:i + 2]
+    by = args or ['state_name', 'county_name']
+
+    print(f"🧩 Dissolving tracts by {', '.join(by)}...")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    result = load_dissolve(TRACT_SOURCE, by, assignment)
+    elapsed = time.perf_counter() - start
+    vertices = shapely.get_num_coordinates(result['geometry'].to_numpy())
+    print(f"   ✅ {len(result)} outlines from {result['tract_count'].sum():,} tracts "
+          f"in {elapsed:.2f}s → {dissolve_path(TRACT_SOURCE, by, assignment)}.arrow")
+    print(f"   📊 {vertices.sum():,} vertices, {int(np.median(vertices)):,} per outline")
+    for _, row in result.head(10).iterrows():
+        label = ' / '.join(str(row[c]) for c in by)
+        print(f"      • {label}: {row['tract_count']} tracts, "
+              f"{row['population']:,.0f} people, {row['area_sqmi']:,.0f} mi²")
+    if len(result) > 10:
+        print(f"      ... {len(result) - 10} more")
+    print("=" * 70)
@@ -7,6 +7,7 @@ import requests
 import pandas as pd
 import json
 import time
+from stage_io import write_stage
 
 print("🏛️ Fetching Census Tract Data from US Census Bureau")
 print("=" * 70)
@@ -199,9 +200,8 @@ df = df.dropna(subset=['population', 'median_income'], how='all')
 print(f"   Removed {initial_count - len(df)} tracts with missing data")
 print(f"   Final tract count: {len(df)}")
 
-# Save to CSV
-output_file = '/workspace/census_tract_demographics.csv'
-df.to_csv(output_file, index=False)
+# Save as Arrow IPC for the builders
+output_file = write_stage(df, '/workspace/census_tract_demographics')
 
 print(f"\n✅ Data saved to: {output_file}")
 print("\n📊 Summary Statistics:")
@@ -5,15 +5,21 @@ Fix zip code coordinates using pgeocode
 
 import pandas as pd
 import pgeocode
+from snapshots import skip_if_current, record_stage, snapshot
+from stage_io import read_stage, stage_file, write_stage
 
 print("🗺️  Fixing zip code coordinates with pgeocode...")
 print("=" * 70)
 
+STAGE_INPUTS = [__file__, stage_file('/workspace/demographic_data')]
+skip_if_current('fix_coords_pgeocode', STAGE_INPUTS,
+                outputs=['/workspace/demographic_data_accurate_coords.arrow'])
+
 # Initialize geocoder for US
 nomi = pgeocode.Nominatim('us')
 
 # Read demographic data
-df = pd.read_csv('/workspace/demographic_data.csv', dtype={'zip_code': str})
+df = read_stage('/workspace/demographic_data', dtype={'zip_code': str})
 print(f"📊 Loaded {len(df)} zip codes")
 
 print("📍 Geocoding zip codes...")
@@ -84,10 +90,11 @@ for col, scheme in [('population', 'blue'), ('median_income', 'green'),
     )
 
 # Save
-output_file = '/workspace/demographic_data_accurate_coords.csv'
-df_merged.to_csv(output_file, index=False)
+output_file = write_stage(df_merged, '/workspace/demographic_data_accurate_coords')
+snapshot_id = snapshot(df_merged, 'demographic_data_accurate_coords', partition_by=['state'])
+record_stage('fix_coords_pgeocode', STAGE_INPUTS, outputs=[output_file])
 
-print(f"\n✅ Saved to: {output_file}")
+print(f"\n✅ Saved to: {output_file} (snapshot {snapshot_id})")
 print(f"\n📈 Coordinate ranges:")
 print(f"   Latitude: {df_merged['lat'].min():.4f} to {df_merged['lat'].max():.4f}")
 print(f"   Longitude: {df_merged['lon'].min():.4f} to {df_merged['lon'].max():.4f}")
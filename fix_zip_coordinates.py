@@ -4,13 +4,14 @@ Fix zip code coordinates using actual geocoded data
 """
 
 import pandas as pd
+from stage_io import read_stage
 from uszipcode import SearchEngine
 
 print("🗺️  Fixing zip code coordinates with accurate geocoded data...")
 print("=" * 70)
 
 # Read the demographic data (without coordinates)
-df = pd.read_csv('/workspace/demographic_data.csv', dtype={'zip_code': str})
+df = read_stage('/workspace/demographic_data', dtype={'zip_code': str})
 print(f"📊 Loaded {len(df)} zip codes")
 
 # Initialize the zip code search engine
@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+FlatGeobuf export with a packed Hilbert R-tree
+
+Writes tract polygons and ZIP points as FlatGeobuf (v3): features sorted by
+the Hilbert value of their bbox center, preceded by a static packed R-tree.
+A viewer can then read the header, walk the index with a handful of HTTP
+range requests and fetch only the features inside its viewport
+(flatgeobuf.geojson.deserialize(url, rect) in the browser).
+
+read_bbox() implements the same range-read search locally, for checks and
+benchmarks.
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import time
+
+import flatbuffers
+import numpy as np
+import pandas as pd
+import shapely
+from flatbuffers import number_types as N
+from flatbuffers import table
+
+from geometry_validation import load_valid
+from stage_io import read_stage
+
+TRACT_SOURCE = '/workspace/complete_census_all_nj_with_cities'
+ZIP_SOURCE = '/workspace/complete_demographic_data'
+OUTPUT_DIR = '/workspace/public'
+
+MAGIC = b'fgb\x03fgb\x00'
+NODE_SIZE = 16
+HILBERT_MAX = (1 << 16) - 1
+
+# FlatGeobuf enums
+GEOMETRY_POINT = 1
+GEOMETRY_POLYGON = 3
+GEOMETRY_MULTIPOLYGON = 6
+COLUMN_LONG = 7
+COLUMN_DOUBLE = 10
+COLUMN_STRING = 11
+
+NODE_DTYPE = np.dtype([('minx', '<f8'), ('miny', '<f8'), ('maxx', '<f8'), ('maxy', '<f8'),
+                       ('offset', '<u8')])
+
+
+# ---------------------------------------------------------------------------
+# Packed Hilbert R-tree
+# ---------------------------------------------------------------------------
+
+def hilbert(x, y):
+    """16-bit Hilbert curve index for uint32 arrays (same curve FlatGeobuf uses)"""
+    x, y = x.astype(np.uint32), y.astype(np.uint32)
+    m = np.uint32(0xFFFF)
+    a = x ^ y
+    b = m ^ a
+    c = m ^ (x | y)
+    d = x & (y ^ m)
+
+    A = a | (b >> 1)
+    B = (a >> 1) ^ a
+    C = ((c >> 1) ^ (b & (d >> 1))) ^ c
+    D = ((a & (c >> 1)) ^ (d >> 1)) ^ d
+    a, b, c, d = A, B, C, D
+
+    A = (a & (a >> 2)) ^ (b & (b >> 2))
+    B = (a & (b >> 2)) ^ (b & ((a ^ b) >> 2))
+    C = C ^ ((a & (c >> 2)) ^ (b & (d >> 2)))
+    D = D ^ ((b & (c >> 2)) ^ ((a ^ b) & (d >> 2)))
+    a, b, c, d = A, B, C, D
+
+    A = (a & (a >> 4)) ^ (b & (b >> 4))
+    B = (a & (b >> 4)) ^ (b & ((a ^ b) >> 4))
+    C = C ^ ((a & (c >> 4)) ^ (b & (d >> 4)))
+    D = D ^ ((b & (c >> 4)) ^ ((a ^ b) & (d >> 4)))
+    a, b, c, d = A, B, C, D
+
+    C = C ^ ((a & (c >> 8)) ^ (b & (d >> 8)))
+    D = D ^ ((b & (c >> 8)) ^ ((a ^ b) & (d >> 8)))
+
+    a = C ^ (C >> 1)
+    b = D ^ (D >> 1)
+    i0 = x ^ y
+    i1 = b | (m ^ (i0 | a))
+
+    def interleave(v):
+        v = (v | (v << 8)) & np.uint32(0x00FF00FF)
+        v = (v | (v << 4)) & np.uint32(0x0F0F0F0F)
+        v = (v | (v << 2)) & np.uint32(0x33333333)
+        return (v | (v << 1)) & np.uint32(0x55555555)
+
+    return (interleave(i1) << np.uint32(1)) | interleave(i0)
+
+
+def hilbert_order(bounds):
+    """Permutation that sorts (n, 4) bboxes by the Hilbert value of their centers"""
+    extent = (bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+    width = (extent[2] - extent[0]) or 1.0
+    height = (extent[3] - extent[1]) or 1.0
+    cx = np.floor(HILBERT_MAX * ((bounds[:, 0] + bounds[:, 2]) / 2 - extent[0]) / width)
+    cy = np.floor(HILBERT_MAX * ((bounds[:, 1] + bounds[:, 3]) / 2 - extent[1]) / height)
+    return np.argsort(hilbert(cx, cy), kind='stable')
+
+
+def level_bounds(num_items, node_size=NODE_SIZE):
+    """(start, end) node index range per tree level, leaves first, root last"""
+    counts = [num_items]
+    n = num_items
+    # Like the reference packed R-tree: any non-empty tree gets at least
+    # one parent level, so a single feature still has a root above its leaf
+    while n:
+        n = -(-n // node_size)
+        counts.append(n)
+        if n == 1:
+            break
+    total = sum(counts)
+    bounds, end = [], total
+    for count in counts:
+        bounds.append((end - count, end))
+        end -= count
+    return bounds
+
+
+def build_index(bounds, offsets, node_size=NODE_SIZE):
+    """
+    Packed R-tree bytes for Hilbert-sorted feature bboxes and their byte
+    offsets in the feature section. Parent nodes store the index of their
+    first child.
+    """
+    levels = level_bounds(len(bounds), node_size)
+    nodes = np.zeros(levels[0][1], dtype=NODE_DTYPE)
+    leaf_start, leaf_end = levels[0]
+    for i, name in enumerate(['minx', 'miny', 'maxx', 'maxy']):
+        nodes[name][leaf_start:leaf_end] = bounds[:, i]
+    nodes['offset'][leaf_start:leaf_end] = offsets
+
+    for (start, end), (child_start, child_end) in zip(levels[1:], levels[:-1]):
+        firsts = np.arange(child_start, child_end, node_size)
+        children = nodes[child_start:child_end]
+        cuts = firsts - child_start
+        parents = nodes[start:end]
+        parents['minx'] = np.minimum.reduceat(children['minx'], cuts)
+        parents['miny'] = np.minimum.reduceat(children['miny'], cuts)
+        parents['maxx'] = np.maximum.reduceat(children['maxx'], cuts)
+        parents['maxy'] = np.maximum.reduceat(children['maxy'], cuts)
+        parents['offset'] = firsts
+        nodes[start:end] = parents
+    return nodes.tobytes()
+
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+
+def column_type(dtype):
+    if pd.api.types.is_integer_dtype(dtype):
+        return COLUMN_LONG
+    if pd.api.types.is_float_dtype(dtype):
+        return COLUMN_DOUBLE
+    return COLUMN_STRING
+
+
+def encode_properties(values, types):
+    """Property bytes: (ushort column index, value) pairs; missing values are left out"""
+    out = bytearray()
+    for i, (value, kind) in enumerate(zip(values, types)):
+        if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+            continue
+        if kind == COLUMN_STRING:
+            raw = str(value).encode()
+            out += struct.pack('<HI', i, len(raw)) + raw
+        elif kind == COLUMN_LONG:
+            out += struct.pack('<Hq', i, int(value))
+        else:
+            out += struct.pack('<Hd', i, float(value))
+    return bytes(out)
+
+
+def _geometry_table(builder, xy, ends, geometry_type, parts=None):
+    xy_off = builder.CreateNumpyVector(xy) if xy is not None else None
+    ends_off = builder.CreateNumpyVector(ends) if ends is not None else None
+    builder.StartObject(8)
+    if ends_off is not None:
+        builder.PrependUOffsetTRelativeSlot(0, ends_off, 0)
+    if xy_off is not None:
+        builder.PrependUOffsetTRelativeSlot(1, xy_off, 0)
+    builder.PrependUint8Slot(6, geometry_type, 0)
+    if parts is not None:
+        builder.PrependUOffsetTRelativeSlot(7, parts, 0)
+    return builder.EndObject()
+
+
+def _polygon(builder, poly):
+    rings = [np.asarray(r.coords)[:, :2] for r in [poly.exterior, *poly.interiors]]
+    ends = np.cumsum([len(r) for r in rings]).astype('<u4') if len(rings) > 1 else None
+    return _geometry_table(builder, np.concatenate(rings).ravel().astype('<f8'), ends, GEOMETRY_POLYGON)
+
+
+def _geometry(builder, geom, geometry_type):
+    if geometry_type == GEOMETRY_POINT:
+        return _geometry_table(builder, shapely.get_coordinates(geom).ravel().astype('<f8'), None,
+                               GEOMETRY_POINT)
+    # Polygons are promoted so every feature matches the header's MultiPolygon
+    polygons = [p for p in shapely.get_parts(geom) if p.geom_type == 'Polygon' and not p.is_empty]
+    parts = [_polygon(builder, p) for p in polygons]
+    builder.StartVector(4, len(parts), 4)
+    for part in reversed(parts):
+        builder.PrependUOffsetTRelative(part)
+    return _geometry_table(builder, None, None, GEOMETRY_MULTIPOLYGON, builder.EndVector())
+
+
+def encode_feature(geom, properties, geometry_type):
+    """Size-prefixed Feature flatbuffer"""
+    builder = flatbuffers.Builder(1024)
+    geometry = _geometry(builder, geom, geometry_type)
+    props = builder.CreateByteVector(properties) if properties else None
+    builder.StartObject(3)
+    builder.PrependUOffsetTRelativeSlot(0, geometry, 0)
+    if props is not None:
+        builder.PrependUOffsetTRelativeSlot(1, props, 0)
+    builder.FinishSizePrefixed(builder.EndObject())
+    return bytes(builder.Output())
+
+
+def encode_header(name, envelope, geometry_type, columns, types, count, node_size=NODE_SIZE):
+    """Size-prefixed Header flatbuffer (EPSG:4326); envelope None leaves it out"""
+    builder = flatbuffers.Builder(1024)
+    name_off = builder.CreateString(name)
+    envelope_off = None if envelope is None else builder.CreateNumpyVector(np.asarray(envelope, dtype='<f8'))
+
+    column_offs = []
+    for column, kind in zip(columns, types):
+        col_name = builder.CreateString(column)
+        builder.StartObject(11)
+        builder.PrependUOffsetTRelativeSlot(0, col_name, 0)
+        builder.PrependUint8Slot(1, kind, 0)
+        column_offs.append(builder.EndObject())
+    builder.StartVector(4, len(column_offs), 4)
+    for off in reversed(column_offs):
+        builder.PrependUOffsetTRelative(off)
+    columns_off = builder.EndVector()
+
+    org = builder.CreateString('EPSG')
+    builder.StartObject(6)
+    builder.PrependUOffsetTRelativeSlot(0, org, 0)
+    builder.PrependInt32Slot(1, 4326, 0)
+    crs = builder.EndObject()
+
+    builder.StartObject(14)
+    builder.PrependUOffsetTRelativeSlot(0, name_off, 0)
+    if envelope_off is not None:
+        builder.PrependUOffsetTRelativeSlot(1, envelope_off, 0)
+    builder.PrependUint8Slot(2, geometry_type, 0)
+    builder.PrependUOffsetTRelativeSlot(7, columns_off, 0)
+    builder.PrependUint64Slot(8, count, 0)
+    builder.ForceDefaults(True)
+    builder.PrependUint16Slot(9, node_size, 16)
+    builder.ForceDefaults(False)
+    builder.PrependUOffsetTRelativeSlot(10, crs, 0)
+    builder.FinishSizePrefixed(builder.EndObject())
+    return bytes(builder.Output())
+
+
+def write_flatgeobuf(geoms, table, out_path, name, geometry_type, node_size=NODE_SIZE):
+    """
+    Write geometries plus a property table as an indexed FlatGeobuf file.
+
+    Features are encoded one at a time into a temporary file in Hilbert
+    order so only their offsets are kept; the header and index are then
+    written ahead of them. With no features the file is the header alone
+    (no envelope, no index). Returns file stats.
+    """
+    keep = ~shapely.is_missing(geoms) & ~shapely.is_empty(geoms)
+    geoms, table = geoms[keep], table[keep].reset_index(drop=True)
+    columns = list(table.columns)
+    types = [column_type(table[c].dtype) for c in columns]
+    if not len(geoms):
+        header = encode_header(name, None, geometry_type, columns, types, 0, node_size=0)
+        with open(out_path, 'wb') as out:
+            out.write(MAGIC)
+            out.write(header)
+        return {'features': 0, 'header_bytes': len(header), 'index_bytes': 0,
+                'feature_bytes': 0, 'file_bytes': os.path.getsize(out_path)}
+    bounds = shapely.bounds(geoms)
+    order = hilbert_order(bounds)
+    rows = table.to_numpy(dtype=object)
+
+    offsets = np.zeros(len(order), dtype=np.uint64)
+    with tempfile.TemporaryFile() as features:
+        offset = 0
+        for i, idx in enumerate(order):
+            feature = encode_feature(geoms[idx], encode_properties(rows[idx], types), geometry_type)
+            offsets[i] = offset
+            features.write(feature)
+            offset += len(feature)
+
+        envelope = [bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max()]
+        header = encode_header(name, envelope, geometry_type, columns, types, len(order), node_size)
+        index = build_index(bounds[order], offsets, node_size)
+
+        tmp_path = out_path + '.tmp'
+        with open(tmp_path, 'wb') as out:
+            out.write(MAGIC)
+            out.write(header)
+            out.write(index)
+            features.seek(0)
+            shutil.copyfileobj(features, out)
+        os.replace(tmp_path, out_path)
+
+    return {'features': len(order), 'header_bytes': len(header), 'index_bytes': len(index),
+            'feature_bytes': offset, 'file_bytes': os.path.getsize(out_path)}
+
+
+# ---------------------------------------------------------------------------
+# Range-read search
+# ---------------------------------------------------------------------------
+
+def _root(buf):
+    return table.Table(buf, struct.unpack_from('<I', buf, 0)[0])
+
+
+def _offset(tab, field):
+    return tab.Offset(4 + 2 * field)
+
+
+def _scalar(tab, field, flags, default):
+    o = _offset(tab, field)
+    return tab.Get(flags, o + tab.Pos) if o else default
+
+
+def _string(tab, field):
+    o = _offset(tab, field)
+    return tab.String(o + tab.Pos).decode() if o else None
+
+
+def _tables(tab, field):
+    o = _offset(tab, field)
+    if not o:
+        return []
+    start = tab.Vector(o)
+    return [table.Table(tab.Bytes, tab.Indirect(start + 4 * i)) for i in range(tab.VectorLen(o))]
+
+
+def _numbers(tab, field, flags):
+    o = _offset(tab, field)
+    return tab.GetVectorAsNumpy(flags, o) if o else None
+
+
+def parse_header(buf):
+    tab = _root(buf)
+    columns = [(_string(col, 0), _scalar(col, 1, N.Uint8Flags, 0)) for col in _tables(tab, 7)]
+    return {
+        'name': _string(tab, 0),
+        'geometry_type': _scalar(tab, 2, N.Uint8Flags, 0),
+        'columns': columns,
+        'features_count': _scalar(tab, 8, N.Uint64Flags, 0),
+        'index_node_size': _scalar(tab, 9, N.Uint16Flags, 16),
+    }
+
+
+def _decode_geometry(tab, geometry_type):
+    if geometry_type == GEOMETRY_MULTIPOLYGON:
+        return shapely.MultiPolygon([_decode_geometry(p, GEOMETRY_POLYGON) for p in _tables(tab, 7)])
+    xy = _numbers(tab, 1, N.Float64Flags).reshape(-1, 2)
+    if geometry_type == GEOMETRY_POINT:
+        return shapely.Point(xy[0])
+    ends = _numbers(tab, 0, N.Uint32Flags)
+    rings = np.split(xy, ends[:-1]) if ends is not None else [xy]
+    return shapely.Polygon(rings[0], rings[1:])
+
+
+def decode_feature(buf, header):
+    """(shapely geometry, properties dict) from a Feature flatbuffer without its size prefix"""
+    tab = _root(buf)
+    geometry = _decode_geometry(table.Table(buf, tab.Indirect(_offset(tab, 0) + tab.Pos)),
+                                header['geometry_type'])
+    raw = _numbers(tab, 1, N.Uint8Flags)
+    raw = raw.tobytes() if raw is not None else b''
+    props, pos = {}, 0
+    while pos < len(raw):
+        i = struct.unpack_from('<H', raw, pos)[0]
+        name, kind = header['columns'][i]
+        if kind == COLUMN_STRING:
+            size = struct.unpack_from('<I', raw, pos + 2)[0]
+            props[name] = raw[pos + 6:pos + 6 + size].decode()
+            pos += 6 + size
+        elif kind == COLUMN_LONG:
+            props[name] = struct.unpack_from('<q', raw, pos + 2)[0]
+            pos += 10
+        else:
+            props[name] = struct.unpack_from('<d', raw, pos + 2)[0]
+            pos += 10
+    return geometry, props
+
+
+class RangeReader:
+    """File reader that counts requests and bytes like an HTTP range client"""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.requests = 0
+        self.bytes = 0
+
+    def read(self, offset, length):
+        self.requests += 1
+        self.bytes += length
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    def close(self):
+        self.file.close()
+
+
+def _ranges(indices):
+    """Contiguous (start, end) runs of sorted integers"""
+    runs = []
+    for i in indices:
+        if runs and runs[-1][1] == i:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+    return runs
+
+
+def read_bbox(path, bbox):
+    """
+    Features intersecting bbox (minx, miny, maxx, maxy), read the way a
+    browser client does: header, then the index one level at a time, then
+    only the matching features - each as merged byte ranges.
+
+    Returns (features, {'requests', 'bytes'}).
+    """
+    reader = RangeReader(path)
+    try:
+        size = struct.unpack('<I', reader.read(len(MAGIC), 4))[0]
+        header = parse_header(reader.read(len(MAGIC) + 4, size))
+        count, node_size = header['features_count'], header['index_node_size']
+        if not count:
+            return [], {'requests': reader.requests, 'bytes': reader.bytes}
+        levels = level_bounds(count, node_size)
+        index_start = len(MAGIC) + 4 + size
+        features_start = index_start + levels[0][1] * NODE_DTYPE.itemsize
+        leaf_start = levels[0][0]
+        minx, miny, maxx, maxy = bbox
+
+        frontier, hits, leaf_offsets = [0], [], {}
+        while frontier:
+            nodes = {}
+            for start, end in _ranges(frontier):
+                raw = reader.read(index_start + start * NODE_DTYPE.itemsize,
+                                  (end - start) * NODE_DTYPE.itemsize)
+                for i, node in zip(range(start, end), np.frombuffer(raw, dtype=NODE_DTYPE)):
+                    nodes[i] = node
+            frontier = []
+            for i, node in nodes.items():
+                if i >= leaf_start:
+                    leaf_offsets[i] = int(node['offset'])
+                if node['maxx'] < minx or node['minx'] > maxx or node['maxy'] < miny or node['miny'] > maxy:
+                    continue
+                if i >= leaf_start:
+                    hits.append(i)
+                    continue
+                child = int(node['offset'])
+                level_end = next(end for start, end in levels if start <= child < end)
+                frontier.extend(range(child, min(child + node_size, level_end)))
+            frontier.sort()
+
+        features = []
+        for start, end in _ranges(sorted(hits)):
+            begin = leaf_offsets[start]
+            if end in leaf_offsets:
+                stop = leaf_offsets[end]
+            elif end == levels[0][1]:
+                stop = None
+            else:
+                last = leaf_offsets[end - 1]
+                stop = last + 4 + struct.unpack('<I', reader.read(features_start + last, 4))[0]
+            if stop is None:
+                reader.file.seek(0, os.SEEK_END)
+                stop = reader.file.tell() - features_start
+            raw = reader.read(features_start + begin, stop - begin)
+            pos = 0
+            while pos < len(raw):
+                length = struct.unpack_from('<I', raw, pos)[0]
+                features.append(decode_feature(raw[pos + 4:pos + 4 + length], header))
+                pos += 4 + length
+        return features, {'requests': reader.requests, 'bytes': reader.bytes}
+    finally:
+        reader.close()
+
+
+# ---------------------------------------------------------------------------
+# Layers
+# ---------------------------------------------------------------------------
+
+def export_tracts(source=TRACT_SOURCE, out_path=os.path.join(OUTPUT_DIR, 'tracts.fgb')):
+    df = read_stage(source, dtype={'geoid': str}, zero_copy=False).drop(columns='geometry')
+    df = df.merge(load_valid(source, columns=['geoid', 'geometry']), on='geoid')
+    geoms = df['geometry'].to_numpy()
+    props = df.drop(columns=['geometry', 'name']).rename(columns={'county_name': 'county', 'state_name': 'state'})
+    return write_flatgeobuf(geoms, props, out_path, 'tracts', GEOMETRY_MULTIPOLYGON)
+
+
+def export_zips(source=ZIP_SOURCE, out_path=os.path.join(OUTPUT_DIR, 'zips.fgb')):
+    df = read_stage(source, dtype={'zip_code': str}, zero_copy=False)
+    df = df[df['lat'].notna() & df['lon'].notna()].reset_index(drop=True)
+    geoms = shapely.points(df[['lon', 'lat']].to_numpy(dtype=float))
+    props = df.drop(columns=[c for c in df.columns if c.endswith('_color')])
+    return write_flatgeobuf(geoms, props, out_path, 'zips', GEOMETRY_POINT)
+
+
+if __name__ == '__main__':
+    print("🗂️  Exporting FlatGeobuf layers...")
+    print("=" * 70)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    for layer, export in [('tracts', export_tracts), ('zips', export_zips)]:
+        start = time.perf_counter()
+        stats = export()
+        print(f"   ✅ {layer}: {stats['features']:,} features, {stats['file_bytes'] / 1e6:.2f} MB "
+              f"(index {stats['index_bytes'] / 1024:.0f} KB) in {time.perf_counter() - start:.1f}s")
+    print("=" * 70)
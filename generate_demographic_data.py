@@ -7,10 +7,16 @@ Based on 2020-2022 Census patterns and actual demographic distributions
 import pandas as pd
 import numpy as np
 import random
+from snapshots import skip_if_current, record_stage, snapshot
+from stage_io import write_stage
 
 print("🏗️  Generating comprehensive demographic dataset...")
 print("=" * 70)
 
+# Output is fully determined by this script (fixed seeds)
+STAGE_INPUTS = [__file__]
+skip_if_current('generate_demographic_data', STAGE_INPUTS, outputs=['/workspace/demographic_data.arrow'])
+
 # Set seed for reproducibility
 np.random.seed(42)
 random.seed(42)
@@ -256,9 +262,10 @@ df['income_category'] = pd.cut(df['median_income'],
 # Sort by state and zip code
 df = df.sort_values(['state', 'zip_code'])
 
-# Save to CSV
-output_file = '/workspace/demographic_data.csv'
-df.to_csv(output_file, index=False)
+# Save as Arrow IPC for the next stage
+output_file = write_stage(df, '/workspace/demographic_data')
+snapshot_id = snapshot(df, 'demographic_data', partition_by=['state'])
+record_stage('generate_demographic_data', STAGE_INPUTS, outputs=[output_file])
 
 print("\n" + "=" * 70)
 print("✅ DATA GENERATION COMPLETE!")
@@ -266,7 +273,7 @@ print(f"📊 Total zip codes: {len(df)}")
 print(f"   • New Jersey: {len(df[df['state']=='NJ'])}")
 print(f"   • Delaware: {len(df[df['state']=='DE'])}")
 print(f"   • Eastern Pennsylvania: {len(df[df['state']=='PA'])}")
-print(f"\n💾 Saved to: {output_file}")
+print(f"\n💾 Saved to: {output_file} (snapshot {snapshot_id})")
 print("\n📈 Data Summary:")
 print(df.describe()[['population', 'median_income', 'median_age', 'housing_units', 'density']])
 print("\n" + "=" * 70)
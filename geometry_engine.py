@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Multi-core geometry processing engine
+
+Splits a tract set into chunks and runs parsing, repair, simplification
+and measurements (centroids, bounds, the tract summary columns) across a
+process pool. The input - GeoJSON text or already-parsed coordinates - is
+copied once into shared memory as flat buffers plus offsets; workers
+attach to those buffers and only receive (start, stop) chunk bounds, so
+no geometry objects are pickled on the way in. Results come back as
+numpy arrays (geometries as one packed WKB buffer per chunk) and are
+reassembled in input order.
+"""
+
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import shapely
+
+from coord_precision import DEFAULT_GRID, quantize_geometries
+
+CHUNK_ROWS = 1000
+
+
+# ---------------------------------------------------------------------------
+# Shared buffers
+# ---------------------------------------------------------------------------
+
+class SharedArrays:
+    """Named numpy arrays copied into shared memory; workers attach by spec"""
+
+    def __init__(self, arrays):
+        self.blocks, self.spec = [], {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    @property
+    def nbytes(self):
+        return sum(block.size for block in self.blocks)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(spec):
+    """Numpy views onto the blocks described by a SharedArrays spec"""
+    arrays, blocks = {}, []
+    for name, (block_name, shape, dtype) in spec.items():
+        # Pool workers share the parent's resource tracker; the parent unlinks
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    return arrays, blocks
+
+
+def geojson_arrays(text):
+    """UTF-8 buffer + offsets for a Series of GeoJSON strings"""
+    strings = pa.array(text.astype(object).where(text.notna(), None).to_numpy(), type=pa.large_string())
+    _, offsets, data = strings.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64)[strings.offset:strings.offset + len(strings) + 1]
+    data = np.frombuffer(data, dtype=np.uint8) if data is not None else np.zeros(0, dtype=np.uint8)
+    return {'text': data, 'text_offsets': offsets}
+
+
+def geometry_arrays(geoms):
+    """Ragged coordinate arrays (shapely.to_ragged_array layout)"""
+    geometry_type, coords, offsets = shapely.to_ragged_array(geoms)
+    arrays = {'coords': coords, 'geometry_type': np.array([int(geometry_type)])}
+    arrays.update({f'offsets_{i}': o for i, o in enumerate(offsets)})
+    return arrays
+
+
+def _slice_ragged(coords, offsets, start, stop):
+    """Coordinates and rebased offsets for geometries [start, stop)"""
+    sliced = []
+    lo, hi = start, stop
+    for off in reversed(offsets):
+        piece = off[lo:hi + 1]
+        sliced.append(piece - piece[0])
+        lo, hi = int(piece[0]), int(piece[-1])
+    return coords[lo:hi], tuple(reversed(sliced))
+
+
+def chunk_geometries(arrays, start, stop):
+    """Shapely geometries for rows [start, stop) of geojson_arrays/geometry_arrays"""
+    if 'text' in arrays:
+        data, offsets = arrays['text'], arrays['text_offsets']
+        text = [bytes(data[offsets[i]:offsets[i + 1]]).decode() or None for i in range(start, stop)]
+        return shapely.from_geojson(np.array(text, dtype=object), on_invalid='ignore')
+    offsets = tuple(arrays[f'offsets_{i}'] for i in range(sum(k.startswith('offsets_') for k in arrays)))
+    coords, offsets = _slice_ragged(arrays['coords'], offsets, start, stop)
+    return shapely.from_ragged_array(shapely.GeometryType(int(arrays['geometry_type'][0])), coords, offsets)
+
+
+# ---------------------------------------------------------------------------
+# Operations
+# ---------------------------------------------------------------------------
+
+def _polygonal(geom):
+    """Polygon parts of a make_valid GeometryCollection (stray lines/points dropped)"""
+    parts = [p for p in shapely.get_parts(geom) if p.geom_type in ('Polygon', 'MultiPolygon')]
+    return shapely.union_all(parts) if parts else geom
+
+
+def repair(geoms):
+    """make_valid invalid geometries, drop repeated vertices, orient rings"""
+    present = ~shapely.is_missing(geoms)
+    invalid = present & ~shapely.is_valid(geoms)
+    if invalid.any():
+        geoms = geoms.copy()
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+        collections = invalid & (shapely.get_type_id(geoms) == shapely.GeometryType.GEOMETRYCOLLECTION)
+        for i in np.flatnonzero(collections):
+            geoms[i] = _polygonal(geoms[i])
+    return shapely.orient_polygons(shapely.remove_repeated_points(geoms))
+
+
+def diagnose(geoms):
+    """What repair would fix: validity reason, repeated vertices, ring orientation"""
+    valid = shapely.is_valid(geoms)
+    reason = np.where(valid, None, shapely.is_valid_reason(geoms)).astype(object)
+    repeated = shapely.get_num_coordinates(geoms) - shapely.get_num_coordinates(shapely.remove_repeated_points(geoms))
+    reoriented = ~shapely.equals_exact(geoms, shapely.orient_polygons(geoms), 0)
+    return {'valid': valid, 'invalid_reason': reason, 'repeated_vertices': repeated,
+            'reoriented': reoriented}
+
+
+def simplify(geoms, tolerance):
+    return shapely.simplify(geoms, tolerance, preserve_topology=True)
+
+
+def quantize(geoms, grid=DEFAULT_GRID):
+    return quantize_geometries(geoms, grid)[0]
+
+
+def centroids(geoms):
+    centroid = shapely.get_coordinates(shapely.centroid(geoms))
+    rep = shapely.get_coordinates(shapely.point_on_surface(geoms))
+    return {'centroid_lon': centroid[:, 0], 'centroid_lat': centroid[:, 1],
+            'rep_lon': rep[:, 0], 'rep_lat': rep[:, 1]}
+
+
+def bounds(geoms):
+    b = shapely.bounds(geoms)
+    return {'minx': b[:, 0], 'miny': b[:, 1], 'maxx': b[:, 2], 'maxy': b[:, 3]}
+
+
+def summary(geoms):
+    # Imported here - tract_summary builds its table through this engine
+    from tract_summary import summarize_geometries
+    return {k: v.to_numpy() for k, v in summarize_geometries(geoms).items()}
+
+
+GEOMETRY_OPS = {'repair': repair, 'simplify': simplify, 'quantize': quantize}
+MEASURE_OPS = {'centroid': centroids, 'bounds': bounds, 'summary': summary, 'diagnose': diagnose}
+
+
+def _normalize_steps(steps):
+    normalized = []
+    for step in steps:
+        name, params = (step, {}) if isinstance(step, str) else step
+        if name not in GEOMETRY_OPS and name not in MEASURE_OPS:
+            raise ValueError(f"Unknown geometry step: {name}")
+        normalized.append((name, params))
+    return normalized
+
+
+def _fill_value(dtype):
+    """Placeholder for rows without a geometry"""
+    return {'f': np.nan, 'O': None, 'b': False}.get(dtype.kind, 0)
+
+
+def run_chunk(arrays, start, stop, steps, return_geometry=True):
+    """
+    Run steps over rows [start, stop). Geometry steps replace the working
+    geometry, measure steps add columns computed from it. Returns plain
+    numpy arrays: measure columns plus, optionally, packed WKB.
+    """
+    geoms = chunk_geometries(arrays, start, stop)
+    ok = ~shapely.is_missing(geoms)
+    columns = {}
+    for name, params in steps:
+        if name in GEOMETRY_OPS:
+            geoms = geoms.copy()
+            geoms[ok] = GEOMETRY_OPS[name](geoms[ok], **params)
+        else:
+            for column, values in MEASURE_OPS[name](geoms[ok], **params).items():
+                full = np.full(len(geoms), _fill_value(values.dtype), dtype=values.dtype)
+                full[ok] = values
+                columns[column] = full
+    if return_geometry:
+        wkb = shapely.to_wkb(geoms)
+        lengths = np.array([len(w) if w is not None else 0 for w in wkb], dtype=np.int64)
+        columns['_wkb'] = np.frombuffer(b''.join(w for w in wkb if w is not None), dtype=np.uint8)
+        columns['_wkb_offsets'] = np.concatenate([[0], np.cumsum(lengths)])
+    return columns
+
+
+# Set in each worker by _init_worker
+_WORKER = {}
+
+
+def _init_worker(spec, steps, return_geometry):
+    arrays, blocks = attach(spec)
+    _WORKER.update(arrays=arrays, blocks=blocks, steps=steps, return_geometry=return_geometry)
+
+
+def _worker_chunk(bounds_):
+    start, stop = bounds_
+    return run_chunk(_WORKER['arrays'], start, stop, _WORKER['steps'], _WORKER['return_geometry'])
+
+
+def _unpack_geometry(chunk):
+    wkb, offsets = chunk['_wkb'], chunk['_wkb_offsets']
+    blobs = np.array([wkb[offsets[i]:offsets[i + 1]].tobytes() or None for i in range(len(offsets) - 1)],
+                     dtype=object)
+    return shapely.from_wkb(blobs)
+
+
+def _is_geojson_text(source):
+    if not isinstance(source, pd.Series):
+        return False
+    sample = source.dropna()
+    return len(sample) == 0 or isinstance(sample.iloc[0], str)
+
+
+def process(source, steps, chunk_rows=CHUNK_ROWS, processes=None, return_geometry=True):
+    """
+    Run geometry steps over a Series of GeoJSON strings or an array of
+    shapely geometries across a process pool.
+
+    steps: names or (name, params) pairs, e.g.
+        ['repair', ('simplify', {'tolerance': 1e-4}), 'centroid']
+    Returns a DataFrame in input order with the measure columns and, if
+    return_geometry, a 'geometry' column of shapely geometries. Rows whose
+    geometry is missing or unparseable get None / NaN.
+    """
+    steps = _normalize_steps(steps)
+    index = source.index if isinstance(source, pd.Series) else pd.RangeIndex(len(source))
+    if _is_geojson_text(source):
+        arrays, present = geojson_arrays(source), np.ones(len(source), dtype=bool)
+    else:
+        geoms = np.asarray(source, dtype=object)
+        present = ~shapely.is_missing(geoms)
+        arrays = geometry_arrays(geoms[present])
+    n = int(present.sum())
+    chunks = [(start, min(start + chunk_rows, n)) for start in range(0, n, chunk_rows)]
+    processes = min(processes or os.cpu_count(), max(len(chunks), 1))
+
+    if processes == 1:
+        results = [run_chunk(arrays, a, b, steps, return_geometry) for a, b in chunks]
+    else:
+        with SharedArrays(arrays) as shared, \
+                multiprocessing.Pool(processes, initializer=_init_worker,
+                                     initargs=(shared.spec, steps, return_geometry)) as pool:
+            # imap keeps chunk order, so results line up with the input
+            results = list(pool.imap(_worker_chunk, chunks))
+
+    out = pd.DataFrame(index=index)
+    names = [k for k in (results[0] if results else {}) if not k.startswith('_')]
+    for name in names:
+        values = np.concatenate([r[name] for r in results])
+        column = np.full(len(index), _fill_value(values.dtype), dtype=values.dtype)
+        column[present] = values
+        out[name] = column
+    if return_geometry:
+        geometry = np.full(len(index), None, dtype=object)
+        if results:
+            geometry[present] = np.concatenate([_unpack_geometry(r) for r in results])
+        out['geometry'] = geometry
+    return out
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+One-time geometry validation and repair
+
+Parses every tract geometry once, repairs it (make_valid, duplicate-vertex
+removal, RFC 7946 ring orientation), snaps it to the coord_precision grid
+and caches the result as WKB next to
+the source, keyed by the source hash like every other stage. A JSON report
+records what was fixed and which rows could not be used, so builders read
+ready geometry instead of wrapping each parse in try/except.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+
+import coord_precision
+from coord_precision import quantize_geometries
+from geometry_engine import process
+from snapshots import record_stage, stage_is_current
+from stage_io import read_stage, stage_file, stage_path, write_stage
+
+STATUSES = ['ok', 'repaired', 'unparseable', 'missing']
+
+
+def validated_path(source):
+    """Validated geometry stage that belongs to a tract source"""
+    return stage_path(source) + '_valid'
+
+
+def report_path(source):
+    return validated_path(source) + '_report.json'
+
+
+def _issues(row):
+    issues = []
+    if isinstance(row['invalid_reason'], str):
+        issues.append(row['invalid_reason'])
+    if row['repeated_vertices']:
+        issues.append(f"{int(row['repeated_vertices'])} repeated vertices")
+    if row['reoriented']:
+        issues.append('ring orientation')
+    return '; '.join(issues)
+
+
+def validate(df):
+    """
+    Repair the GeoJSON geometry column of df (geoid + geometry) and snap
+    it to the coordinate grid.
+
+    Returns (table, report): table has geoid, WKB geometry, status and a
+    readable issues column; report counts each status and fix and keeps
+    the precision stats.
+    """
+    result = process(df['geometry'], ['diagnose', 'repair'])
+    has_text = df['geometry'].notna().to_numpy()
+    parsed = has_text & result['geometry'].notna().to_numpy()
+
+    issues = result.apply(_issues, axis=1).where(parsed, '')
+    # Reorienting rings is normalization; 'repaired' means the shape changed
+    changed = result['invalid_reason'].notna().to_numpy() | (result['repeated_vertices'].to_numpy() > 0)
+    status = np.select([~has_text, ~parsed, changed],
+                       ['missing', 'unparseable', 'repaired'], default='ok')
+
+    snapped, precision = quantize_geometries(result['geometry'].to_numpy()[parsed])
+    geometry = np.full(len(df), None, dtype=object)
+    geometry[parsed] = shapely.to_wkb(snapped)
+    table = pd.DataFrame({
+        'geoid': df['geoid'].astype(str).to_numpy(),
+        'geometry': geometry,
+        'status': status,
+        'issues': issues.to_numpy(),
+    })
+
+    fixed = result[parsed]
+    report = {
+        'rows': len(df),
+        'status': {s: int((status == s).sum()) for s in STATUSES},
+        'fixes': {
+            'made_valid': int((~fixed['valid']).sum()),
+            'repeated_vertices_removed': int(fixed['repeated_vertices'].sum()),
+            'reoriented': int(fixed['reoriented'].astype(bool).sum()),
+        },
+        'invalid_reasons': fixed['invalid_reason'].dropna().str.split('[').str[0].value_counts().to_dict(),
+        'unparseable': table.loc[status == 'unparseable', 'geoid'].tolist(),
+        'repaired': table.loc[status == 'repaired', ['geoid', 'issues']].head(50).to_dict('records'),
+        'precision': precision,
+    }
+    return table, report
+
+
+def ensure_valid(source):
+    """Build (or reuse) the validated geometry for source; returns the report"""
+    inputs = [os.path.abspath(__file__), os.path.abspath(coord_precision.__file__), stage_file(source)]
+    out = validated_path(source)
+    stage = 'geometry_validation:' + os.path.basename(stage_path(source))
+    outputs = [out + '.arrow', report_path(source)]
+    if not stage_is_current(stage, inputs, outputs=outputs):
+        df = read_stage(source, columns=['geoid', 'geometry'], dtype={'geoid': str}, zero_copy=False)
+        table, report = validate(df)
+        write_stage(table, out)
+        with open(report_path(source), 'w') as f:
+            json.dump(report, f, indent=2)
+        record_stage(stage, inputs, outputs=outputs)
+    with open(report_path(source)) as f:
+        return json.load(f)
+
+
+def load_valid(source, columns=None):
+    """
+    geoid + repaired, grid-snapped shapely geometry (+ status, issues) for
+    every usable tract in source, validating on first use.
+    """
+    ensure_valid(source)
+    df = read_stage(validated_path(source), columns=columns, zero_copy=False)
+    df = df[df['geometry'].notna()].reset_index(drop=True)
+    df['geometry'] = shapely.from_wkb(df['geometry'].to_numpy(dtype=object))
+    return df
+
+
+def format_report(report):
+    s, f, p = report['status'], report['fixes'], report['precision']
+    return (f"{s['ok']:,} ok, {s['repaired']:,} repaired "
+            f"({f['made_valid']} made valid, {f['repeated_vertices_removed']} repeated vertices dropped), "
+            f"{s['unparseable']} unparseable, {s['missing']} missing; "
+            f"{f['reoriented']:,} reoriented to RFC 7946 winding; "
+            f"snapped to {p['grid']:g}° (max shift {p['max_displacement_m']:.2f} m)")
+
+
+if __name__ == '__main__':
+    import sys
+
+    sources = sys.argv[1:] or ['/workspace/census_tract_demographics',
+                               '/workspace/complete_census_all_nj_with_cities']
+
+    print("🩺 Validating and repairing tract geometry...")
+    print("=" * 70)
+    for source in sources:
+        report = ensure_valid(source)
+        print(f"   ✅ {os.path.basename(source)}: {format_report(report)}")
+        for reason, count in report['invalid_reasons'].items():
+            print(f"      • {reason}: {count}")
+        if report['unparseable']:
+            print(f"      ⚠️  Unparseable: {', '.join(report['unparseable'][:10])}")
+    print("=" * 70)
@@ -0,0 +1,1083 @@
+#!/usr/bin/env python3
+"""
+Client-side pieces for generated Leaflet maps
+
+Folium evaluates styles and tooltips in Python and ships one Leaflet
+object per folium element - one per tract when a builder adds tracts one
+at a time, and one copy of every polygon per demographic. The helpers
+here batch features into single layers, keep the data once and do the
+per-metric work in the browser instead.
+
+save_map() can also move layer data out of the page into content-hashed
+JSON sidecars that the page fetches asynchronously, so the HTML shell is
+small and unchanged data keeps its cached URL. Pages written that way
+have to be served over HTTP (fetch() does not read file:// URLs). A
+sidecar is only fetched when its layer is first shown, so hidden layers
+cost nothing at page load. Feature properties go out as per-column
+arrays (numbers as typed arrays, repeated strings dictionary-encoded)
+and numbers are formatted in the page (client_format); coordinates as
+quantized, delta-encoded varints (pack_geometries).
+
+Dense polygon layers can be drawn with Leaflet's canvas renderer or
+through WebGL instead of one SVG node per path (--renderer), and
+FrameTimer measures pan frame times to compare them. ViewportLoader fills
+a layer with only the chunks (see viewport_chunks) in view.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import sys
+import types
+
+import folium
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from jinja2 import Template
+
+# Move layer data into hashed JSON files next to the page
+DATA_SIDECARS = True
+# Directory (relative to the page) the sidecars are written to
+SIDECAR_DIR = 'data'
+# Layers smaller than this stay inline - not worth a request
+SIDECAR_MIN_BYTES = 16 * 1024
+# Fetch a sidecar the first time its layer is shown rather than on load
+LAZY_LAYERS = True
+# Send feature properties as per-column arrays (typed numbers, dictionary
+# strings) rebuilt in the page, instead of repeating keys in every feature
+COLUMNAR_PROPERTIES = True
+# Send GeoJSON coordinates as varint-packed integer deltas decoded in the
+# page, instead of decimal text
+PACKED_COORDINATES = True
+# Packed coordinates are integers of 1/COORDINATE_SCALE degree (~1 m)
+COORDINATE_SCALE = 10 ** 5
+
+# Fill of features whose metric value is missing
+NO_DATA_COLOR = '#BDBDBD'
+
+# 'svg': Leaflet default, one DOM node per path; 'canvas': preferCanvas;
+# 'webgl': tract polygons drawn by Leaflet.glify
+RENDERERS = ('svg', 'canvas', 'webgl')
+
+
+def batched_layer(geometries, properties, style, tooltip=None, **kwargs):
+    """
+    One folium.GeoJson over a whole feature array instead of one object per
+    feature. geometries are GeoJSON mappings and properties a DataFrame
+    aligned with them; each feature's 'color' property fills in fillColor
+    and color on top of the constant style. tooltip names a property that
+    holds ready HTML.
+    """
+    # Numeric ids keep folium's style switch keyed on short integers
+    # rather than on whichever property happens to be unique (the tooltip)
+    features = [{"type": "Feature", "id": i, "geometry": geometry, "properties": props}
+                for i, (geometry, props) in enumerate(zip(geometries, properties.to_dict('records')))]
+
+    def style_function(feature):
+        color = feature['properties']['color']
+        return dict(style, fillColor=color, color=color)
+
+    if tooltip is not None:
+        kwargs['tooltip'] = folium.GeoJsonTooltip(fields=[tooltip], labels=False)
+    return folium.GeoJson({"type": "FeatureCollection", "features": features},
+                          style_function=style_function, **kwargs)
+
+
+def metric_spec(key, label, colormap, fmt='number'):
+    """
+    One entry of a MetricSwitcher: the property to color by, its label,
+    and the stops and range of a branca LinearColormap (interpolated the
+    same way in the page). fmt is 'number' or 'currency'.
+    """
+    return {
+        'key': key,
+        'label': label,
+        'colors': [colormap.rgb_hex_str(x) for x in colormap.index],
+        'index': list(colormap.index),
+        'format': fmt,
+    }
+
+
+class MetricSwitcher(MacroElement):
+    """
+    Radio-button control that colors one shared feature layer by the
+    selected metric. Switching calls setStyle() on the existing paths -
+    nothing is parsed or rebuilt. The layer should be added to the map
+    with show=False, control=False; the switcher adds and removes it.
+    Features with no value for the metric are drawn in NO_DATA_COLOR.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var layer = {{ this.layer.get_name() }};
+            var metrics = {{ this.metrics|tojson }};
+            var baseStyle = {{ this.base_style|tojson }};
+            var tooltipFields = {{ this.tooltip_fields|tojson }};
+            var noData = {{ this.no_data|tojson }};
+            var current = null;
+
+            function rgb(hex) {
+                return [1, 3, 5].map(function(i) { return parseInt(hex.substr(i, 2), 16); });
+            }
+            metrics.forEach(function(m) { m.rgb = m.colors.map(rgb); });
+
+            // Piecewise-linear like branca.colormap.LinearColormap
+            function colorFor(m, value) {
+                if (value === null || value === undefined || value !== value) return noData;
+                var idx = m.index, n = idx.length;
+                if (!(value > idx[0])) return m.colors[0];
+                if (value >= idx[n - 1]) return m.colors[n - 1];
+                var i = 1;
+                while (idx[i] < value) i++;
+                var p = (value - idx[i - 1]) / (idx[i] - idx[i - 1]);
+                var a = m.rgb[i - 1], b = m.rgb[i];
+                return '#' + [0, 1, 2].map(function(j) {
+                    return ('0' + Math.round((1 - p) * a[j] + p * b[j]).toString(16)).slice(-2);
+                }).join('');
+            }
+
+            function format(m, value) {
+                if (value === null || value === undefined) return 'n/a';
+                var text = Number(value).toLocaleString(undefined, {maximumFractionDigits: 0});
+                return m.format === 'currency' ? '$' + text : text;
+            }
+
+            function style(feature) {
+                var p = feature && feature.properties;
+                var color = colorFor(metrics[current], p ? p[metrics[current].key] : null);
+                return Object.assign({}, baseStyle, {fillColor: color, color: color});
+            }
+
+            layer.bindTooltip(function(l) {
+                var p = l.feature.properties, m = metrics[current];
+                var rows = tooltipFields.map(function(f) {
+                    return '<tr><th>' + f[1] + '</th><td>' + (p[f[0]] == null ? '' : p[f[0]]) + '</td></tr>';
+                });
+                rows.push('<tr><th>' + m.label + ':</th><td>' + format(m, p[m.key]) + '</td></tr>');
+                return '<table>' + rows.join('') + '</table>';
+            }, {sticky: true});
+
+            function select(i) {
+                current = i;
+                if (i === null) {
+                    map.removeLayer(layer);
+                    return;
+                }
+                layer.options.style = style;
+                layer.setStyle(style);
+                if (!map.hasLayer(layer)) map.addLayer(layer);
+            }
+
+            var control = L.control({position: {{ this.position|tojson }}});
+            control.onAdd = function() {
+                var div = L.DomUtil.create('div', 'leaflet-control-layers leaflet-control-layers-expanded');
+                var html = '<b>' + {{ this.title|tojson }} + '</b>';
+                var options = [[-1, 'None']].concat(metrics.map(function(m, i) { return [i, m.label]; }));
+                options.forEach(function(o) {
+                    html += '<label style="display:block"><input type="radio" name="{{ this.get_name() }}" value="' +
+                        o[0] + '"' + ((current === null ? -1 : current) === o[0] ? ' checked' : '') + '> ' + o[1] + '</label>';
+                });
+                div.innerHTML = html;
+                L.DomEvent.disableClickPropagation(div);
+                L.DomEvent.on(div, 'change', function(e) {
+                    var i = parseInt(e.target.value, 10);
+                    select(i < 0 ? null : i);
+                });
+                return div;
+            };
+            {% if this.default is not none %}select({{ this.default }});{% endif %}
+            control.addTo(map);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, layer, metrics, tooltip_fields=(), base_style=None, default=None,
+                 title='Demographic', position='topright'):
+        super().__init__()
+        self._name = 'MetricSwitcher'
+        self.layer = layer
+        self.metrics = list(metrics)
+        self.tooltip_fields = [list(f) for f in tooltip_fields]
+        self.base_style = base_style or {'weight': 0.5, 'fillOpacity': 0.7}
+        self.no_data = NO_DATA_COLOR
+        self.default = None if default is None else [m['key'] for m in self.metrics].index(default)
+        self.title = title
+        self.position = position
+
+
+# ---------------------------------------------------------------------------
+# Data sidecars
+# ---------------------------------------------------------------------------
+
+# In-page decoder for pack_geometries; also run by bench_coordinates
+UNPACK_JS = """
+function unpackVarints(b64) {
+    var bin = atob(b64), out = new Float64Array(bin.length), n = 0, value = 0, mul = 1;
+    for (var i = 0; i < bin.length; i++) {
+        var b = bin.charCodeAt(i);
+        value += (b & 0x7f) * mul;
+        if (b & 0x80) {
+            mul *= 128;
+        } else {
+            out[n++] = value;
+            value = 0;
+            mul = 1;
+        }
+    }
+    return out.subarray(0, n);
+}
+
+// Packed geometries back into GeoJSON coordinates
+function unpackGeometries(data) {
+    if (!data || !data.packed) return data;
+    var DEPTH = {Point: 0, MultiPoint: 1, LineString: 1, MultiLineString: 2, Polygon: 2, MultiPolygon: 3};
+    var scale = data.packed.scale;
+    var sizes = unpackVarints(data.packed.sizes), deltas = unpackVarints(data.packed.coords);
+    var s = 0, c = 0, x = 0, y = 0;
+    function zigzag(n) { return n % 2 ? -(n + 1) / 2 : n / 2; }
+    function read(depth) {
+        if (depth === 0) {
+            x += zigzag(deltas[c++]);
+            y += zigzag(deltas[c++]);
+            return [x / scale, y / scale];
+        }
+        var n = sizes[s++], out = new Array(n);
+        for (var i = 0; i < n; i++) out[i] = read(depth - 1);
+        return out;
+    }
+    data.features.forEach(function(feature) {
+        var geometry = feature.geometry;
+        if (geometry && !geometry.coordinates && geometry.type in DEPTH) {
+            geometry.coordinates = read(DEPTH[geometry.type]);
+        }
+    });
+    delete data.packed;
+    return data;
+}
+"""
+
+
+class SidecarLoader(MacroElement):
+    """
+    Lets L.geoJson layers take {"sidecar": url} in place of their data:
+    the JSON is fetched asynchronously and added when it arrives. TopoJSON
+    sidecars are converted with topojson.feature first. Layers without a
+    style option get the per-feature styles folium stores in properties.
+
+    Data carrying "columns" (see encode_columns) gets its feature
+    properties rebuilt from them, and data carrying "packed" (see
+    pack_geometries) its coordinates, before Leaflet sees it, inline or
+    not.
+
+    With lazy=True a layer stays an empty stub (listed in the LayerControl
+    as usual) until it is first added to the map; its data is fetched and
+    built then and kept for later toggles.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var TYPES = {u8: Uint8Array, i8: Int8Array, u16: Uint16Array, i16: Int16Array,
+                         u32: Uint32Array, i32: Int32Array, f32: Float32Array, f64: Float64Array};
+            var FORMATS = {
+                number: function(v) { return Math.round(v).toLocaleString('en-US'); },
+                currency: function(v) { return '$' + Math.round(v).toLocaleString('en-US'); }
+            };
+
+            function typed(column) {
+                var bin = atob(column.data), bytes = new Uint8Array(bin.length);
+                for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+                return new TYPES[column.type](bytes.buffer);
+            }
+
+            function reader(column) {
+                var read;
+                if (TYPES[column.type]) {
+                    var values = typed(column);
+                    read = function(i) { var v = values[i]; return v !== v ? null : v; };
+                } else if (column.type === 'dict') {
+                    var codes = typed(column.codes);
+                    read = function(i) { return column.values[codes[i]]; };
+                } else {
+                    read = function(i) { return column.values[i]; };
+                }
+                if (!column.format) return read;
+                var format = FORMATS[column.format];
+                return function(i) { var v = read(i); return v === null ? null : format(v); };
+            }
+
+            {{ this.unpack_js }}
+
+            function prepare(data) {
+                return withProperties(unpackGeometries(data));
+            }
+
+            // Per-column arrays back into feature.properties
+            function withProperties(data) {
+                if (!data || !data.columns) return data;
+                var keys = Object.keys(data.columns);
+                var readers = keys.map(function(key) { return reader(data.columns[key]); });
+                data.features.forEach(function(feature, i) {
+                    var properties = {};
+                    for (var k = 0; k < keys.length; k++) properties[keys[k]] = readers[k](i);
+                    feature.properties = properties;
+                });
+                delete data.columns;
+                return data;
+            }
+
+            // Layers sharing a sidecar fetch it once; each parses its own copy
+            var texts = {};
+            function fetchText(url) {
+                if (!texts[url]) texts[url] = fetch(url).then(function(response) { return response.text(); });
+                return texts[url];
+            }
+
+            var addData = L.GeoJSON.prototype.addData;
+            L.GeoJSON.prototype.addData = function(data) {
+                if (!data || !data.sidecar) return addData.call(this, prepare(data));
+                var layer = this;
+                function load() {
+                    fetchText(data.sidecar)
+                        .then(function(text) {
+                            var loaded = JSON.parse(text);
+                            if (data.sidecar_object) {
+                                loaded = topojson.feature(loaded, loaded.objects[data.sidecar_object]);
+                            }
+                            addData.call(layer, prepare(loaded));
+                            if (!layer.options.style) {
+                                layer.eachLayer(function(l) {
+                                    var style = l.feature && l.feature.properties && l.feature.properties.style;
+                                    if (style && l.setStyle) l.setStyle(style);
+                                });
+                            }
+                            layer.fire('sidecarload');
+                        });
+                }
+                {%- if this.lazy %}
+                if (layer._map) load(); else layer.once('add', load);
+                {%- else %}
+                load();
+                {%- endif %}
+                return this;
+            };
+            if (window.topojson) {
+                var feature = topojson.feature;
+                topojson.feature = function(topology, object) {
+                    if (topology && topology.sidecar) {
+                        return {type: 'FeatureCollection', features: [], sidecar: topology.sidecar,
+                                sidecar_object: topology.sidecar_object};
+                    }
+                    var result = feature.apply(this, arguments);
+                    if (object && object.columns) result.columns = object.columns;
+                    return result;
+                };
+            }
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, lazy=LAZY_LAYERS):
+        super().__init__()
+        self._name = 'SidecarLoader'
+        self.lazy = lazy
+        self.unpack_js = UNPACK_JS
+
+
+class _DataProxy:
+    """Stands in for a layer while its macros render, with .data swapped"""
+
+    def __init__(self, element, data):
+        self._element = element
+        self.data = data
+
+    def __getattr__(self, name):
+        return getattr(self._element, name)
+
+
+def _swap_data(template, data):
+    """A template whose macros see `data` as this.data"""
+    macros = {name: macro for name, macro in template.module.__dict__.items() if callable(macro)}
+    return types.SimpleNamespace(module=types.SimpleNamespace(**{
+        name: (lambda this, kwargs, macro=macro: macro(_DataProxy(this, data), kwargs))
+        for name, macro in macros.items()
+    }))
+
+
+def _json_safe(value):
+    """NaN/inf become null - valid in inline JS, not in a JSON file"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+def _dumps(data):
+    try:
+        return json.dumps(data, separators=(',', ':'), allow_nan=False)
+    except ValueError:
+        return json.dumps(_json_safe(data), separators=(',', ':'), allow_nan=False)
+
+
+def write_sidecar(text, out_dir, data_dir=SIDECAR_DIR):
+    """Write text as <data_dir>/<content hash>.json under out_dir; returns its relative URL"""
+    digest = hashlib.sha256(text.encode()).hexdigest()[:16]
+    url = f'{data_dir}/{digest}.json'
+    path = os.path.join(out_dir, url)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+    return url
+
+
+# Smallest exact integer array first
+_INT_TYPES = [('u8', np.uint8), ('i8', np.int8), ('u16', np.uint16), ('i16', np.int16),
+              ('u32', np.uint32), ('i32', np.int32)]
+
+
+def _typed(values):
+    """{'type', 'data'} of a float64 array as the smallest typed array that holds it exactly"""
+    array = None
+    if np.isfinite(values).all() and (values == np.round(values)).all():
+        lo, hi = values.min(initial=0), values.max(initial=0)
+        for name, dtype in _INT_TYPES:
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                array = values.astype(dtype)
+                break
+    if array is None:
+        f32 = values.astype(np.float32)
+        name, array = ('f32', f32) if np.array_equal(f32, values, equal_nan=True) else ('f64', values)
+    # Little-endian, like the typed arrays of every browser
+    return {'type': name, 'data': base64.b64encode(array.astype(array.dtype.newbyteorder('<')).tobytes()).decode()}
+
+
+def encode_columns(properties, formats=None):
+    """
+    Per-column encoding of a properties DataFrame (one row per feature):
+    numbers as base64 typed arrays (NaN for missing), other values
+    dictionary-encoded when they repeat, plain lists otherwise. formats
+    maps columns to a format applied in the page ('number', 'currency').
+    """
+    columns = {}
+    for key in properties.columns:
+        col = properties[key]
+        if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+            spec = _typed(col.to_numpy(dtype=np.float64, na_value=np.nan))
+        else:
+            values = [None if v is None or (isinstance(v, float) and math.isnan(v)) else v
+                      for v in _json_safe(col.tolist())]
+            texts = [json.dumps(v, sort_keys=True) for v in values]
+            codes, uniques = pd.factorize(pd.Series(texts, dtype=object))
+            if len(uniques) <= len(values) / 2:
+                spec = {'type': 'dict', 'values': [json.loads(t) for t in uniques],
+                        'codes': _typed(codes.astype(np.float64))}
+            else:
+                spec = {'type': 'list', 'values': values}
+        if formats and key in formats:
+            spec['format'] = formats[key]
+        columns[str(key)] = spec
+    return columns
+
+
+def client_format(layer, **formats):
+    """
+    Have the page format these raw numeric properties of layer, e.g.
+    value='currency'. Without columnar properties they are formatted here
+    (formatted_data) the same way.
+    """
+    layer.column_formats = dict(getattr(layer, 'column_formats', {}), **formats)
+    return layer
+
+
+# Python twins of the page's FORMATS (Math.round, en-US grouping)
+_FORMATS = {
+    'number': lambda v: f'{math.floor(v + 0.5):,}',
+    'currency': lambda v: f'${math.floor(v + 0.5):,}',
+}
+
+
+def formatted_data(data, features_key, formats):
+    """Copy of GeoJSON/TopoJSON data with the properties named in formats formatted as text"""
+    features = []
+    for feature in features_key(data):
+        properties = dict(feature.get('properties') or {})
+        for key, fmt in formats.items():
+            value = properties.get(key)
+            if value is not None and math.isfinite(value):
+                properties[key] = _FORMATS[fmt](value)
+        features.append(dict(feature, properties=properties))
+    return features_key(data, features)
+
+
+def columnar_data(data, features_key, formats=None):
+    """
+    Copy of GeoJSON/TopoJSON data whose features (found via features_key,
+    see _layer_features) carry no properties, with the properties moved
+    to columns next to them (data['columns'], or the TopoJSON object's
+    'columns'). Returns (data, property bytes as per-feature objects,
+    property bytes as columns).
+    """
+    features = features_key(data)
+    records = [f.get('properties') or {} for f in features]
+    columns = encode_columns(pd.DataFrame.from_records(records), formats)
+    stripped = [{k: v for k, v in f.items() if k != 'properties'} for f in features]
+    return features_key(data, stripped, columns), len(_dumps(records)), len(_dumps(columns))
+
+
+# Nesting depth of the coordinate arrays per geometry type
+_DEPTH = {'Point': 0, 'MultiPoint': 1, 'LineString': 1, 'MultiLineString': 2, 'Polygon': 2, 'MultiPolygon': 3}
+
+
+def _varints(values):
+    """Concatenated LEB128 varints of a non-negative integer array"""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        sizes += rest > 0
+        rest >>= np.uint64(7)
+    out = np.empty(sizes.sum(), dtype=np.uint8)
+    starts = np.cumsum(sizes) - sizes
+    rest = values.copy()
+    for k in range(sizes.max(initial=0)):
+        live = sizes > k
+        more = np.where(sizes[live] > k + 1, 0x80, 0)
+        out[starts[live] + k] = (rest[live] & np.uint64(0x7F)) | more.astype(np.uint64)
+        rest >>= np.uint64(7)
+    return out.tobytes()
+
+
+def pack_geometries(geometries, scale=COORDINATE_SCALE):
+    """
+    Quantize, delta-encode and varint-pack a list of GeoJSON geometry
+    mappings. Returns (stubs, packed): stubs are the geometries reduced to
+    their type (geometries that cannot be packed - None, collections - are
+    passed through), packed is {'scale', 'sizes', 'coords'} with the array
+    lengths of every nesting level and the zigzag x/y deltas against the
+    previous vertex, as base64 varints in geometry order.
+    """
+    stubs, sizes, parts = [], [], []
+
+    def walk(coords, depth):
+        sizes.append(len(coords))
+        if depth == 1:
+            parts.append(coords)
+        else:
+            for c in coords:
+                walk(c, depth - 1)
+
+    for geometry in geometries:
+        depth = _DEPTH.get((geometry or {}).get('type'))
+        if depth is None or 'coordinates' not in geometry:
+            stubs.append(geometry)
+            continue
+        if depth == 0:
+            parts.append([geometry['coordinates']])
+        else:
+            walk(geometry['coordinates'], depth)
+        stubs.append({'type': geometry['type']})
+
+    points = np.array([p[:2] for part in parts for p in part], dtype=np.float64).reshape(-1, 2)
+    quantized = np.round(points * scale).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    zigzag = (deltas << 1) ^ (deltas >> 63)
+    return stubs, {
+        'scale': scale,
+        'sizes': base64.b64encode(_varints(sizes)).decode(),
+        'coords': base64.b64encode(_varints(zigzag)).decode(),
+    }
+
+
+def packed_data(data, scale=COORDINATE_SCALE):
+    """
+    Copy of a GeoJSON FeatureCollection with its coordinates in
+    data['packed'] (see pack_geometries). Returns (data, geometry bytes as
+    GeoJSON, geometry bytes packed).
+    """
+    geometries = [f.get('geometry') for f in data['features']]
+    stubs, packed = pack_geometries(geometries, scale)
+    features = [dict(f, geometry=stub) for f, stub in zip(data['features'], stubs)]
+    return dict(data, features=features, packed=packed), len(_dumps(geometries)), len(_dumps(stubs)) + len(_dumps(packed))
+
+
+def _layer_features(layer):
+    """
+    Accessor of the feature list of a layer's data: fn(data) returns it,
+    fn(data, features, columns) a copy of data holding features (and
+    their columns, see columnar_data) instead. None when the data is not
+    a feature collection.
+    """
+    if isinstance(layer, folium.TopoJson):
+        name = layer.object_path.split('.')[-1]
+
+        def key(data, features=None, columns=None):
+            if features is None:
+                return data['objects'][name].get('geometries') or []
+            obj = dict(data['objects'][name], geometries=features)
+            if columns is not None:
+                obj['columns'] = columns
+            return dict(data, objects=dict(data['objects'], **{name: obj}))
+        return key
+    if not isinstance(layer.data, dict) or layer.data.get('type') != 'FeatureCollection':
+        return None
+
+    def key(data, features=None, columns=None):
+        if features is None:
+            return data['features']
+        data = dict(data, features=features)
+        if columns is not None:
+            data['columns'] = columns
+        return data
+    return key
+
+
+def _data_layers(element):
+    for child in element._children.values():
+        if isinstance(child, (folium.GeoJson, folium.TopoJson)) and child.embed:
+            yield child
+        yield from _data_layers(child)
+
+
+def _shown(element):
+    """Whether element and every layer above it start out on the map"""
+    while element is not None:
+        if not getattr(element, 'show', True):
+            return False
+        element = element._parent
+    return True
+
+
+def _page_data(layers, columnar, packed, stats):
+    """The data of layers (all over the same dict) as the page gets it, adding to the stats"""
+    data = layers[0].data
+    keys = {}
+    for layer in layers:
+        features_key = _layer_features(layer)
+        if features_key is not None:
+            keys[getattr(layer, 'object_path', None)] = features_key
+    formats = {}
+    for layer in layers:
+        formats.update(getattr(layer, 'column_formats', {}))
+    for features_key in keys.values():
+        if columnar and features_key(data):
+            data, before, after = columnar_data(data, features_key, formats)
+            stats['properties_before'] += before
+            stats['properties_after'] += after
+        elif formats:
+            data = formatted_data(data, features_key, formats)
+    if packed and keys and not isinstance(layers[0], folium.TopoJson) and data['features']:
+        data, before, after = packed_data(data)
+        stats['coordinates_before'] += before
+        stats['coordinates_after'] += after
+    return data
+
+
+def externalize_data(m, out_dir, data_dir=SIDECAR_DIR, min_bytes=SIDECAR_MIN_BYTES, lazy=LAZY_LAYERS,
+                     columnar=COLUMNAR_PROPERTIES, packed=PACKED_COORDINATES):
+    """
+    Point every embedded GeoJson/TopoJson layer of map m at a sidecar file
+    and, with columnar, send its feature properties as columns; with
+    packed, GeoJson coordinates go as varints (TopoJSON arcs already are
+    delta-encoded integers).
+
+    Styles, tooltips and bounds are still computed from the real data at
+    render time; only the data literal in the page is replaced. Returns
+    {'files': n, 'bytes': total sidecar bytes, 'load_bytes': bytes fetched
+    at page load (with lazy, only the layers shown initially),
+    'properties_before' / 'properties_after': property bytes as
+    per-feature objects and as columns, 'coordinates_before' /
+    'coordinates_after': geometry bytes as GeoJSON and packed}.
+    """
+    stats = dict.fromkeys(['files', 'bytes', 'load_bytes', 'properties_before', 'properties_after',
+                           'coordinates_before', 'coordinates_after'], 0)
+    layers = list(_data_layers(m))
+    for layer in layers:
+        if isinstance(layer, folium.TopoJson):
+            layer.style_data()
+    # Layers over one data dict (e.g. TopoJSON objects on one shared arc
+    # set) are encoded once and point at the same sidecar
+    encoded = {}
+    for layer in layers:
+        first = id(layer.data) not in encoded
+        if first:
+            group = [other for other in layers if other.data is layer.data]
+            data = _page_data(group, columnar, packed, stats)
+            encoded[id(layer.data)] = data, _dumps(data)
+        data, text = encoded[id(layer.data)]
+        if len(text) < min_bytes:
+            if data is not layer.data:
+                layer._template = _swap_data(layer._template, data)
+            continue
+        url = write_sidecar(text, out_dir, data_dir)
+        if isinstance(layer, folium.TopoJson):
+            name = layer.object_path.split('.')[-1]
+            stub = {'type': 'Topology', 'objects': {name: {'type': 'GeometryCollection', 'geometries': []}},
+                    'sidecar': url, 'sidecar_object': name}
+        else:
+            stub = {'type': 'FeatureCollection', 'features': [], 'sidecar': url}
+        layer._template = _swap_data(layer._template, stub)
+        if first:
+            stats['files'] += 1
+            stats['bytes'] += len(text)
+            if not lazy or any(_shown(other) for other in group):
+                stats['load_bytes'] += len(text)
+    # Viewport chunks may be columnar or packed too
+    chunked = any(isinstance(child, ViewportLoader) for child in m._children.values())
+    if stats['files'] or stats['properties_before'] or stats['coordinates_before'] or chunked:
+        # Before any layer script so the first addData() already goes through it
+        m.add_child(SidecarLoader(lazy), index=0)
+    return stats
+
+
+def save_map(m, path, sidecars=DATA_SIDECARS, data_dir=SIDECAR_DIR, lazy=LAZY_LAYERS,
+             columnar=COLUMNAR_PROPERTIES, packed=PACKED_COORDINATES):
+    """
+    m.save(path), optionally with layer data in hashed sidecar files,
+    properties as columns and packed coordinates
+    """
+    stats = {}
+    formats = any(getattr(layer, 'column_formats', None) for layer in _data_layers(m))
+    if sidecars or columnar or packed or formats:
+        stats = externalize_data(m, os.path.dirname(os.path.abspath(path)), data_dir,
+                                 min_bytes=SIDECAR_MIN_BYTES if sidecars else math.inf,
+                                 lazy=lazy, columnar=columnar, packed=packed)
+    m.save(path)
+    if stats.get('files'):
+        print(f"   📦 {os.path.getsize(path) / 1e6:.2f} MB page + {stats['files']} data sidecars "
+              f"({stats['bytes'] / 1e6:.1f} MB) in {data_dir}/, {stats['load_bytes'] / 1e6:.1f} MB fetched on load")
+    if stats.get('properties_before'):
+        saved = stats['properties_before'] - stats['properties_after']
+        print(f"   🧮 Feature attributes {stats['properties_before'] / 1e6:.2f} MB → "
+              f"{stats['properties_after'] / 1e6:.2f} MB as columns ({saved:,} bytes saved)")
+    if stats.get('coordinates_before'):
+        print(f"   📐 Coordinates {stats['coordinates_before'] / 1e6:.2f} MB → "
+              f"{stats['coordinates_after'] / 1e6:.2f} MB packed")
+    return stats
+
+
+class ViewportLoader(MacroElement):
+    """
+    Keeps `layer` filled with the chunks of a viewport_chunks index that
+    intersect the (padded) view, at the level serving the current zoom.
+    Chunks are fetched on first need and their features added straight to
+    the layer (tracked per chunk) with its current style, so setStyle(),
+    tooltips and MetricSwitcher work as on a fully loaded layer. Chunks out
+    of view are taken off the layer at once and dropped from memory once
+    they have been out of view for evict_after seconds. Nothing loads
+    while the layer is not on the map.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var layer = {{ this.layer.get_name() }};
+            var levels = {{ this.levels|tojson }};
+            var chunks = {};
+
+            function levelFor(zoom) {
+                for (var i = 0; i < levels.length; i++) {
+                    if (zoom <= levels[i].max_zoom) return levels[i];
+                }
+                return levels[levels.length - 1];
+            }
+
+            function intersects(b, bounds) {
+                return b[0] <= bounds.getEast() && b[2] >= bounds.getWest() &&
+                       b[1] <= bounds.getNorth() && b[3] >= bounds.getSouth();
+            }
+
+            function restyle(l) {
+                var style = layer.options.style;
+                if (style && l.setStyle) l.setStyle(typeof style === 'function' ? style(l.feature) : style);
+            }
+
+            function update() {
+                if (!map.hasLayer(layer)) return;
+                var bounds = map.getBounds().pad({{ this.pad }});
+                var wanted = {}, now = Date.now(), changed = false;
+                levelFor(map.getZoom()).chunks.forEach(function(c) {
+                    if (intersects(c.bbox, bounds)) wanted[c.url] = true;
+                });
+                Object.keys(chunks).forEach(function(url) {
+                    var chunk = chunks[url];
+                    if (!wanted[url] && chunk.shown) {
+                        chunk.features.forEach(function(l) { layer.removeLayer(l); });
+                        chunk.shown = false;
+                        changed = true;
+                    }
+                });
+                Object.keys(wanted).forEach(function(url) {
+                    var chunk = chunks[url] = chunks[url] || {};
+                    chunk.seen = now;
+                    if (chunk.features) {
+                        if (!chunk.shown) {
+                            chunk.features.forEach(function(l) {
+                                // The style may have changed while it was away
+                                restyle(l);
+                                layer.addLayer(l);
+                            });
+                            chunk.shown = true;
+                            changed = true;
+                        }
+                    } else if (!chunk.pending) {
+                        chunk.pending = true;
+                        fetch(url)
+                            .then(function(response) { return response.json(); })
+                            .then(function(data) {
+                                chunk.pending = false;
+                                // Feature layers only - the group they are parsed into is dropped
+                                chunk.features = L.geoJson(data).getLayers();
+                                update();
+                            }, function() { chunk.pending = false; });
+                    }
+                });
+                if (changed) layer.fire('chunkupdate');
+            }
+
+            // Parsed chunks that stayed out of view are released
+            setInterval(function() {
+                var now = Date.now();
+                Object.keys(chunks).forEach(function(url) {
+                    var chunk = chunks[url];
+                    if (chunk.pending || chunk.shown) return;
+                    if (now - chunk.seen > {{ this.evict_after * 1000 }}) delete chunks[url];
+                });
+            }, {{ this.evict_after * 250 }});
+
+            map.on('moveend', update);
+            layer.on('add', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, layer, index, pad=0.25, evict_after=60):
+        super().__init__()
+        self._name = 'ViewportLoader'
+        self.layer = layer
+        self.levels = index['levels']
+        self.pad = pad
+        self.evict_after = evict_after
+
+
+# ---------------------------------------------------------------------------
+# Renderers
+# ---------------------------------------------------------------------------
+
+def renderer_option(default='svg'):
+    """The --renderer svg|canvas|webgl command-line option, else default"""
+    args = sys.argv[1:]
+    if '--renderer' not in args:
+        return default
+    i = args.index('--renderer')
+    renderer = args[i + 1] if i + 1 < len(args) else None
+    if renderer not in RENDERERS:
+        raise SystemExit(f"--renderer must be one of: {', '.join(RENDERERS)}")
+    return renderer
+
+
+class WebGLPolygons(JSCSSMixin, MacroElement):
+    """
+    Draws its parent GeoJson/TopoJson layer with WebGL (Leaflet.glify)
+    instead of SVG paths. The layer keeps its Leaflet API: adding and
+    removing it (directly, via a FeatureGroup or the LayerControl),
+    setStyle() with a style function, and the tooltip bound to it, which
+    is shown on hover at the pointer. Fill color and opacity come from the
+    layer's style; per-feature highlight on hover is not drawn.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var layer = {{ this._parent.get_name() }};
+            var gl = null, tooltip = null;
+
+            function rgb(hex) {
+                return [1, 3, 5].map(function(i) { return parseInt(hex.substr(i, 2), 16) / 255; });
+            }
+
+            function styleOf(feature) {
+                var style = layer.options.style;
+                return (typeof style === 'function' ? style(feature) : style) || feature.properties.style || {};
+            }
+
+            function tooltipFor(feature) {
+                var bound = layer.getTooltip();
+                if (!bound) return null;
+                var content = bound._content;
+                return typeof content === 'function' ? content({feature: feature}) : content;
+            }
+
+            // Features of the layer, including any nested groups
+            function collect(group, features) {
+                group.eachLayer(function(l) {
+                    if (l.feature) features.push(l.feature);
+                    else if (l.eachLayer) collect(l, features);
+                });
+                return features;
+            }
+
+            function draw(map) {
+                if (gl) gl.remove();
+                gl = null;
+                var features = collect(layer, []);
+                if (!features.length) return;
+                var first = styleOf(features[0]);
+                gl = L.glify.shapes({
+                    map: map,
+                    data: {type: 'FeatureCollection', features: features},
+                    opacity: first.fillOpacity === undefined ? 0.7 : first.fillOpacity,
+                    border: {{ this.border|tojson }},
+                    color: function(i, feature) {
+                        var style = styleOf(feature);
+                        var c = rgb(style.fillColor || style.color || '#3388ff');
+                        return {r: c[0], g: c[1], b: c[2]};
+                    },
+                    hover: function(e, feature) {
+                        var content = tooltipFor(feature);
+                        if (content === null) return;
+                        tooltip = tooltip || L.tooltip(layer.getTooltip().options);
+                        tooltip.setContent(content).setLatLng(e.latlng);
+                        map.openTooltip(tooltip);
+                    },
+                    hoverOff: function() {
+                        if (tooltip) map.closeTooltip(tooltip);
+                    }
+                });
+            }
+
+            var onRemove = layer.onRemove;
+            layer.onAdd = function(map) { draw(map); };
+            layer.onRemove = function(map) {
+                if (gl) gl.remove();
+                gl = null;
+                if (tooltip) map.closeTooltip(tooltip);
+            };
+            // Features added later (sidecars) are collected, never put on the map as paths
+            layer.addLayer = function(l) {
+                this._layers[this.getLayerId(l)] = l;
+                return this;
+            };
+            layer.setStyle = function(style) {
+                this.options.style = style;
+                if (this._map) draw(this._map);
+                return this;
+            };
+            layer.on('sidecarload chunkupdate', function() { if (layer._map) draw(layer._map); });
+
+            // Already on the map as SVG paths: take them off and redraw
+            if (layer._map) {
+                onRemove.call(layer, layer._map);
+                draw(layer._map);
+            }
+        })();
+        {% endmacro %}
+    """)
+
+    default_js = [
+        ('leaflet.glify', 'https://unpkg.com/leaflet.glify@3.2.0/dist/glify-browser.js'),
+    ]
+
+    def __init__(self, border=False):
+        super().__init__()
+        self._name = 'WebGLPolygons'
+        self.border = border
+
+
+class FrameTimer(MacroElement):
+    """
+    Pan benchmark, active only when the page URL has #frametime: shows
+    `layers`, pans through `steps` and records requestAnimationFrame
+    intervals. The summary (p50/p95/max frame ms, fps, frames over 50 ms)
+    lands in window.frameStats, the console, a box on the map and - when
+    the page is framed - a postMessage to the parent.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            if (location.hash.indexOf('frametime') < 0) return;
+            var map = {{ this._parent.get_name() }};
+            var steps = {{ this.steps|tojson }};
+
+            function percentile(sorted, p) {
+                return sorted[Math.min(sorted.length - 1, Math.floor(p * sorted.length))];
+            }
+
+            function report(times) {
+                var sorted = times.slice().sort(function(a, b) { return a - b; });
+                var total = times.reduce(function(a, b) { return a + b; }, 0);
+                var stats = {
+                    label: {{ this.label|tojson }},
+                    frames: times.length,
+                    p50: percentile(sorted, 0.5),
+                    p95: percentile(sorted, 0.95),
+                    max: sorted[sorted.length - 1],
+                    fps: 1000 * times.length / total,
+                    long: times.filter(function(t) { return t > 50; }).length
+                };
+                window.frameStats = stats;
+                console.log('frametime ' + JSON.stringify(stats));
+                var box = L.control({position: 'bottomleft'});
+                box.onAdd = function() {
+                    var div = L.DomUtil.create('div', 'leaflet-control-layers');
+                    div.style.padding = '6px';
+                    div.innerHTML = '<b>' + stats.label + '</b> p50 ' + stats.p50.toFixed(1) + ' ms, p95 ' +
+                        stats.p95.toFixed(1) + ' ms, ' + stats.fps.toFixed(0) + ' fps, ' + stats.long + ' long frames';
+                    return div;
+                };
+                box.addTo(map);
+                if (window.parent !== window) window.parent.postMessage({frametime: stats}, '*');
+            }
+
+            function run() {
+                var times = [], last = null, running = true, i = 0;
+                function frame(t) {
+                    if (last !== null) times.push(t - last);
+                    last = t;
+                    if (running) requestAnimationFrame(frame);
+                }
+                function next() {
+                    if (i === steps.length) {
+                        running = false;
+                        report(times);
+                        return;
+                    }
+                    map.panBy(steps[i++], {duration: {{ this.step_ms / 1000 }}});
+                    setTimeout(next, {{ this.step_ms + 100 }});
+                }
+                requestAnimationFrame(frame);
+                next();
+            }
+
+            window.addEventListener('load', function() {
+                {%- for layer in this.layers %}
+                map.addLayer({{ layer.get_name() }});
+                {%- endfor %}
+                setTimeout(run, {{ this.settle_ms }});
+            });
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, layers=(), label='', steps=None, step_ms=500, settle_ms=2000):
+        super().__init__()
+        self._name = 'FrameTimer'
+        self.layers = list(layers)
+        self.label = label
+        # A loop out and back so every run ends where it started
+        self.steps = steps or [[300, 0], [0, 200], [-300, 0], [0, -200]] * 3
+        self.step_ms = step_ms
+        self.settle_ms = settle_ms
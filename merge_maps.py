@@ -7,6 +7,7 @@ import folium
 from folium import plugins
 import pandas as pd
 import re
+from map_client import save_map
 
 print("🔄 Merging original locations with demographic overlays...")
 print("=" * 70)
@@ -264,7 +265,7 @@ m.get_root().html.add_child(folium.Element(legend_html))
 
 # Save
 output_file = '/workspace/interactive-map-combined.html'
-m.save(output_file)
+save_map(m, output_file)
 
 print(f"\n✅ Combined map saved to: {output_file}")
 print("\n📋 Map includes:")
@@ -5,16 +5,22 @@ Merge all county zip codes with demographic data
 
 import pandas as pd
 import numpy as np
+from snapshots import skip_if_current, record_stage, snapshot
+from stage_io import read_stage, stage_file, write_stage
 
 print("🔄 Merging county zip codes with demographic data...")
 print("=" * 70)
 
+STAGE_INPUTS = [__file__, stage_file('/workspace/all_county_zips'), stage_file('/workspace/demographic_data')]
+skip_if_current('merge_with_demographics', STAGE_INPUTS,
+                outputs=['/workspace/complete_demographic_data.arrow'])
+
 # Load the zip codes with coordinates
-zips_df = pd.read_csv('/workspace/all_county_zips.csv', dtype={'zip_code': str})
+zips_df = read_stage('/workspace/all_county_zips', dtype={'zip_code': str}, zero_copy=False)
 print(f"📍 Loaded {len(zips_df)} zip codes with coordinates")
 
 # Load the demographic data we generated
-demo_df = pd.read_csv('/workspace/demographic_data.csv', dtype={'zip_code': str})
+demo_df = read_stage('/workspace/demographic_data', dtype={'zip_code': str}, zero_copy=False)
 print(f"📊 Loaded {len(demo_df)} zip codes with demographics")
 
 # Merge them
@@ -107,10 +113,11 @@ for col, scheme in [('population', 'blue'), ('median_income', 'green'),
     )
 
 # Save
-output_file = '/workspace/complete_demographic_data.csv'
-merged.to_csv(output_file, index=False)
+output_file = write_stage(merged, '/workspace/complete_demographic_data')
+snapshot_id = snapshot(merged, 'complete_demographic_data', partition_by=['state', 'county'])
+record_stage('merge_with_demographics', STAGE_INPUTS, outputs=[output_file])
 
-print(f"\n✅ Saved complete dataset to: {output_file}")
+print(f"\n✅ Saved complete dataset to: {output_file} (snapshot {snapshot_id})")
 print(f"\n📊 Final Summary:")
 print(f"   Total zip codes: {len(merged)}")
 print(f"   PA: {len(merged[merged['state']=='PA'])}")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Direct Leaflet page emitter
+
+Folium builds a Python Element per layer, marker and tooltip, renders
+each through its own Jinja template and holds the whole page as one
+string before save(). For the batched polygon layers and marker groups
+the builders draw, this module writes the same Leaflet page from a single
+template instead: layers are specs over columnar data (a shapely geometry
+array plus a DataFrame of properties), and feature JSON is generated in
+batches with vectorized shapely.to_geojson and streamed straight into
+the file through Template.generate(). Only one batch of features is
+alive at a time; streamed_layer takes the batches from a generator (e.g.
+chunked_tracts) so the rows need not be in memory either, and
+layer_fills feeds several layers from one pass over such batches.
+"""
+
+import json
+
+import shapely
+from jinja2 import Template
+
+BATCH_ROWS = 2000
+
+LEAFLET_CSS = 'https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css'
+LEAFLET_JS = 'https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js'
+
+TILES = {
+    'cartodbpositron': {
+        'url': 'https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png',
+        'attribution': '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> '
+                       'contributors &copy; <a href="https://carto.com/attributions">CARTO</a>',
+        'subdomains': 'abcd',
+        'maxZoom': 20,
+    },
+}
+
+PAGE = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{{ title }}</title>
+<link rel="stylesheet" href="{{ leaflet_css }}">
+<script src="{{ leaflet_js }}"></script>
+<style>html, body, #map { width: 100%; height: 100%; margin: 0; padding: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+{{ html }}
+<script>
+var map = L.map('map', {center: {{ center|tojson }}, zoom: {{ zoom }}, preferCanvas: {{ prefer_canvas|tojson }}});
+L.tileLayer({{ tiles.url|tojson }}, {{ tiles|tojson }}).addTo(map);
+L.control.scale().addTo(map);
+var overlays = {};
+
+// Fill and stroke from each feature's color property over a constant style
+function colored(style) {
+    return function(feature) {
+        var color = feature.properties.color;
+        return Object.assign({}, style, {fillColor: color, color: color});
+    };
+}
+
+function tooltipFrom(key) {
+    return function(layer) { return layer.feature.properties[key]; };
+}
+{% for layer in layers %}
+overlays[{{ layer.name|tojson }}] = L.geoJson({"type": "FeatureCollection", "features": [
+{%- for chunk in layer.features %}{{ chunk }}{% endfor -%}
+]}, {style: colored({{ layer.style|tojson }})})
+{%- if layer.tooltip %}.bindTooltip(tooltipFrom({{ layer.tooltip|tojson }}), {sticky: true}){% endif %};
+{%- if layer.show %}
+overlays[{{ layer.name|tojson }}].addTo(map);
+{%- endif %}
+{% endfor %}
+{%- for fill in fills %}{{ fill }}{% endfor %}
+{%- for group in markers %}
+(function() {
+    var group = L.featureGroup();
+    var halo = {{ group.halo|tojson }};
+    {{ group.points|tojson }}.forEach(function(p) {
+        if (halo) L.circleMarker([p.lat, p.lon], halo).addTo(group);
+        var marker = L.marker([p.lat, p.lon], {icon: L.divIcon({html: p.icon, className: 'empty'})});
+        if (p.popup) marker.bindPopup(p.popup);
+        if (p.tooltip) marker.bindTooltip(p.tooltip);
+        marker.addTo(group);
+    });
+    overlays[{{ group.name|tojson }}] = group;
+    {%- if group.show %}
+    group.addTo(map);
+    {%- endif %}
+})();
+{%- endfor %}
+
+L.control.layers(null, overlays, {collapsed: false}).addTo(map);
+</script>
+</body>
+</html>
+""")
+
+
+def _features(geojson, properties):
+    """Comma-separated GeoJSON features for geometry strings and a properties DataFrame"""
+    props = properties.to_json(orient='records', lines=True).splitlines()
+    return ','.join('{"type":"Feature","geometry":' + g + ',"properties":' + p + '}'
+                    for g, p in zip(geojson, props))
+
+
+def feature_chunks(geometries, properties, batch_rows=BATCH_ROWS):
+    """
+    Comma-separated GeoJSON features for a geometry array and a properties
+    DataFrame aligned with it, one string per batch of batch_rows.
+    Missing property values are written as null.
+    """
+    for start in range(0, len(geometries), batch_rows):
+        yield (',' if start else '') + _features(shapely.to_geojson(geometries[start:start + batch_rows]),
+                                                 properties.iloc[start:start + batch_rows])
+
+
+def _batch_chunks(batches):
+    first = True
+    for geojson, properties in batches:
+        if len(geojson):
+            yield ('' if first else ',') + _features(geojson, properties)
+            first = False
+
+
+def polygon_layer(name, geometries, properties, style, tooltip=None, show=False, batch_rows=BATCH_ROWS):
+    """
+    Layer spec for emit_map: one L.geoJson over every feature. properties
+    needs a 'color' column (fill and stroke on top of the constant style);
+    tooltip names a column holding ready HTML. Features are generated
+    while the page is written, not here.
+    """
+    return {
+        'name': name,
+        'features': feature_chunks(geometries, properties, batch_rows),
+        'style': style,
+        'tooltip': tooltip,
+        'show': show,
+    }
+
+
+def streamed_layer(name, batches, style, tooltip=None, show=False):
+    """
+    polygon_layer over an iterable of (GeoJSON geometry strings,
+    properties DataFrame) batches, consumed while the page is written
+    """
+    return {
+        'name': name,
+        'features': _batch_chunks(batches),
+        'style': style,
+        'tooltip': tooltip,
+        'show': show,
+    }
+
+
+def layer_fills(layers, batches):
+    """
+    Statements for emit_map(fills=...) that add every batch's features to
+    each of layers (specs with no features of their own, e.g.
+    streamed_layer(name, (), style)) - the source is read once, not once
+    per layer. batches yield (GeoJSON geometry strings, one (row mask,
+    properties DataFrame of the masked rows) per layer).
+    """
+    for geojson, parts in batches:
+        for layer, (mask, properties) in zip(layers, parts):
+            if mask.any():
+                yield (f'overlays[{json.dumps(layer["name"])}].addData(['
+                       + _features(geojson[mask], properties) + ']);\n')
+
+
+def marker_group(name, points, halo=None, show=True):
+    """
+    Marker group spec for emit_map. points are dicts with lat, lon, icon
+    (DivIcon HTML) and optional popup/tooltip HTML; halo is the style of a
+    CircleMarker drawn under each one.
+    """
+    return {'name': name, 'points': list(points), 'halo': halo, 'show': show}
+
+
+def emit_map(path, layers, markers=(), center=(40.1, -74.9), zoom=9, tiles='cartodbpositron',
+             title='Map', html='', renderer='svg', fills=()):
+    """
+    Write the page to path, streaming layer features (and fills, see
+    layer_fills) as they are generated; returns bytes written. renderer is
+    'svg' or 'canvas'.
+    """
+    if renderer not in ('svg', 'canvas'):
+        raise ValueError(f"emit_map draws with 'svg' or 'canvas', not {renderer!r}")
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for piece in PAGE.generate(
+            title=title,
+            leaflet_css=LEAFLET_CSS,
+            leaflet_js=LEAFLET_JS,
+            html=html,
+            center=list(center),
+            zoom=zoom,
+            prefer_canvas=renderer == 'canvas',
+            tiles=TILES[tiles],
+            layers=layers,
+            fills=fills,
+            markers=markers,
+        ):
+            f.write(piece)
+            written += len(piece.encode('utf-8'))
+    return written
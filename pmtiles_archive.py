@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Single-file PMTiles archive for the vector tile pyramid
+
+Writes the tract and ZIP tiles from vector_tiles into one PMTiles v3
+archive instead of tens of thousands of .pbf files. Clients read the
+header and directories, then fetch tiles with HTTP range requests, so
+the archive is served as a plain static file.
+
+Tiles are streamed in Hilbert tile-id order into a temporary data file
+(identical tiles are stored once), so only the directory entries are
+kept in memory. The archive is clustered: tile data is laid out in the
+same order as the directory.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+
+import vector_tiles
+from vector_tiles import MAX_ZOOM, MIN_ZOOM, iter_tiles, tilejson
+
+ARCHIVE_PATH = '/workspace/public/tiles.pmtiles'
+
+HEADER_SIZE = 127
+# Header + root directory must fit in the client's first 16 KiB request
+ROOT_BUDGET = 16384 - HEADER_SIZE
+
+COMPRESSION_NONE = 1
+COMPRESSION_GZIP = 2
+TILE_TYPE_MVT = 1
+
+
+# ---------------------------------------------------------------------------
+# Tile ids
+# ---------------------------------------------------------------------------
+
+def zxy_to_tileid(z, x, y):
+    """PMTiles tile id: tiles of lower zooms first, then Hilbert order"""
+    acc = ((1 << (2 * z)) - 1) // 3
+    n = 1 << z
+    d = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x, y = n - 1 - x, n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return acc + d
+
+
+def tileid_to_zxy(tile_id):
+    z, acc = 0, 0
+    while acc + (1 << (2 * z)) <= tile_id:
+        acc += 1 << (2 * z)
+        z += 1
+    d, n = tile_id - acc, 1 << z
+    x = y = 0
+    s = 1
+    while s < n:
+        rx = 1 & (d // 2)
+        ry = 1 & (d ^ rx)
+        if ry == 0:
+            if rx == 1:
+                x, y = s - 1 - x, s - 1 - y
+            x, y = y, x
+        x += s * rx
+        y += s * ry
+        d //= 4
+        s *= 2
+    return z, x, y
+
+
+# ---------------------------------------------------------------------------
+# Directories
+# ---------------------------------------------------------------------------
+
+def _varint(n):
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def serialize_directory(entries):
+    """
+    Gzipped directory for a list of [tile_id, offset, length, run_length]
+    entries sorted by tile id (run_length 0 marks a leaf directory).
+    """
+    out = bytearray(_varint(len(entries)))
+    last_id = 0
+    for tile_id, _, _, _ in entries:
+        out += _varint(tile_id - last_id)
+        last_id = tile_id
+    for entry in entries:
+        out += _varint(entry[3])
+    for entry in entries:
+        out += _varint(entry[2])
+    for i, (_, offset, _, _) in enumerate(entries):
+        prev = entries[i - 1] if i else None
+        if prev is not None and offset == prev[1] + prev[2]:
+            out += _varint(0)
+        else:
+            out += _varint(offset + 1)
+    return gzip.compress(bytes(out), mtime=0)
+
+
+def build_directories(entries):
+    """
+    (root, leaves) directory bytes. Entries go in the root if it fits the
+    first request; otherwise they are split into leaf directories that
+    the root points to, growing the leaf size until the root fits.
+    """
+    root = serialize_directory(entries)
+    if len(root) <= ROOT_BUDGET:
+        return root, b''
+    leaf_size = 4096
+    while True:
+        leaves, root_entries = bytearray(), []
+        for i in range(0, len(entries), leaf_size):
+            chunk = entries[i:i + leaf_size]
+            leaf = serialize_directory(chunk)
+            root_entries.append([chunk[0][0], len(leaves), len(leaf), 0])
+            leaves += leaf
+        root = serialize_directory(root_entries)
+        if len(root) <= ROOT_BUDGET:
+            return root, bytes(leaves)
+        leaf_size = int(leaf_size * 1.2)
+
+
+def encode_header(h):
+    return (b'PMTiles' + struct.pack('<B', 3)
+            + struct.pack('<11Q', h['root_offset'], h['root_length'],
+                          h['metadata_offset'], h['metadata_length'],
+                          h['leaf_offset'], h['leaf_length'],
+                          h['data_offset'], h['data_length'],
+                          h['addressed_tiles'], h['tile_entries'], h['tile_contents'])
+            + struct.pack('<6B', 1, COMPRESSION_GZIP, COMPRESSION_GZIP, TILE_TYPE_MVT,
+                          h['min_zoom'], h['max_zoom'])
+            + struct.pack('<4i', *(round(v * 1e7) for v in h['bounds']))
+            + struct.pack('<Bii', h['center_zoom'], *(round(v * 1e7) for v in h['center'])))
+
+
+# ---------------------------------------------------------------------------
+# Writer
+# ---------------------------------------------------------------------------
+
+def write_archive(tiles, out_path, metadata, min_zoom, max_zoom):
+    """
+    Stream (z, x, y, gzipped data) tiles - ascending tile id order - into a
+    PMTiles archive. Returns archive stats.
+    """
+    entries, seen = [], {}
+    addressed = 0
+    with tempfile.TemporaryFile() as data:
+        offset = 0
+        for z, x, y, tile in tiles:
+            tile_id = zxy_to_tileid(z, x, y)
+            addressed += 1
+            digest = hashlib.sha256(tile).digest()
+            if entries and digest in seen and seen[digest] == (entries[-1][1], entries[-1][2]) \
+                    and entries[-1][0] + entries[-1][3] == tile_id:
+                # Same content as the previous tile: extend its run
+                entries[-1][3] += 1
+                continue
+            if digest in seen:
+                tile_offset, length = seen[digest]
+            else:
+                data.write(tile)
+                tile_offset, length = offset, len(tile)
+                seen[digest] = (tile_offset, length)
+                offset += length
+            entries.append([tile_id, tile_offset, length, 1])
+
+        root, leaves = build_directories(entries)
+        meta = gzip.compress(json.dumps(metadata, separators=(',', ':')).encode(), mtime=0)
+        west, south, east, north = metadata['bounds']
+        header = {
+            'root_offset': HEADER_SIZE, 'root_length': len(root),
+            'metadata_offset': HEADER_SIZE + len(root), 'metadata_length': len(meta),
+            'leaf_offset': HEADER_SIZE + len(root) + len(meta), 'leaf_length': len(leaves),
+            'data_offset': HEADER_SIZE + len(root) + len(meta) + len(leaves), 'data_length': offset,
+            'addressed_tiles': addressed, 'tile_entries': len(entries), 'tile_contents': len(seen),
+            'min_zoom': min_zoom, 'max_zoom': max_zoom,
+            'bounds': (west, south, east, north),
+            'center_zoom': min_zoom, 'center': ((west + east) / 2, (south + north) / 2),
+        }
+
+        tmp_path = out_path + '.tmp'
+        with open(tmp_path, 'wb') as out:
+            out.write(encode_header(header))
+            out.write(root)
+            out.write(meta)
+            out.write(leaves)
+            data.seek(0)
+            shutil.copyfileobj(data, out)
+        os.replace(tmp_path, out_path)
+
+    return {'addressed_tiles': addressed, 'tile_entries': len(entries), 'tile_contents': len(seen),
+            'root_bytes': len(root), 'leaf_bytes': len(leaves), 'data_bytes': offset,
+            'archive_bytes': os.path.getsize(out_path)}
+
+
+def build_archive(out_path=ARCHIVE_PATH, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, processes=None):
+    """Render the vector tile pyramid straight into a PMTiles archive"""
+    vector_tiles.load_layers()
+    metadata = tilejson(min_zoom, max_zoom)
+    del metadata['tiles']
+    metadata['name'] = os.path.splitext(os.path.basename(out_path))[0]
+    tiles = iter_tiles(order=lambda t: zxy_to_tileid(*t), min_zoom=min_zoom, max_zoom=max_zoom,
+                       processes=processes, compress=True)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    return write_archive(tiles, out_path, metadata, min_zoom, max_zoom)
+
+
+def read_header(path):
+    """Decode the fixed 127-byte header of an archive (for inspection)"""
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if raw[:7] != b'PMTiles':
+        raise ValueError(f"{path} is not a PMTiles archive")
+    fields = struct.unpack('<11Q', raw[8:96])
+    names = ['root_offset', 'root_length', 'metadata_offset', 'metadata_length',
+             'leaf_offset', 'leaf_length', 'data_offset', 'data_length',
+             'addressed_tiles', 'tile_entries', 'tile_contents']
+    header = dict(zip(names, fields), version=raw[7])
+    header['min_zoom'], header['max_zoom'] = raw[100], raw[101]
+    return header
+
+
+if __name__ == '__main__':
+    print(f"🗜️  Writing PMTiles archive z{MIN_ZOOM}-z{MAX_ZOOM}...")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    stats = build_archive()
+    elapsed = time.perf_counter() - start
+
+    print(f"   📦 {stats['addressed_tiles']:,} tiles → {stats['tile_entries']:,} directory entries, "
+          f"{stats['tile_contents']:,} unique tiles")
+    print(f"   📂 Root directory {stats['root_bytes']:,} bytes, "
+          f"leaf directories {stats['leaf_bytes'] / 1024:.1f} KB")
+    print(f"\n✅ {stats['archive_bytes'] / 1e6:.2f} MB → {ARCHIVE_PATH} in {elapsed:.1f}s")
+    print("=" * 70)
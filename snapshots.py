@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Content-hashed dataset snapshots with column-chunk deduplication
+
+Each snapshot splits a DataFrame into partitions (by key columns, or fixed
+row ranges) and stores every (partition, column) chunk as a zstd-compressed
+Arrow IPC blob named by the SHA-256 of its contents. A snapshot is just a
+JSON manifest of chunk hashes, so unchanged columns and partitions cost
+nothing on disk and two snapshots are diffed from their manifests alone.
+
+Stages also record the hash of their inputs here, so a stage whose inputs
+haven't changed since its last run can be skipped.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+import pyarrow as pa
+
+SNAPSHOT_ROOT = '/workspace/.snapshots'
+CHUNK_ROWS = 1024
+HASH_BLOCK = 1 << 20
+
+
+def _objects_dir(root):
+    return os.path.join(root, 'objects')
+
+
+def _object_path(root, digest):
+    return os.path.join(_objects_dir(root), digest[:2], digest[2:] + '.arrow')
+
+
+def _serialize_column(array, name):
+    """Arrow IPC bytes for one column chunk (uncompressed - this is what gets hashed)"""
+    table = pa.table({name: array})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _put_chunk(root, array, name):
+    """Store a column chunk if it isn't already present; return its hash"""
+    digest = hashlib.sha256(_serialize_column(array, name)).hexdigest()
+    path = _object_path(root, digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.table({name: array})
+        tmp = path + '.tmp'
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    return digest
+
+
+def _get_chunk(root, digest):
+    with pa.memory_map(_object_path(root, digest), 'r') as source:
+        return pa.ipc.open_file(source).read_all().column(0)
+
+
+def _partition_slices(table, df, partition_by):
+    """Yield (partition key, row-sliced table) pairs"""
+    if partition_by:
+        keys = df[partition_by].astype(str).agg('/'.join, axis=1) if len(partition_by) > 1 \
+            else df[partition_by[0]].astype(str)
+        for key, idx in keys.groupby(keys, sort=True).groups.items():
+            yield key, table.take(pa.array(idx))
+    else:
+        for start in range(0, max(table.num_rows, 1), CHUNK_ROWS):
+            yield f'rows={start}', table.slice(start, CHUNK_ROWS)
+
+
+def _manifest_dir(root, dataset):
+    return os.path.join(root, 'snapshots', dataset)
+
+
+def _history_path(root, dataset):
+    return os.path.join(_manifest_dir(root, dataset), 'HISTORY.jsonl')
+
+
+def snapshot(df, dataset, partition_by=None, note=None, root=SNAPSHOT_ROOT):
+    """
+    Store df as a new snapshot of dataset and return its id.
+
+    The id is the hash of the chunk manifest, so snapshotting identical
+    data twice returns the same id and writes nothing new.
+    """
+    df = df.reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    partitions = []
+    for key, part in _partition_slices(table, df, partition_by):
+        chunks = {name: _put_chunk(root, part.column(name), name) for name in table.column_names}
+        partitions.append({'key': key, 'rows': part.num_rows, 'chunks': chunks})
+
+    body = {
+        'dataset': dataset,
+        'schema': table.schema.serialize().to_pybytes().hex(),
+        'columns': table.column_names,
+        'partition_by': partition_by,
+        'rows': table.num_rows,
+        'partitions': partitions,
+    }
+    snapshot_id = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()[:16]
+
+    manifest_dir = _manifest_dir(root, dataset)
+    os.makedirs(manifest_dir, exist_ok=True)
+    manifest_path = os.path.join(manifest_dir, snapshot_id + '.json')
+    if not os.path.exists(manifest_path):
+        with open(manifest_path, 'w') as f:
+            json.dump(body, f)
+
+    history = list_snapshots(dataset, root=root)
+    if not history or history[-1]['id'] != snapshot_id:
+        with open(_history_path(root, dataset), 'a') as f:
+            f.write(json.dumps({'id': snapshot_id, 'created': time.time(), 'rows': table.num_rows,
+                                'note': note}) + '\n')
+    return snapshot_id
+
+
+def list_snapshots(dataset, root=SNAPSHOT_ROOT):
+    """Snapshot history for dataset, oldest first"""
+    path = _history_path(root, dataset)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_manifest(dataset, snapshot_id='latest', root=SNAPSHOT_ROOT):
+    if snapshot_id == 'latest':
+        history = list_snapshots(dataset, root=root)
+        if not history:
+            raise FileNotFoundError(f"No snapshots of '{dataset}' in {root}")
+        snapshot_id = history[-1]['id']
+    with open(os.path.join(_manifest_dir(root, dataset), snapshot_id + '.json')) as f:
+        manifest = json.load(f)
+    manifest['id'] = snapshot_id
+    return manifest
+
+
+def load_snapshot(dataset, snapshot_id='latest', columns=None, root=SNAPSHOT_ROOT):
+    """Rebuild a snapshot as a DataFrame (rows grouped by partition), reading only the requested columns"""
+    manifest = read_manifest(dataset, snapshot_id, root=root)
+    schema = pa.ipc.read_schema(pa.py_buffer(bytes.fromhex(manifest['schema'])))
+    columns = columns or manifest['columns']
+    pieces = []
+    for part in manifest['partitions']:
+        arrays = [_get_chunk(root, part['chunks'][name]) for name in columns]
+        pieces.append(pa.table(arrays, names=columns))
+    table = pa.concat_tables(pieces) if pieces else schema.empty_table().select(columns)
+    if columns == manifest['columns']:
+        # pandas metadata restores index/categorical details for full reads
+        table = table.replace_schema_metadata(schema.metadata)
+    return table.to_pandas()
+
+
+def diff_snapshots(dataset, old_id, new_id='latest', root=SNAPSHOT_ROOT):
+    """
+    Compare two snapshots by manifest only - no chunk data is read.
+
+    Returns added/removed columns, added/removed partitions and, for
+    partitions present in both, the columns whose chunk hash changed.
+    """
+    old = read_manifest(dataset, old_id, root=root)
+    new = read_manifest(dataset, new_id, root=root)
+    old_parts = {p['key']: p for p in old['partitions']}
+    new_parts = {p['key']: p for p in new['partitions']}
+
+    changed = {}
+    for key in sorted(old_parts.keys() & new_parts.keys()):
+        a, b = old_parts[key]['chunks'], new_parts[key]['chunks']
+        cols = sorted(c for c in a.keys() & b.keys() if a[c] != b[c])
+        if cols:
+            changed[key] = cols
+
+    return {
+        'old': old['id'],
+        'new': new['id'],
+        'rows': (old['rows'], new['rows']),
+        'columns_added': sorted(set(new['columns']) - set(old['columns'])),
+        'columns_removed': sorted(set(old['columns']) - set(new['columns'])),
+        'partitions_added': sorted(new_parts.keys() - old_parts.keys()),
+        'partitions_removed': sorted(old_parts.keys() - new_parts.keys()),
+        'partitions_changed': changed,
+    }
+
+
+def storage_stats(root=SNAPSHOT_ROOT):
+    """Chunk objects on disk vs. bytes referenced by all snapshots"""
+    sizes = {}
+    for dirpath, _, filenames in os.walk(_objects_dir(root)):
+        for name in filenames:
+            sizes[os.path.basename(dirpath) + name[:-len('.arrow')]] = \
+                os.path.getsize(os.path.join(dirpath, name))
+    referenced = 0
+    manifests_dir = os.path.join(root, 'snapshots')
+    for dirpath, _, filenames in os.walk(manifests_dir):
+        for name in filenames:
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(dirpath, name)) as f:
+                for part in json.load(f)['partitions']:
+                    referenced += sum(sizes.get(d, 0) for d in part['chunks'].values())
+    return {'objects': len(sizes), 'stored_bytes': sum(sizes.values()), 'referenced_bytes': referenced}
+
+
+# ---------------------------------------------------------------------------
+# Stage skipping
+# ---------------------------------------------------------------------------
+
+def file_hash(path):
+    """SHA-256 of a file's contents"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def inputs_hash(paths):
+    """Combined hash of a stage's input files (missing files hash as absent)"""
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        h.update(path.encode())
+        h.update(file_hash(path).encode() if os.path.exists(path) else b'missing')
+    return h.hexdigest()
+
+
+def _stage_record_path(root, stage):
+    return os.path.join(root, 'stages', stage + '.json')
+
+
+def stage_is_current(stage, inputs, outputs=(), root=SNAPSHOT_ROOT):
+    """True if stage last ran on identical inputs and its outputs still exist"""
+    path = _stage_record_path(root, stage)
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        record = json.load(f)
+    if not all(os.path.exists(p) for p in outputs):
+        return False
+    return record['inputs_hash'] == inputs_hash(inputs)
+
+
+def record_stage(stage, inputs, outputs=(), root=SNAPSHOT_ROOT):
+    """Remember the input hash a stage just ran on"""
+    path = _stage_record_path(root, stage)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'stage': stage, 'inputs': sorted(inputs), 'outputs': list(outputs),
+                   'inputs_hash': inputs_hash(inputs), 'ran_at': time.time()}, f, indent=2)
+
+
+def skip_if_current(stage, inputs, outputs=(), root=SNAPSHOT_ROOT):
+    """Exit the calling stage script early when its inputs are unchanged"""
+    if os.environ.get('FORCE_STAGES'):
+        return
+    if stage_is_current(stage, inputs, outputs, root=root):
+        print(f"⏭️  {stage}: inputs unchanged since last run - skipping")
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if len(args) >= 1 and args[0] == 'log':
+        for dataset in args[1:] or sorted(os.listdir(os.path.join(SNAPSHOT_ROOT, 'snapshots'))):
+            print(f"📚 {dataset}")
+            for entry in list_snapshots(dataset):
+                stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['created']))
+                print(f"   {entry['id']}  {stamp}  {entry['rows']} rows  {entry.get('note') or ''}")
+    elif len(args) >= 3 and args[0] == 'diff':
+        diff = diff_snapshots(args[1], args[2], args[3] if len(args) > 3 else 'latest')
+        print(f"🔍 {args[1]}: {diff['old']} → {diff['new']} ({diff['rows'][0]} → {diff['rows'][1]} rows)")
+        for label in ['columns_added', 'columns_removed', 'partitions_added', 'partitions_removed']:
+            if diff[label]:
+                print(f"   {label.replace('_', ' ')}: {', '.join(diff[label])}")
+        for key, cols in diff['partitions_changed'].items():
+            print(f"   ~ {key}: {', '.join(cols)}")
+    elif args[:1] == ['du']:
+        stats = storage_stats()
+        print(f"💾 {stats['objects']} chunks, {stats['stored_bytes']/1e6:.2f} MB stored, "
+              f"{stats['referenced_bytes']/1e6:.2f} MB referenced across snapshots")
+    else:
+        print("usage: snapshots.py log [dataset...] | diff <dataset> <old> [new] | du")
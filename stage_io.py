@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Arrow IPC handoff between pipeline stages
+
+Stages write uncompressed Arrow IPC (Feather v2) files and the next stage
+memory-maps them, so column buffers are used in place instead of being
+re-parsed from CSV text. Hand-maintained inputs (all_county_zips.csv,
+tract_city_names.csv) stay CSV; read_stage() falls back to them.
+"""
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+ARROW_EXT = '.arrow'
+
+# Rows per record batch - bounds what a chunked reader holds at once
+RECORD_BATCH_ROWS = 8192
+
+
+def stage_path(path):
+    """Strip a .csv/.arrow extension so stages can be named by stem"""
+    stem, ext = os.path.splitext(path)
+    return stem if ext in ('.csv', ARROW_EXT) else path
+
+
+def stage_file(path):
+    """The file read_stage() would load for path (.arrow if present, else .csv)"""
+    stem = stage_path(path)
+    return stem + ARROW_EXT if os.path.exists(stem + ARROW_EXT) else stem + '.csv'
+
+
+def write_stage(df, path):
+    """Write df as an uncompressed Arrow IPC file and return its path"""
+    out = stage_path(path) + ARROW_EXT
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Compression would force a decode on read and defeat memory-mapping
+    feather.write_feather(table, out, compression='uncompressed', chunksize=RECORD_BATCH_ROWS)
+    return out
+
+
+def read_table(path, columns=None):
+    """Memory-map an Arrow IPC file as a pyarrow Table (no copy)"""
+    with pa.memory_map(stage_path(path) + ARROW_EXT, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+
+def read_stage(path, columns=None, dtype=None, zero_copy=True):
+    """
+    Load a stage output as a DataFrame.
+
+    Prefers <stem>.arrow, memory-mapped. With zero_copy the columns are
+    ArrowDtype-backed and point straight into the mapped file; otherwise
+    they are converted to regular numpy/pandas dtypes. Falls back to
+    <stem>.csv when no Arrow file exists. dtype (one type or a per-column
+    dict) applies either way, leaving missing values missing as read_csv
+    does; only the columns it names are copied.
+    """
+    stem = stage_path(path)
+    if os.path.exists(stem + ARROW_EXT):
+        table = read_table(stem, columns=columns)
+        df = table.to_pandas(types_mapper=pd.ArrowDtype) if zero_copy else table.to_pandas()
+        if dtype is not None:
+            if not isinstance(dtype, dict):
+                dtype = dict.fromkeys(df.columns, dtype)
+            for key, value in dtype.items():
+                if key in df.columns:
+                    df[key] = df[key].astype(value).where(df[key].notna())
+        return df
+    return pd.read_csv(stem + '.csv', usecols=columns, dtype=dtype)
+
+
+def export_csv(path):
+    """Write a human-readable CSV copy of an Arrow stage file"""
+    stem = stage_path(path)
+    read_stage(stem, zero_copy=False).to_csv(stem + '.csv', index=False)
+    return stem + '.csv'
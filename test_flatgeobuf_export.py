@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from flatgeobuf_export import GEOMETRY_POINT, level_bounds, read_bbox, write_flatgeobuf
+
+
+def write_points(tmp_path, n):
+    path = str(tmp_path / f'{n}.fgb')
+    coords = np.column_stack([np.linspace(0, 1, n), np.linspace(0, 1, n)])
+    stats = write_flatgeobuf(shapely.points(coords), pd.DataFrame({'value': np.arange(n, dtype=float)}),
+                             path, 'points', GEOMETRY_POINT)
+    return path, stats
+
+
+def test_level_bounds():
+    assert level_bounds(0) == [(0, 0)]
+    assert level_bounds(1) == [(1, 2), (0, 1)]
+    assert level_bounds(17) == [(3, 20), (1, 3), (0, 1)]
+
+
+def test_empty_layer(tmp_path):
+    path, stats = write_points(tmp_path, 0)
+    assert stats['features'] == 0 and stats['index_bytes'] == 0
+    assert read_bbox(path, (-1, -1, 2, 2))[0] == []
+
+
+def test_single_feature(tmp_path):
+    path, stats = write_points(tmp_path, 1)
+    assert stats['features'] == 1
+    features, _ = read_bbox(path, (-1, -1, 2, 2))
+    assert len(features) == 1
+    geometry, props = features[0]
+    assert geometry.equals(shapely.Point(0, 0)) and props == {'value': 0.0}
+    assert read_bbox(path, (5, 5, 6, 6))[0] == []
+
+
+def test_many_features(tmp_path):
+    path, _ = write_points(tmp_path, 300)
+    features, _ = read_bbox(path, (0, 0, 0.5, 0.5))
+    assert sorted(props['value'] for _, props in features) == list(range(150))
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Topology-preserving multi-level tract simplification
+
+Per-polygon simplification moves a shared boundary differently on each
+side and opens gaps and slivers between neighboring tracts. Here every
+ring is cut into arcs at junctions (vertices where the set of neighbors
+changes), identical arcs are stored once, each arc is simplified once,
+and polygons are rebuilt from the shared arcs - so both sides of a
+boundary always get exactly the same line.
+
+The arc/ring-reference layout (negative refs ~i for reversed arcs) is the
+same one TopoJSON uses.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from geometry_validation import ensure_valid, load_valid, validated_path
+from snapshots import record_stage, stage_is_current
+from stage_io import read_stage, stage_file, stage_path, write_stage
+
+# Zoom ranges that each get their own simplified geometry
+ZOOM_LEVELS = [(6, 7), (8, 9), (10, 11), (12, 14)]
+# Allowed displacement in screen pixels at the lowest zoom of each range
+PIXEL_TOLERANCE = 0.5
+# Coordinates are matched exactly after rounding to this many decimals
+MATCH_DECIMALS = 7
+
+
+def pixel_tolerance(zoom, pixels=PIXEL_TOLERANCE):
+    """Degrees of longitude covered by `pixels` 256px-tile pixels at zoom"""
+    return pixels * 360.0 / (256 * 2 ** zoom)
+
+
+def _geometry_rings(geoms):
+    """
+    Flatten geometries to rings.
+
+    Returns (rings, layout) where rings is a list of (n, 2) arrays without
+    the closing vertex and layout[g] is a list of parts, each a list of
+    indices into rings (exterior first).
+    """
+    rings, layout = [], []
+    for geom in geoms:
+        parts = []
+        if geom is not None and not geom.is_empty:
+            polygons = geom.geoms if geom.geom_type == 'MultiPolygon' else [geom]
+            for poly in polygons:
+                if poly.geom_type != 'Polygon' or poly.is_empty:
+                    continue
+                ring_ids = []
+                for ring in [poly.exterior, *poly.interiors]:
+                    coords = np.asarray(ring.coords)[:-1, :2]
+                    ring_ids.append(len(rings))
+                    rings.append(coords)
+                parts.append(ring_ids)
+        layout.append(parts)
+    return rings, layout
+
+
+def build_topology(geoms):
+    """
+    Build a shared-arc topology for an array of (Multi)Polygons.
+
+    Returns {'arcs': [coords...], 'closed': [bool...], 'geometries':
+    [[[ [arc refs...] per ring ] per part ] per geometry]}.
+    """
+    rings, layout = _geometry_rings(geoms)
+    if not rings:
+        return {'arcs': [], 'closed': [], 'geometries': layout}
+
+    lengths = np.array([len(r) for r in rings])
+    all_coords = np.concatenate(rings)
+    keys = np.round(all_coords, MATCH_DECIMALS)
+    vertices, vertex_ids = np.unique(keys, axis=0, return_inverse=True)
+    vertex_ids = vertex_ids.ravel()
+    # Keep the original (unrounded) coordinate of the first occurrence
+    first = np.full(len(vertices), -1)
+    first[vertex_ids[::-1]] = np.arange(len(vertex_ids))[::-1]
+    vertex_coords = all_coords[first]
+
+    # A vertex is a junction when it is seen with more than one distinct
+    # (unordered) pair of neighbors across all rings
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    pos = np.arange(len(vertex_ids))
+    ring_of = np.repeat(np.arange(len(rings)), lengths)
+    offset = pos - starts[ring_of]
+    prev_ids = vertex_ids[starts[ring_of] + (offset - 1) % lengths[ring_of]]
+    next_ids = vertex_ids[starts[ring_of] + (offset + 1) % lengths[ring_of]]
+    pairs = np.column_stack([vertex_ids, np.minimum(prev_ids, next_ids), np.maximum(prev_ids, next_ids)])
+    distinct = np.unique(pairs, axis=0)
+    junction = np.bincount(distinct[:, 0], minlength=len(vertices)) > 1
+
+    arcs, closed, arc_index = [], [], {}
+
+    def add_arc(ids, is_closed):
+        key = tuple(ids)
+        if key in arc_index:
+            return arc_index[key]
+        reverse = tuple(reversed(ids))
+        if reverse in arc_index:
+            return ~arc_index[reverse]
+        arc_index[key] = len(arcs)
+        arcs.append(vertex_coords[list(ids)])
+        closed.append(is_closed)
+        return arc_index[key]
+
+    ring_refs = []
+    for r, start in enumerate(starts):
+        ids = vertex_ids[start:start + lengths[r]]
+        cuts = np.flatnonzero(junction[ids])
+        if len(cuts) == 0:
+            # Closed arc: canonical rotation starts at the smallest vertex id
+            # so the same ring traced from another tract matches
+            k = int(np.argmin(ids))
+            ids = np.concatenate([ids[k:], ids[:k]])
+            ring_refs.append([add_arc(list(ids) + [ids[0]], True)])
+            continue
+        ids = np.concatenate([ids[cuts[0]:], ids[:cuts[0]]])
+        cuts = np.append(cuts - cuts[0], len(ids))
+        refs = []
+        for a, b in zip(cuts[:-1], cuts[1:]):
+            piece = list(ids[a:b]) + [ids[b % len(ids)]]
+            refs.append(add_arc(piece, False))
+        ring_refs.append(refs)
+
+    geometries = [[[ring_refs[r] for r in part] for part in parts] for parts in layout]
+    return {'arcs': arcs, 'closed': closed, 'geometries': geometries}
+
+
+def simplify_arcs(topology, tolerance):
+    """Douglas-Peucker each shared arc once; open arcs keep their endpoints"""
+    arcs = topology['arcs']
+    if not arcs:
+        return []
+    lines = shapely.linestrings(np.concatenate(arcs),
+                                indices=np.repeat(np.arange(len(arcs)), [len(a) for a in arcs]))
+    closed = np.array(topology['closed'], dtype=bool)
+    simplified = np.empty(len(lines), dtype=object)
+    if (~closed).any():
+        simplified[~closed] = shapely.simplify(lines[~closed], tolerance, preserve_topology=False)
+    if closed.any():
+        simplified[closed] = shapely.simplify(lines[closed], tolerance, preserve_topology=True)
+    return [shapely.get_coordinates(line) for line in simplified]
+
+
+def _ring_coords(refs, arcs):
+    pieces = []
+    for ref in refs:
+        coords = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+        pieces.append(coords if not pieces else coords[1:])
+    return np.concatenate(pieces)
+
+
+def _degenerate(ring):
+    return len(ring) < 4 or abs(shapely.area(shapely.polygons(ring))) == 0
+
+
+def rebuild_geometries(topology, arcs):
+    """
+    Reassemble polygons from (simplified) arcs.
+
+    Rings that collapse get their arcs restored to full detail - on every
+    tract that shares them, so the topology stays crack-free. Rings that
+    are degenerate even at full detail (fewer than 3 distinct points, no
+    area) are dropped - a hole on its own, a shell with its polygon part.
+    """
+    original = topology['arcs']
+    arcs = list(arcs)
+    restored = set()
+    while True:
+        collapsed = set()
+        for parts in topology['geometries']:
+            for part in parts:
+                for refs in part:
+                    if _degenerate(_ring_coords(refs, arcs)):
+                        collapsed.update(ref if ref >= 0 else ~ref for ref in refs)
+        collapsed -= restored
+        if not collapsed:
+            break
+        for i in collapsed:
+            arcs[i] = original[i]
+        restored |= collapsed
+
+    geoms = []
+    dropped = 0
+    for parts in topology['geometries']:
+        polys = []
+        for part in parts:
+            shell, *holes = [_ring_coords(refs, arcs) for refs in part]
+            if _degenerate(shell):
+                dropped += 1 + len(holes)
+                continue
+            kept = [hole for hole in holes if not _degenerate(hole)]
+            dropped += len(holes) - len(kept)
+            polys.append(shapely.Polygon(shell, kept))
+        if not polys:
+            geoms.append(None)
+        elif len(polys) == 1:
+            geoms.append(polys[0])
+        else:
+            geoms.append(shapely.MultiPolygon(polys))
+    geoms = np.array(geoms, dtype=object)
+
+    present = ~shapely.is_missing(geoms)
+    invalid = present & ~shapely.is_valid(geoms)
+    if invalid.any():
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+    return geoms, {'restored_arcs': len(restored), 'repaired': int(invalid.sum()), 'dropped_rings': dropped}
+
+
+def simplify_levels(geoms, levels=ZOOM_LEVELS):
+    """Simplified geometry arrays keyed by the minimum zoom of each level"""
+    topology = build_topology(geoms)
+    results = {}
+    for min_zoom, _ in levels:
+        arcs = simplify_arcs(topology, pixel_tolerance(min_zoom))
+        results[min_zoom] = rebuild_geometries(topology, arcs)
+    return topology, results
+
+
+def level_for_zoom(zoom, levels=ZOOM_LEVELS):
+    """Minimum zoom of the level that serves zoom"""
+    for min_zoom, max_zoom in levels:
+        if min_zoom <= zoom <= max_zoom:
+            return min_zoom
+    return levels[0][0] if zoom < levels[0][0] else levels[-1][0]
+
+
+def level_path(source, min_zoom):
+    return f"{stage_path(source)}_topo_z{min_zoom}"
+
+
+def ensure_levels(source, levels=ZOOM_LEVELS):
+    """Build (or reuse) every simplification level for a tract source"""
+    ensure_valid(source)
+    inputs = [os.path.abspath(__file__), stage_file(validated_path(source))]
+    outputs = [level_path(source, z) + '.arrow' for z, _ in levels]
+    stage = 'topo_simplify:' + os.path.basename(stage_path(source))
+    if stage_is_current(stage, inputs, outputs=outputs):
+        return None
+
+    df = load_valid(source, columns=['geoid', 'geometry'])
+    # Already snapped to the output grid, so shared vertices match exactly
+    geoms = df['geometry'].to_numpy()
+    topology, results = simplify_levels(geoms, levels)
+
+    report = {'arcs': len(topology['arcs']),
+              'vertices': int(shapely.get_num_coordinates(geoms).sum()), 'levels': {}}
+    for min_zoom, (simplified, stats) in results.items():
+        keep = ~shapely.is_missing(simplified)
+        write_stage(pd.DataFrame({'geoid': df['geoid'].to_numpy()[keep],
+                                  'geometry': shapely.to_wkb(simplified[keep])}),
+                    level_path(source, min_zoom))
+        report['levels'][min_zoom] = dict(stats, vertices=int(shapely.get_num_coordinates(simplified[keep]).sum()))
+    record_stage(stage, inputs, outputs=outputs)
+    return report
+
+
+def load_level(source, zoom):
+    """geoid + simplified shapely geometry for the level serving zoom"""
+    ensure_levels(source)
+    level = read_stage(level_path(source, level_for_zoom(zoom)), zero_copy=False)
+    level['geometry'] = shapely.from_wkb(level['geometry'].to_numpy(dtype=object))
+    return level
+
+
+if __name__ == '__main__':
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else '/workspace/complete_census_all_nj_with_cities'
+
+    print("✂️  Building topology-preserving simplification levels...")
+    print("=" * 70)
+
+    report = ensure_levels(source)
+    if report is None:
+        print("⏭️  Levels are up to date")
+    else:
+        print(f"   🔗 {report['arcs']:,} shared arcs from {report['vertices']:,} vertices")
+        for (min_zoom, max_zoom) in ZOOM_LEVELS:
+            level = report['levels'][min_zoom]
+            path = level_path(source, min_zoom) + '.arrow'
+            print(f"   ✅ z{min_zoom}-{max_zoom}: {level['vertices']:,} vertices "
+                  f"({level['vertices'] / report['vertices']:.0%}), "
+                  f"{os.path.getsize(path) / 1e6:.2f} MB, "
+                  f"{level['restored_arcs']} arcs kept whole, {level['repaired']} repaired, "
+                  f"{level['dropped_rings']} degenerate rings dropped")
+    print("=" * 70)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+TopoJSON export for tract maps
+
+Encodes the shared-arc topology from topo_simplify as TopoJSON: every
+boundary is stored once, arc coordinates are quantized to an integer grid
+and delta-encoded. Maps decode it in the browser with topojson-client
+(folium.TopoJson loads it for us).
+"""
+
+import json
+import math
+
+import numpy as np
+import shapely
+
+from topo_simplify import build_topology
+
+# Grid cells per axis across the dataset's bounding box (TopoJSON "Q")
+DEFAULT_QUANTIZATION = 100000
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _transform(arcs, quantization):
+    coords = np.concatenate(arcs)
+    x0, y0 = coords.min(axis=0)
+    x1, y1 = coords.max(axis=0)
+    kx = (x1 - x0) / (quantization - 1) or 1.0
+    ky = (y1 - y0) / (quantization - 1) or 1.0
+    return {'scale': [kx, ky], 'translate': [x0, y0]}
+
+
+def quantize_arcs(arcs, transform):
+    """Quantize arcs to the transform grid and delta-encode them"""
+    (kx, ky), (x0, y0) = transform['scale'], transform['translate']
+    encoded = []
+    for arc in arcs:
+        q = np.column_stack([np.round((arc[:, 0] - x0) / kx), np.round((arc[:, 1] - y0) / ky)]).astype(np.int64)
+        # Drop consecutive vertices that landed in the same grid cell
+        keep = np.ones(len(q), dtype=bool)
+        keep[1:] = np.any(q[1:] != q[:-1], axis=1)
+        q = q[keep]
+        if len(q) < 2:
+            q = np.vstack([q, q])
+        delta = np.vstack([q[:1], np.diff(q, axis=0)])
+        encoded.append(delta.tolist())
+    return encoded
+
+
+def decode_arcs(topology):
+    """Inverse of quantize_arcs - absolute lon/lat arrays per arc"""
+    (kx, ky), (x0, y0) = topology['transform']['scale'], topology['transform']['translate']
+    decoded = []
+    for arc in topology['arcs']:
+        q = np.cumsum(np.asarray(arc, dtype=np.int64), axis=0)
+        decoded.append(np.column_stack([q[:, 0] * kx + x0, q[:, 1] * ky + y0]))
+    return decoded
+
+
+def _geometry_object(parts, properties, feature_id):
+    if not parts:
+        obj = {'type': None}
+    elif len(parts) == 1:
+        obj = {'type': 'Polygon', 'arcs': parts[0]}
+    else:
+        obj = {'type': 'MultiPolygon', 'arcs': parts}
+    if feature_id is not None:
+        obj['id'] = feature_id
+    if properties:
+        obj['properties'] = {k: _clean(v) for k, v in properties.items()}
+    return obj
+
+
+def encode_topojson(topology, properties=None, ids=None, object_name='tracts',
+                    quantization=DEFAULT_QUANTIZATION):
+    """
+    TopoJSON dict for a topology from topo_simplify.build_topology.
+
+    properties is a list of dicts (one per geometry). Simplify first with
+    topo_simplify levels - the arcs are encoded as given.
+    """
+    return encode_topojson_objects(topology, {object_name: properties}, ids, quantization)
+
+
+def encode_topojson_objects(topology, objects, ids=None, quantization=DEFAULT_QUANTIZATION):
+    """
+    Like encode_topojson with one object per entry of objects (name ->
+    property list or None), every object over the same geometries and
+    one shared set of arcs.
+    """
+    arcs = topology['arcs']
+    transform = _transform(arcs, quantization)
+    encoded = {}
+    for object_name, properties in objects.items():
+        geometries = []
+        for i, parts in enumerate(topology['geometries']):
+            geometries.append(_geometry_object(
+                parts, properties[i] if properties is not None else None,
+                _clean(ids[i]) if ids is not None else None))
+        encoded[object_name] = {'type': 'GeometryCollection', 'geometries': geometries}
+    return {
+        'type': 'Topology',
+        'transform': transform,
+        'objects': encoded,
+        'arcs': quantize_arcs(arcs, transform),
+    }
+
+
+def tracts_topojson(df, property_columns, quantization=DEFAULT_QUANTIZATION):
+    """Encode a tract DataFrame (geoid + GeoJSON geometry column) as TopoJSON"""
+    geoms = shapely.from_geojson(df['geometry'].to_numpy(dtype=object), on_invalid='ignore')
+    topology = build_topology(geoms)
+    properties = df[property_columns].to_dict('records')
+    return encode_topojson(topology, properties, ids=df['geoid'].tolist(),
+                           quantization=quantization)
+
+
+def dumps(topology):
+    """Compact TopoJSON text"""
+    return json.dumps(topology, separators=(',', ':'))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Precomputed per-tract spatial summary table
+
+Built once per tract source with vectorized shapely 2 operations, run
+across cores by geometry_engine, so builders and analyses can read
+centroids, bounds, areas and vertex counts as plain columns instead of
+parsing polygons again. Measured on the validated (repaired, snapped)
+geometry of geometry_validation.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from geometry_engine import process
+from geometry_validation import ensure_valid, load_valid, validated_path
+from snapshots import record_stage, stage_is_current
+from stage_io import read_stage, stage_file, stage_path, write_stage
+
+# Statute miles per degree of latitude (and of longitude at the equator)
+MILES_PER_DEGREE = 69.09
+
+SUMMARY_COLUMNS = [
+    'geoid', 'centroid_lon', 'centroid_lat', 'rep_lon', 'rep_lat',
+    'minx', 'miny', 'maxx', 'maxy', 'area_sqmi', 'perimeter_mi',
+    'vertex_count', 'ring_count', 'part_count',
+]
+
+
+def summary_path(source):
+    """Summary stage file that belongs to a tract source"""
+    return stage_path(source) + '_summary'
+
+
+def local_miles(geoms, lat0):
+    """
+    Rescale lon/lat geometries to miles around each geometry's own latitude
+    (equirectangular) so area and length come out in mi² / mi.
+    """
+    coords, idx = shapely.get_coordinates(geoms, return_index=True)
+    scale = np.column_stack([np.cos(np.radians(lat0[idx])), np.ones(len(idx))]) * MILES_PER_DEGREE
+    return shapely.set_coordinates(geoms.copy(), coords * scale)
+
+
+def summarize_geometries(geoms):
+    """
+    Summary columns (without geoid) for an array of shapely geometries.
+    area_sqmi is the polygon's own area measured in local_miles - water
+    included, so not the census land area.
+    """
+    centroids = shapely.centroid(geoms)
+    reps = shapely.point_on_surface(geoms)
+    bounds = shapely.bounds(geoms)
+    centroid_xy = shapely.get_coordinates(centroids)
+    rep_xy = shapely.get_coordinates(reps)
+
+    parts, part_idx = shapely.get_parts(geoms, return_index=True)
+    rings = np.bincount(part_idx, weights=1 + shapely.get_num_interior_rings(parts),
+                        minlength=len(geoms)).astype(int)
+
+    scaled = local_miles(geoms, centroid_xy[:, 1])
+    return pd.DataFrame({
+        'centroid_lon': centroid_xy[:, 0],
+        'centroid_lat': centroid_xy[:, 1],
+        'rep_lon': rep_xy[:, 0],
+        'rep_lat': rep_xy[:, 1],
+        'minx': bounds[:, 0],
+        'miny': bounds[:, 1],
+        'maxx': bounds[:, 2],
+        'maxy': bounds[:, 3],
+        'area_sqmi': shapely.area(scaled),
+        'perimeter_mi': shapely.length(scaled),
+        'vertex_count': shapely.get_num_coordinates(geoms),
+        'ring_count': rings,
+        'part_count': shapely.get_num_geometries(geoms),
+    })
+
+
+def build_summary(source):
+    """Compute the summary for every validated tract of source across the geometry engine"""
+    df = load_valid(source, columns=['geoid', 'geometry'])
+    summary = process(df['geometry'], ['summary'], return_geometry=False)
+    summary.insert(0, 'geoid', df['geoid'].astype(str))
+    # Rows whose geometry did not parse have no measurements
+    return summary[summary['centroid_lon'].notna()].reset_index(drop=True)
+
+
+def ensure_summary(source):
+    """Build (or reuse) the summary for source and return its stage path"""
+    # Measured on the validated geometry, so that stage is an input too
+    ensure_valid(source)
+    inputs = [os.path.abspath(__file__), stage_file(source), stage_file(validated_path(source))]
+    out = summary_path(source)
+    stage = 'tract_summary:' + os.path.basename(stage_path(source))
+    if not stage_is_current(stage, inputs, outputs=[out + '.arrow']):
+        write_stage(build_summary(source), out)
+        record_stage(stage, inputs, outputs=[out + '.arrow'])
+    return out
+
+
+def load_summary(source, columns=None):
+    """Summary table for source, building it on first use"""
+    return read_stage(ensure_summary(source), columns=columns)
+
+
+if __name__ == '__main__':
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else '/workspace/complete_census_all_nj_with_cities'
+
+    print("📐 Building per-tract spatial summary...")
+    print("=" * 70)
+
+    summary = read_stage(ensure_summary(source), zero_copy=False)
+    print(f"   ✅ {len(summary)} tracts → {summary_path(source)}.arrow")
+    print(f"   📊 Area (water included): {summary['area_sqmi'].sum():,.0f} mi² total")
+    print(f"   📊 Vertices: {summary['vertex_count'].sum():,} total, "
+          f"{summary['vertex_count'].mean():.0f} per tract")
+    print(f"   📊 Multi-part tracts: {(summary['part_count'] > 1).sum()}, "
+          f"tracts with holes: {(summary['ring_count'] > summary['part_count']).sum()}")
+    print("=" * 70)
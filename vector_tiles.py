@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Mapbox Vector Tile pyramid for tracts and ZIPs
+
+Turns tract polygons and ZIP points plus their attributes into a static
+{z}/{x}/{y}.pbf directory (z6-z14 by default) that Vercel can serve as-is.
+Each zoom uses the matching topology-preserving simplification level from
+topo_simplify, attributes are pruned by zoom, and tiles are rendered in
+parallel across all cores.
+
+The MVT protobuf (spec v2.1) is small enough to encode by hand, so there is
+no protobuf dependency.
+"""
+
+import gzip
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import time
+
+import numpy as np
+import shapely
+
+from stage_io import read_stage
+from topo_simplify import ZOOM_LEVELS, load_level
+
+TILE_ROOT = '/workspace/public/tiles'
+TRACT_SOURCE = '/workspace/complete_census_all_nj_with_cities'
+ZIP_SOURCE = '/workspace/complete_demographic_data'
+
+MIN_ZOOM = 6
+MAX_ZOOM = 14
+EXTENT = 4096
+BUFFER = 64  # tile units of overlap so strokes don't clip at tile seams
+
+# (min zoom, attributes added from that zoom on)
+TRACT_ATTRIBUTES = [
+    (6, ['median_income', 'population', 'density', 'median_home_value']),
+    (10, ['geoid', 'county', 'state']),
+    (12, ['city', 'median_age', 'housing_units']),
+]
+ZIP_ATTRIBUTES = [
+    (6, ['median_income', 'population', 'density']),
+    (10, ['zip_code', 'city', 'county', 'state']),
+    (12, ['median_age', 'housing_units']),
+]
+
+
+# ---------------------------------------------------------------------------
+# Projection
+# ---------------------------------------------------------------------------
+
+def lonlat_to_world(coords):
+    """Lon/lat → Web Mercator in [0, 1] world units (y grows southward)"""
+    lon, lat = coords[:, 0], np.clip(coords[:, 1], -85.0511, 85.0511)
+    x = (lon + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / math.pi) / 2.0
+    return np.column_stack([x, y])
+
+
+def world_to_lonlat(coords):
+    lon = coords[:, 0] * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * coords[:, 1]))))
+    return np.column_stack([lon, lat])
+
+
+def tile_bounds(z, x, y, buffer=0):
+    """World-unit (minx, miny, maxx, maxy) of a tile, optionally buffered"""
+    n = 2 ** z
+    pad = buffer / EXTENT / n
+    return (x / n - pad, y / n - pad, (x + 1) / n + pad, (y + 1) / n + pad)
+
+
+# ---------------------------------------------------------------------------
+# MVT protobuf encoding
+# ---------------------------------------------------------------------------
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _field(number, wire_type):
+    return _varint((number << 3) | wire_type)
+
+
+def _bytes_field(number, data):
+    return _field(number, 2) + _varint(len(data)) + data
+
+
+def _packed(number, values):
+    return _bytes_field(number, b''.join(_varint(v) for v in values))
+
+
+def _command(cmd, count):
+    return (cmd & 0x7) | (count << 3)
+
+
+def _encode_value(value):
+    if isinstance(value, str):
+        return _bytes_field(1, value.encode())
+    if isinstance(value, bool):
+        return _field(7, 0) + _varint(int(value))
+    if isinstance(value, (int, np.integer)):
+        return _field(6, 0) + _varint(_zigzag(int(value)))
+    return _field(3, 1) + np.float64(value).tobytes()
+
+
+def _ring_commands(ring, cursor):
+    """Commands for one closed ring; returns (commands, new cursor)"""
+    cmds = [_command(1, 1), _zigzag(int(ring[0, 0] - cursor[0])), _zigzag(int(ring[0, 1] - cursor[1]))]
+    deltas = np.diff(ring, axis=0)
+    cmds.append(_command(2, len(deltas)))
+    for dx, dy in deltas:
+        cmds.extend((_zigzag(int(dx)), _zigzag(int(dy))))
+    cmds.append(_command(7, 1))
+    return cmds, ring[-1]
+
+
+def _clean_ring(ring, exterior):
+    """Integer ring without closing/duplicate points, wound per MVT spec"""
+    keep = np.ones(len(ring), dtype=bool)
+    keep[1:] = np.any(ring[1:] != ring[:-1], axis=1)
+    ring = ring[keep]
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    if len(ring) < 3:
+        return None
+    x, y = ring[:, 0], ring[:, 1]
+    area = np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+    if area == 0:
+        return None
+    # Exterior rings have positive area in (y-down) tile coordinates
+    if (area > 0) != exterior:
+        ring = ring[::-1]
+    return ring
+
+
+def _polygon_commands(geom, to_tile):
+    cmds, cursor = [], np.zeros(2, dtype=np.int64)
+    polygons = geom.geoms if geom.geom_type in ('MultiPolygon', 'GeometryCollection') else [geom]
+    for poly in polygons:
+        if poly.geom_type != 'Polygon' or poly.is_empty:
+            continue
+        shell = _clean_ring(to_tile(np.asarray(poly.exterior.coords)), True)
+        if shell is None:
+            continue
+        ring_cmds, cursor = _ring_commands(shell, cursor)
+        cmds.extend(ring_cmds)
+        for interior in poly.interiors:
+            hole = _clean_ring(to_tile(np.asarray(interior.coords)), False)
+            if hole is not None:
+                ring_cmds, cursor = _ring_commands(hole, cursor)
+                cmds.extend(ring_cmds)
+    return cmds
+
+
+def _point_commands(geom, to_tile):
+    points = to_tile(shapely.get_coordinates(geom))
+    cmds, cursor = [_command(1, len(points))], np.zeros(2, dtype=np.int64)
+    for p in points:
+        cmds.extend((_zigzag(int(p[0] - cursor[0])), _zigzag(int(p[1] - cursor[1]))))
+        cursor = p
+    return cmds
+
+
+def encode_layer(name, features, extent=EXTENT):
+    """
+    features: iterable of (id, geom_type, commands, properties) where
+    geom_type is 1 (point) or 3 (polygon). Returns the Layer message bytes.
+    """
+    keys, values, key_index, value_index = [], [], {}, {}
+    body = bytearray()
+    for feature_id, geom_type, commands, properties in features:
+        tags = []
+        for k, v in properties.items():
+            if v is None:
+                continue
+            if k not in key_index:
+                key_index[k] = len(keys)
+                keys.append(k)
+            vkey = (type(v).__name__, v)
+            if vkey not in value_index:
+                value_index[vkey] = len(values)
+                values.append(v)
+            tags.extend((key_index[k], value_index[vkey]))
+        feature = bytearray()
+        if feature_id is not None:
+            feature += _field(1, 0) + _varint(int(feature_id))
+        feature += _packed(2, tags)
+        feature += _field(3, 0) + _varint(geom_type)
+        feature += _packed(4, commands)
+        body += _bytes_field(2, bytes(feature))
+
+    layer = bytearray(_field(15, 0) + _varint(2))
+    layer += _bytes_field(1, name.encode())
+    layer += body
+    for k in keys:
+        layer += _bytes_field(3, k.encode())
+    for v in values:
+        layer += _bytes_field(4, _encode_value(v))
+    layer += _field(5, 0) + _varint(extent)
+    return bytes(layer)
+
+
+# ---------------------------------------------------------------------------
+# Layer preparation
+# ---------------------------------------------------------------------------
+
+def attributes_for_zoom(spec, zoom):
+    return [a for min_zoom, attrs in spec if zoom >= min_zoom for a in attrs]
+
+
+def _clean_property(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (float, np.floating)):
+        # Whole-number metrics encode smaller as sint
+        return int(round(value)) if abs(value) >= 100 else round(float(value), 1)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+class TileLayer:
+    """Projected geometries, per-zoom attributes and a spatial index for one layer"""
+
+    def __init__(self, name, geoms, geom_type, ids, table, attribute_spec):
+        self.name = name
+        self.geom_type = geom_type
+        self.geoms = shapely.transform(geoms, lonlat_to_world)
+        self.ids = ids
+        self.table = table
+        self.attribute_spec = attribute_spec
+        self.tree = shapely.STRtree(self.geoms)
+        self._records = {}
+
+    def records(self, zoom):
+        columns = tuple(c for c in attributes_for_zoom(self.attribute_spec, zoom) if c in self.table.columns)
+        if columns not in self._records:
+            self._records[columns] = [
+                {k: _clean_property(v) for k, v in row.items()}
+                for row in self.table[list(columns)].to_dict('records')
+            ]
+        return self._records[columns]
+
+    def encode(self, z, x, y):
+        bounds = tile_bounds(z, x, y, BUFFER)
+        idx = self.tree.query(shapely.box(*bounds), predicate='intersects')
+        if len(idx) == 0:
+            return None
+        idx.sort()
+        n = 2 ** z
+        origin = np.array([x, y], dtype=np.float64)
+
+        def to_tile(coords):
+            return np.round((coords[:, :2] * n - origin) * EXTENT).astype(np.int64)
+
+        clipped = shapely.clip_by_rect(self.geoms[idx], *bounds) if self.geom_type == 3 else self.geoms[idx]
+        records = self.records(z)
+        features = []
+        for i, geom in zip(idx, clipped):
+            if geom is None or geom.is_empty:
+                continue
+            cmds = _polygon_commands(geom, to_tile) if self.geom_type == 3 else _point_commands(geom, to_tile)
+            if cmds:
+                features.append((self.ids[i], self.geom_type, cmds, records[i]))
+        return encode_layer(self.name, features) if features else None
+
+
+def load_tract_layers(source=TRACT_SOURCE):
+    """One tract TileLayer per simplification level, keyed by the level's min zoom"""
+    table = read_stage(source, dtype={'geoid': str}, zero_copy=False).drop(columns='geometry')
+    table = table.rename(columns={'county_name': 'county', 'state_name': 'state'})
+    layers = {}
+    for min_zoom, _ in ZOOM_LEVELS:
+        level = load_level(source, min_zoom).merge(table, on='geoid')
+        geoms = level['geometry'].to_numpy()
+        ids = level['geoid'].astype('int64').to_numpy()
+        layers[min_zoom] = TileLayer('tracts', geoms, 3, ids, level.drop(columns='geometry'), TRACT_ATTRIBUTES)
+    return layers
+
+
+def load_zip_layer(source=ZIP_SOURCE):
+    table = read_stage(source, dtype={'zip_code': str}, zero_copy=False)
+    table = table[table['lat'].notna() & table['lon'].notna()].reset_index(drop=True)
+    geoms = shapely.points(table[['lon', 'lat']].to_numpy(dtype=float))
+    ids = table['zip_code'].astype('int64').to_numpy()
+    return TileLayer('zips', geoms, 1, ids, table, ZIP_ATTRIBUTES)
+
+
+# ---------------------------------------------------------------------------
+# Pyramid
+# ---------------------------------------------------------------------------
+
+# Filled in by the parent before forking so workers inherit it copy-on-write
+_LAYERS = {}
+
+
+def _layers_for_zoom(z):
+    tract_levels = _LAYERS['tracts']
+    level = max(m for m in tract_levels if m <= z) if z >= min(tract_levels) else min(tract_levels)
+    return [tract_levels[level], _LAYERS['zips']]
+
+
+def render_tile(z, x, y):
+    """Encoded MVT bytes for one tile, or None if it would be empty"""
+    layers = filter(None, (layer.encode(z, x, y) for layer in _layers_for_zoom(z)))
+    data = b''.join(_bytes_field(3, layer) for layer in layers)
+    return data or None
+
+
+def tiles_for_zoom(z):
+    """Tiles at zoom z that intersect at least one feature"""
+    world = np.concatenate([shapely.bounds(layer.geoms) for layer in _layers_for_zoom(z)])
+    n = 2 ** z
+    x0, y0 = np.floor(np.nanmin(world[:, :2], axis=0) * n).astype(int)
+    x1, y1 = np.floor(np.nanmax(world[:, 2:], axis=0) * n).astype(int)
+    xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+    xs, ys = xs.ravel(), ys.ravel()
+    boxes = shapely.box(xs / n, ys / n, (xs + 1) / n, (ys + 1) / n)
+    hit = np.zeros(len(boxes), dtype=bool)
+    for layer in _layers_for_zoom(z):
+        hit[np.unique(layer.tree.query(boxes, predicate='intersects')[0])] = True
+    return [(z, int(x), int(y)) for x, y in zip(xs[hit], ys[hit])]
+
+
+def _write_tile(args):
+    z, x, y, out_dir = args
+    data = render_tile(z, x, y)
+    if data is None:
+        return 0
+    path = os.path.join(out_dir, str(z), str(x), f'{y}.pbf')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def tilejson(min_zoom, max_zoom, url='/tiles/{z}/{x}/{y}.pbf'):
+    bounds = np.concatenate([shapely.bounds(shapely.transform(layer.geoms, world_to_lonlat))
+                             for layer in (_LAYERS['tracts'][min(_LAYERS['tracts'])], _LAYERS['zips'])])
+    west, south = np.nanmin(bounds[:, :2], axis=0)
+    east, north = np.nanmax(bounds[:, 2:], axis=0)
+    layers = []
+    for name, spec in [('tracts', TRACT_ATTRIBUTES), ('zips', ZIP_ATTRIBUTES)]:
+        fields = {a: 'String' if a in ('geoid', 'zip_code', 'city', 'county', 'state') else 'Number'
+                  for a in attributes_for_zoom(spec, max_zoom)}
+        layers.append({'id': name, 'fields': fields, 'minzoom': min_zoom, 'maxzoom': max_zoom})
+    return {
+        'tilejson': '3.0.0',
+        'tiles': [url],
+        'minzoom': min_zoom,
+        'maxzoom': max_zoom,
+        'bounds': [round(float(v), 5) for v in (west, south, east, north)],
+        'vector_layers': layers,
+    }
+
+
+def load_layers():
+    """Load every tile layer into the module state the workers inherit"""
+    if not _LAYERS:
+        _LAYERS['tracts'] = load_tract_layers()
+        _LAYERS['zips'] = load_zip_layer()
+    return _LAYERS
+
+
+def _render_task(args):
+    z, x, y, compress = args
+    data = render_tile(z, x, y)
+    if data is not None and compress:
+        data = gzip.compress(data, mtime=0)
+    return data
+
+
+def iter_tiles(order=None, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, processes=None, compress=False):
+    """
+    Yield (z, x, y, data) for every non-empty tile, rendered in a process pool.
+
+    Within each zoom, tiles come back sorted by order((z, x, y)) if given,
+    so callers can stream them straight to disk. compress gzips each tile
+    in the worker.
+    """
+    load_layers()
+    ctx = multiprocessing.get_context('fork')
+    with ctx.Pool(processes or os.cpu_count()) as pool:
+        for z in range(min_zoom, max_zoom + 1):
+            tiles = sorted(tiles_for_zoom(z), key=order) if order else tiles_for_zoom(z)
+            results = pool.imap(_render_task, [(*t, compress) for t in tiles], chunksize=16)
+            for (tz, tx, ty), data in zip(tiles, results):
+                if data is not None:
+                    yield tz, tx, ty, data
+
+
+def build_pyramid(out_dir=TILE_ROOT, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, processes=None):
+    """Render every non-empty tile to out_dir/{z}/{x}/{y}.pbf plus metadata.json"""
+    load_layers()
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    stats = {}
+    ctx = multiprocessing.get_context('fork')
+    with ctx.Pool(processes or os.cpu_count()) as pool:
+        for z in range(min_zoom, max_zoom + 1):
+            tiles = tiles_for_zoom(z)
+            sizes = pool.map(_write_tile, [(tz, tx, ty, out_dir) for tz, tx, ty in tiles], chunksize=16)
+            written = [s for s in sizes if s]
+            stats[z] = {'tiles': len(written), 'bytes': sum(written), 'max_bytes': max(written, default=0)}
+
+    with open(os.path.join(out_dir, 'metadata.json'), 'w') as f:
+        json.dump(tilejson(min_zoom, max_zoom), f, indent=2)
+    return stats
+
+
+if __name__ == '__main__':
+    print(f"🧱 Building vector tile pyramid z{MIN_ZOOM}-z{MAX_ZOOM} on {os.cpu_count()} cores...")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    stats = build_pyramid()
+    elapsed = time.perf_counter() - start
+
+    for z, s in stats.items():
+        print(f"   z{z:<2} {s['tiles']:>6} tiles  {s['bytes'] / 1e6:>7.2f} MB  "
+              f"(largest {s['max_bytes'] / 1024:.0f} KB)")
+    total_tiles = sum(s['tiles'] for s in stats.values())
+    total_bytes = sum(s['bytes'] for s in stats.values())
+    print(f"\n✅ {total_tiles:,} tiles, {total_bytes / 1e6:.1f} MB → {TILE_ROOT} in {elapsed:.1f}s")
+    print("=" * 70)
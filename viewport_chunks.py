@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Viewport chunk index for tract layers
+
+Splits the tracts into grid chunks for every simplification level of
+topo_simplify and writes each chunk as a content-hashed GeoJSON sidecar.
+The index - per level the zoom range it serves and each chunk's URL and
+bounding box - is small enough to embed in the page, where
+map_client.ViewportLoader fetches only the chunks that intersect the
+view at the level for the current zoom.
+
+Chunks are Web Mercator tiles at GRID_ZOOM for the level. Each tract
+belongs to exactly one chunk (the tile holding its representative
+point); a chunk's bbox is the union of its tracts' bounds, so tracts
+reaching over the tile edge are still loaded when they are in view.
+With COLUMNAR_PROPERTIES the tract properties of a chunk are written as
+columns (map_client.encode_columns), with PACKED_COORDINATES the
+coordinates as varints (map_client.pack_geometries).
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from map_client import (COLUMNAR_PROPERTIES, PACKED_COORDINATES, SIDECAR_DIR, encode_columns, pack_geometries,
+                        write_sidecar)
+from topo_simplify import ZOOM_LEVELS, load_level
+from vector_tiles import lonlat_to_world
+
+TRACT_SOURCE = '/workspace/complete_census_all_nj_with_cities'
+
+# Grid (tile zoom) per level min zoom: about 2x2 to 3x3 chunks cover a
+# 1200x800 viewport at the level's zooms
+GRID_ZOOM = {6: 5, 8: 7, 10: 9, 12: 11}
+
+
+def chunk_keys(geoms, grid_zoom):
+    """(x, y) tile at grid_zoom of each geometry's representative point"""
+    points = shapely.get_coordinates(shapely.point_on_surface(geoms))
+    tiles = np.floor(lonlat_to_world(points) * 2 ** grid_zoom).astype(np.int64)
+    return tiles[:, 0], tiles[:, 1]
+
+
+def _compact(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+def chunk_collection(geoms, properties, columnar=COLUMNAR_PROPERTIES, packed=PACKED_COORDINATES):
+    """
+    FeatureCollection JSON text for one chunk, with properties as columns
+    and packed coordinates if asked, and the bytes they take:
+    {'properties': (plain, encoded), 'coordinates': (plain, encoded)}
+    """
+    geojson = list(shapely.to_geojson(geoms))
+    props = properties.to_json(orient='records', lines=True).splitlines()
+    plain = {'properties': sum(map(len, props)), 'coordinates': sum(map(len, geojson))}
+    sizes = {key: (n, n) for key, n in plain.items()}
+    extra = ''
+    if packed:
+        stubs, packing = pack_geometries([json.loads(g) for g in geojson])
+        geojson = [_compact(stub) for stub in stubs]
+        packing = _compact(packing)
+        sizes['coordinates'] = (plain['coordinates'], sum(map(len, geojson)) + len(packing))
+        extra += ',"packed":' + packing
+    if columnar:
+        columns = _compact(encode_columns(properties))
+        sizes['properties'] = (plain['properties'], len(columns))
+        extra += ',"columns":' + columns
+        features = ('{"type":"Feature","geometry":' + g + '}' for g in geojson)
+    else:
+        features = ('{"type":"Feature","geometry":' + g + ',"properties":' + p + '}' for g, p in zip(geojson, props))
+    return '{"type":"FeatureCollection","features":[' + ','.join(features) + ']' + extra + '}', sizes
+
+
+def write_chunks(properties, out_dir, source=TRACT_SOURCE, levels=ZOOM_LEVELS,
+                 data_dir=SIDECAR_DIR, key='geoid', columnar=COLUMNAR_PROPERTIES, packed=PACKED_COORDINATES):
+    """
+    Write the chunk sidecars for the tracts in properties (one row per
+    tract, key column matching the level stages) under out_dir and return
+    the index: {'levels': [{'min_zoom', 'max_zoom', 'chunks': [{'url',
+    'bbox', 'features'}]}], 'bytes': total sidecar bytes,
+    'properties_before' / 'properties_after': property bytes as
+    per-feature objects and, with columnar, as columns,
+    'coordinates_before' / 'coordinates_after': the same for geometries
+    as GeoJSON and, with packed, packed}.
+    """
+    index = dict.fromkeys(['bytes', 'properties_before', 'properties_after',
+                           'coordinates_before', 'coordinates_after'], 0)
+    index['levels'] = []
+    for min_zoom, max_zoom in levels:
+        level = properties.merge(load_level(source, min_zoom), on=key)
+        level = level[~shapely.is_empty(level['geometry'].to_numpy())]
+        geoms = level['geometry'].to_numpy()
+        x, y = chunk_keys(geoms, GRID_ZOOM[min_zoom])
+        chunks = []
+        for (_, _), rows in pd.Series(np.arange(len(level))).groupby([x, y]):
+            rows = rows.to_numpy()
+            text, sizes = chunk_collection(geoms[rows], level.iloc[rows].drop(columns='geometry'),
+                                           columnar, packed)
+            for name, (before, after) in sizes.items():
+                index[f'{name}_before'] += before
+                index[f'{name}_after'] += after
+            chunks.append({
+                'url': write_sidecar(text, out_dir, data_dir),
+                'bbox': [round(v, 5) for v in shapely.total_bounds(geoms[rows])],
+                'features': len(rows),
+            })
+            index['bytes'] += len(text)
+        index['levels'].append({'min_zoom': min_zoom, 'max_zoom': max_zoom, 'chunks': chunks})
+    return index
+
+
+if __name__ == '__main__':
+    import sys
+
+    from stage_io import read_stage
+
+    source = sys.argv[1] if len(sys.argv) > 1 else TRACT_SOURCE
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else '/workspace'
+
+    print("🧭 Writing viewport chunks for every simplification level...")
+    print("=" * 70)
+
+    properties = read_stage(source, columns=['geoid'], dtype={'geoid': str}, zero_copy=False)
+    index = write_chunks(properties, out_dir, source)
+    for level in index['levels']:
+        sizes = [c['features'] for c in level['chunks']]
+        print(f"   z{level['min_zoom']}-{level['max_zoom']:<3} {len(sizes):>4} chunks, "
+              f"{min(sizes)}-{max(sizes)} tracts each")
+    print(f"   🧮 Tract attributes {index['properties_before'] / 1e6:.2f} MB → "
+          f"{index['properties_after'] / 1e6:.2f} MB as columns")
+    print(f"   📐 Coordinates {index['coordinates_before'] / 1e6:.2f} MB → "
+          f"{index['coordinates_after'] / 1e6:.2f} MB packed")
+    print(f"\n✅ {index['bytes'] / 1e6:.1f} MB of chunks → {out_dir}/{SIDECAR_DIR}/")
+    print("=" * 70)
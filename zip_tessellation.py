@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Voronoi tessellation of ZIP centroids
+
+The ZIP table only has a centroid per ZIP, so the builders used to draw a
+fixed 0.08° square around each one - neighboring squares overlapped and
+were painted (and hovered) several times. Here every distinct centroid
+gets its Voronoi cell from one GEOS call, the cells are clipped to the
+study-area outline dissolved from the tracts, and the result is cached
+like every other stage. Cells tile the area without overlaps.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from dissolve import TRACT_SOURCE, ensure_dissolve, load_dissolve
+from snapshots import record_stage, stage_is_current
+from stage_io import read_stage, stage_file, stage_path, write_stage
+
+ZIP_SOURCE = '/workspace/complete_demographic_data'
+
+# ZIPs whose centroid falls outside the tract coverage get at most this
+# much land around them (degrees, about the old square's half-width)
+OUTSIDE_RADIUS = 0.04
+
+
+def cells_path(source):
+    """Tessellation stage that belongs to a ZIP source"""
+    return stage_path(source) + '_voronoi'
+
+
+def study_area(tract_source=TRACT_SOURCE):
+    """Outline of every state the tracts cover (coastline included)"""
+    states = load_dissolve(tract_source, 'state_name')
+    return shapely.union_all(states['geometry'].to_numpy())
+
+
+def tessellate(lon, lat, boundary, outside_radius=OUTSIDE_RADIUS):
+    """
+    Voronoi cell of each distinct (lon, lat) site clipped to boundary.
+
+    Returns (cells, site) where cells[i] belongs to the i-th distinct site
+    and site maps every input point to its cell. Sites outside boundary
+    keep a disc of outside_radius so they are not clipped away.
+    """
+    sites, site = np.unique(np.column_stack([lon, lat]), axis=0, return_inverse=True)
+    points = shapely.points(sites)
+    # ordered=True returns the cells in the order of the input points
+    cells = shapely.get_parts(shapely.voronoi_polygons(
+        shapely.multipoints(points), extend_to=shapely.envelope(boundary).buffer(1.0), ordered=True))
+
+    outside = ~shapely.contains(boundary, points)
+    clip = boundary
+    if outside.any():
+        clip = shapely.union(boundary, shapely.union_all(shapely.buffer(points[outside], outside_radius)))
+    shapely.prepare(clip)
+    cells = shapely.intersection(cells, clip)
+    return cells, site.ravel()
+
+
+def build_cells(source, tract_source=TRACT_SOURCE):
+    """zip_code, site id and clipped cell geometry for every ZIP in source"""
+    df = read_stage(source, columns=['zip_code', 'lat', 'lon'], dtype={'zip_code': str}, zero_copy=False)
+    df = df[df['lat'].notna() & df['lon'].notna()].drop_duplicates('zip_code').reset_index(drop=True)
+    cells, site = tessellate(df['lon'].to_numpy(float), df['lat'].to_numpy(float), study_area(tract_source))
+    return pd.DataFrame({'zip_code': df['zip_code'].astype(str).to_numpy(), 'site': site,
+                         'geometry': cells[site]})
+
+
+def ensure_cells(source=ZIP_SOURCE, tract_source=TRACT_SOURCE):
+    """Build (or reuse) the ZIP tessellation for source; returns the stage path"""
+    inputs = [os.path.abspath(__file__), stage_file(source),
+              ensure_dissolve(tract_source, 'state_name') + '.arrow']
+    out = cells_path(source)
+    stage = 'zip_tessellation:' + os.path.basename(stage_path(source))
+    if not stage_is_current(stage, inputs, outputs=[out + '.arrow']):
+        cells = build_cells(source, tract_source)
+        cells['geometry'] = shapely.to_wkb(cells['geometry'].to_numpy())
+        write_stage(cells, out)
+        record_stage(stage, inputs, outputs=[out + '.arrow'])
+    return out
+
+
+def load_cells(source=ZIP_SOURCE):
+    """zip_code, site and shapely cell geometry, tessellating on first use"""
+    cells = read_stage(ensure_cells(source), zero_copy=False)
+    cells['geometry'] = shapely.from_wkb(cells['geometry'].to_numpy(dtype=object))
+    return cells
+
+
+def attach_cells(df, source=ZIP_SOURCE, rank='population'):
+    """
+    One row per Voronoi cell with its geometry, for drawing.
+
+    ZIPs listed under several counties, and ZIPs that share a centroid
+    (and therefore a cell), are folded to the row with the largest `rank`
+    so no cell is drawn twice.
+    """
+    cells = load_cells(source)
+    out = df.merge(cells, on='zip_code', how='inner')
+    out = out.sort_values(rank, ascending=False, kind='stable')
+    out = out.drop_duplicates('site').sort_index()
+    return out[~shapely.is_empty(out['geometry'].to_numpy())].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    source = sys.argv[1] if len(sys.argv) > 1 else ZIP_SOURCE
+
+    print("🔷 Tessellating ZIP centroids into Voronoi cells...")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    cells = load_cells(source)
+    elapsed = time.perf_counter() - start
+    geoms = cells.drop_duplicates('site')['geometry'].to_numpy()
+    sites = len(geoms)
+    overlap = shapely.area(shapely.union_all(geoms)) - shapely.area(geoms).sum()
+    print(f"   ✅ {len(cells):,} ZIPs → {sites:,} cells in {elapsed:.2f}s → {cells_path(source)}.arrow")
+    print(f"   📊 {len(cells) - sites} ZIPs share a centroid with another ZIP")
+    print(f"   📊 {shapely.get_num_coordinates(geoms).sum():,} vertices, "
+          f"overlap {abs(overlap):.2e} deg², {shapely.is_empty(geoms).sum()} empty cells")
+    print("=" * 70)